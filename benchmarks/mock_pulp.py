@@ -0,0 +1,443 @@
+"""
+Local stand-in for the Pulp v2 REST API, for benchmarks
+
+Serves the subset of the repositories, content, consumers & tasks API used by
+pulpadm over HTTPS (self-signed certificate generated with openssl), with N
+pre-seeded RPM repositories and a configurable latency per request. Tasks finish
+shortly after being spawned. Prints the listening port on the first line of
+stdout:
+
+    python benchmarks/mock_pulp.py [--repos N] [--latency MS] [--port PORT]
+
+GET /_stats returns the number of API requests served so far.
+Like Pulp v2, responses carry no ETag nor Last-Modified, unless --etag is
+given (to exercise conditional requests only).
+"""
+from __future__ import print_function
+import os
+import re
+import sys
+import ssl
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+import subprocess
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+
+API = "/pulp/api/v2/"
+
+# Seconds a spawned task spends waiting & running
+TASK_WAITING = 0.1
+TASK_RUNNING = 0.3
+
+
+def timestamp(value=None):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(value))
+
+
+def seed_repo(repo_id, units=0):
+    """
+    Returns a repository as stored by Pulp, details included
+    """
+    return {
+        "id": repo_id,
+        "display_name": repo_id,
+        "description": None,
+        "notes": {"_repo-type": "rpm-repo"},
+        "content_unit_counts": {"rpm": units} if units else {},
+        "last_unit_added": timestamp(0) if units else None,
+        "last_unit_removed": None,
+        "importers": [{"id": "yum_importer", "importer_type_id": "yum_importer",
+                       "config": {"feed": "http://mirror/{0}/".format(repo_id),
+                                  "max_speed": 10485760}}],
+        "distributors": [
+            {"id": distributor_id, "distributor_type_id": distributor_id,
+             "auto_publish": distributor_id == "yum_distributor",
+             "last_publish": None,
+             "config": {"http": True, "https": True, "relative_url": repo_id}}
+            for distributor_id in ("yum_distributor", "export_distributor")
+        ]
+    }
+
+
+def compile_filters(filters):
+    """
+    Returns search filters with $in lists turned into sets
+    """
+    compiled = {}
+    for key, value in (filters or {}).items():
+        if isinstance(value, dict) and "$in" in value:
+            value = dict(value, **{"$in": set(value["$in"])})
+        compiled[key] = value
+    return compiled
+
+
+def match(doc, filters):
+    """
+    Mongo-like filter matching ($in, $regex & equality), see compile_filters()
+    """
+    for key, value in filters.items():
+        actual = doc.get(key)
+        if isinstance(value, dict):
+            if "$in" in value and actual not in value["$in"]:
+                return False
+            if "$regex" in value and not re.search(value["$regex"], actual or ""):
+                return False
+        elif actual != value:
+            return False
+    return True
+
+
+def project(doc, fields):
+    if not fields:
+        return doc
+    return dict((key, doc[key]) for key in fields if key in doc)
+
+
+class Pulp(object):
+    """
+    In-memory Pulp server state
+    """
+    def __init__(self, repos=0, units=0, orphans=0, consumers=0, offline=0):
+        self.lock = threading.Lock()
+        self.repos = {}
+        self.consumers = dict(("node-{0:05d}".format(i), []) for i in range(consumers))
+        self.offline = set("node-{0:05d}".format(i) for i in range(offline))
+        self.units = {}
+        self.orphans = dict(
+            ("orphan-{0}".format(i), {"_id": "orphan-{0}".format(i), "_content_type_id": "rpm",
+                                      "name": "orphan{0}".format(i), "size": 1048576})
+            for i in range(orphans))
+        self.tasks = {}
+        self.requests = 0
+        for i in range(repos):
+            repo_id = "repo-{0:05d}".format(i)
+            self.repos[repo_id] = seed_repo(repo_id, units)
+            self.units[repo_id] = [
+                {"unit_id": "unit-{0}".format(j), "unit_type_id": "rpm",
+                 "created": timestamp(0),
+                 "metadata": {"_id": "unit-{0}".format(j), "name": "pkg{0}".format(j),
+                              "epoch": "0", "version": "1.0", "release": "1",
+                              "arch": "x86_64", "checksum": "sha-{0}".format(j),
+                              "checksumtype": "sha256", "size": 1048576}}
+                for j in range(units)
+            ]
+
+    def content(self, type_id):
+        """
+        Returns every unit of a content type with the repositories holding it
+        """
+        units = {}
+        for repo_id, associations in self.units.items():
+            for association in associations:
+                if association["unit_type_id"] != type_id:
+                    continue
+                unit = units.setdefault(association["unit_id"], dict(
+                    association["metadata"], repository_memberships=[]))
+                unit["repository_memberships"].append(repo_id)
+        for unit_id, unit in self.orphans.items():
+            if unit["_content_type_id"] == type_id:
+                units[unit_id] = dict(unit, repository_memberships=[])
+        return [units[key] for key in sorted(units)]
+
+    def spawn(self, stuck=False):
+        task_id = str(uuid.uuid4())
+        self.tasks[task_id] = {"task_id": task_id, "state": "waiting",
+                               "spawned": time.time(), "start_time": None,
+                               "finish_time": None, "error": None,
+                               "spawned_tasks": [], "stuck": stuck}
+        return {"spawned_tasks": [{"task_id": task_id}]}
+
+    def advance(self):
+        now = time.time()
+        for task in self.tasks.values():
+            if task["stuck"]:
+                continue
+            age = now - task["spawned"]
+            if task["state"] == "waiting" and age > TASK_WAITING:
+                task["state"] = "running"
+                task["start_time"] = timestamp(now)
+            if task["state"] == "running" and age > TASK_WAITING + TASK_RUNNING:
+                task["state"] = "finished"
+                task["finish_time"] = timestamp(now)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=None, headers=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length).decode("utf-8")) if length else {}
+
+    def route(self, method):
+        pulp = self.server.pulp
+        path = self.path.split("?")[0]
+        body = self.body() if method in ("POST", "PUT") else None
+        if path == "/_stats":
+            return self.reply(200, {"requests": pulp.requests})
+
+        time.sleep(self.server.latency)
+        with pulp.lock:
+            pulp.requests += 1
+            pulp.advance()
+            return self.dispatch(pulp, method, path[len(API):].strip("/").split("/"), body)
+
+    def dispatch(self, pulp, method, parts, body):
+        if parts[0] == "tasks" and parts[1:] == ["search"]:
+            criteria = body["criteria"]
+            filters = compile_filters(criteria.get("filters"))
+            return self.reply(200, [project(task, criteria.get("fields"))
+                                    for task in pulp.tasks.values()
+                                    if match(task, filters)])
+        if parts[0] == "content":
+            return self.dispatch_content(pulp, method, parts[1:], body)
+        if parts[0] == "consumers":
+            return self.dispatch_consumers(pulp, method, parts[1:], body)
+        if parts[0] != "repositories":
+            return self.reply(404, {"error": {"description": "Not found"}})
+
+        parts = parts[1:]
+        if not parts and method == "GET":
+            return self.reply(200, [pulp.repos[key] for key in sorted(pulp.repos)])
+        if not parts and method == "POST":
+            if body["id"] in pulp.repos:
+                return self.reply(409, {"error": {"description": "Duplicate resource"}})
+            repo = seed_repo(body["id"])
+            repo.update({"display_name": body.get("display_name"),
+                         "notes": body.get("notes") or {}})
+            repo["importers"][0]["config"] = dict(
+                (key, value) for key, value in body["importer_config"].items()
+                if value is not None)
+            pulp.repos[body["id"]] = repo
+            pulp.units[body["id"]] = []
+            return self.reply(201, repo)
+        if parts == ["search"]:
+            criteria = body.get("criteria") or {}
+            filters = compile_filters(criteria.get("filters"))
+            docs = [pulp.repos[key] for key in sorted(pulp.repos)
+                    if match(pulp.repos[key], filters)]
+            skip = criteria.get("skip") or 0
+            limit = criteria.get("limit")
+            docs = docs[skip:skip + limit] if limit else docs[skip:]
+            docs = [project(doc, criteria.get("fields")) for doc in docs]
+            for key in ("importers", "distributors"):
+                if criteria.get("fields") and body.get(key):
+                    for doc in docs:
+                        doc[key] = pulp.repos[doc["id"]][key]
+            if not self.server.etag:
+                return self.reply(200, docs)
+            # Not Pulp v2 behaviour (see --etag)
+            etag = '"{0}"'.format(hashlib.md5(
+                json.dumps(docs, sort_keys=True).encode("utf-8")).hexdigest())
+            if self.headers.get("If-None-Match") == etag:
+                return self.reply(304, headers={"ETag": etag})
+            return self.reply(200, docs, {"ETag": etag})
+
+        repo = pulp.repos.get(parts[0])
+        if repo is None:
+            return self.reply(404, {"error": {"description": "Missing resource"}})
+        if len(parts) == 1 and method == "GET":
+            return self.reply(200, repo)
+        if len(parts) == 1 and method == "DELETE":
+            del pulp.repos[parts[0]]
+            held = set(association["unit_id"] for repo_id, associations in pulp.units.items()
+                       if repo_id != parts[0] for association in associations)
+            for association in pulp.units.pop(parts[0], []):
+                if association["unit_id"] not in held:
+                    pulp.orphans[association["unit_id"]] = dict(
+                        association["metadata"], _content_type_id=association["unit_type_id"])
+            return self.reply(202, pulp.spawn())
+        if len(parts) == 1 and method == "PUT":
+            for key, value in (body.get("delta") or {}).items():
+                if key == "notes":
+                    repo["notes"].update(value)
+                else:
+                    repo[key] = value
+            repo["importers"][0]["config"].update(body.get("importer_config") or {})
+            for distributor in repo["distributors"]:
+                distributor["config"].update(
+                    (body.get("distributor_configs") or {}).get(distributor["id"]) or {})
+            return self.reply(202, dict(pulp.spawn(), result=repo))
+        if parts[1:] == ["search", "units"]:
+            criteria = body["criteria"]
+            skip = criteria.get("skip") or 0
+            limit = criteria.get("limit")
+            units = pulp.units.get(parts[0], [])
+            return self.reply(200, units[skip:skip + limit] if limit else units[skip:])
+        if parts[1] == "actions":
+            if parts[2:] == ["publish"]:
+                for distributor in repo["distributors"]:
+                    if distributor["id"] == body.get("id"):
+                        distributor["last_publish"] = timestamp()
+            return self.reply(202, pulp.spawn())
+        return self.reply(404, {"error": {"description": "Not found"}})
+
+    def dispatch_content(self, pulp, method, parts, body):
+        if parts == ["orphans"] and method == "GET":
+            counts = {}
+            for unit in pulp.orphans.values():
+                counts.setdefault(unit["_content_type_id"], {"count": 0})["count"] += 1
+            return self.reply(200, counts)
+        if parts[:1] == ["orphans"] and len(parts) == 2 and method == "GET":
+            return self.reply(200, [dict(unit) for unit in pulp.orphans.values()
+                                    if unit["_content_type_id"] == parts[1]])
+        if parts[:1] == ["units"] and parts[2:] == ["search"]:
+            criteria = body.get("criteria") or {}
+            skip = criteria.get("skip") or 0
+            limit = criteria.get("limit")
+            units = pulp.content(parts[1])
+            units = units[skip:skip + limit] if limit else units[skip:]
+            fields = criteria.get("fields")
+            if fields and body.get("include_repos"):
+                fields = fields + ["repository_memberships"]
+            return self.reply(200, [project(unit, fields) for unit in units])
+        if parts == ["actions", "delete_orphans"]:
+            for item in body:
+                pulp.orphans.pop(item["unit_id"], None)
+            return self.reply(202, pulp.spawn())
+        return self.reply(404, {"error": {"description": "Not found"}})
+
+    def dispatch_consumers(self, pulp, method, parts, body):
+        if parts == ["search"]:
+            criteria = body.get("criteria") or {}
+            filters = compile_filters(criteria.get("filters"))
+            docs = [{"id": key} for key in sorted(pulp.consumers) if match({"id": key}, filters)]
+            skip = criteria.get("skip") or 0
+            limit = criteria.get("limit")
+            docs = docs[skip:skip + limit] if limit else docs[skip:]
+            if body.get("bindings"):
+                for doc in docs:
+                    doc["bindings"] = [dict(item, consumer_id=doc["id"], deleted=False)
+                                       for item in pulp.consumers[doc["id"]]]
+            return self.reply(200, docs)
+        bindings = pulp.consumers.get(parts[0])
+        if bindings is None or parts[1:2] != ["bindings"]:
+            return self.reply(404, {"error": {"description": "Missing resource"}})
+        if len(parts) == 2 and method == "POST":
+            repo = pulp.repos.get(body["repo_id"])
+            if repo is None or body["distributor_id"] not in [
+                    distributor["id"] for distributor in repo["distributors"]]:
+                return self.reply(400, {"error": {"description": "Invalid binding"}})
+            binding = {"repo_id": body["repo_id"], "distributor_id": body["distributor_id"]}
+            if binding not in bindings:
+                bindings.append(binding)
+            if not body.get("notify_agent"):
+                return self.reply(202, {})
+            # Agent tasks of offline consumers are never picked up
+            return self.reply(202, pulp.spawn(stuck=parts[0] in pulp.offline))
+        if len(parts) == 4 and method == "DELETE":
+            binding = {"repo_id": parts[2], "distributor_id": parts[3]}
+            if binding not in bindings:
+                return self.reply(404, {"error": {"description": "Missing resource"}})
+            bindings.remove(binding)
+            return self.reply(202, pulp.spawn(stuck=parts[0] in pulp.offline))
+        return self.reply(404, {"error": {"description": "Not found"}})
+
+    def do_GET(self):
+        self.route("GET")
+
+    def do_POST(self):
+        self.route("POST")
+
+    def do_PUT(self):
+        self.route("PUT")
+
+    def do_DELETE(self):
+        self.route("DELETE")
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients closing keep-alive connections are not worth a traceback
+        pass
+
+
+def certificate(path):
+    """
+    Generates a self-signed certificate & key with openssl
+    """
+    cert = os.path.join(path, "cert.pem")
+    key = os.path.join(path, "key.pem")
+    with open(os.devnull, "w") as devnull:
+        subprocess.check_call(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+             "-subj", "/CN=127.0.0.1", "-keyout", key, "-out", cert],
+            stdout=devnull, stderr=devnull)
+    return cert, key
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repos", type=int, default=10,
+                        help="number of pre-seeded repositories")
+    parser.add_argument("--units", type=int, default=0,
+                        help="number of RPM units per pre-seeded repository")
+    parser.add_argument("--orphans", type=int, default=0,
+                        help="number of pre-seeded orphaned RPM units")
+    parser.add_argument("--consumers", type=int, default=0,
+                        help="number of pre-seeded consumers, without bindings")
+    parser.add_argument("--offline", type=int, default=0,
+                        help="number of consumers whose agent never picks up its tasks")
+    parser.add_argument("--etag", action="store_true",
+                        help="answers repository searches with ETag & 304 Not Modified; "
+                        "NOT Pulp v2 behaviour, which never sends validators")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="milliseconds added to every API request")
+    parser.add_argument("--port", type=int, default=0,
+                        help="listening port (default: any free port)")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="mock-pulp-")
+    try:
+        cert, key = certificate(tmp)
+        server = Server(("127.0.0.1", args.port), Handler)
+        server.pulp = Pulp(repos=args.repos, units=args.units, orphans=args.orphans,
+                           consumers=args.consumers, offline=args.offline)
+        server.latency = args.latency / 1000.0
+        server.etag = args.etag
+        if hasattr(ssl, "SSLContext"):
+            context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+            context.load_cert_chain(cert, key)
+            server.socket = context.wrap_socket(server.socket, server_side=True)
+        else:
+            server.socket = ssl.wrap_socket(server.socket, certfile=cert,
+                                            keyfile=key, server_side=True)
+    finally:
+        shutil.rmtree(tmp)
+
+    print(server.server_address[1])
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Startup-time benchmark of the pulpadm CLI
+
+Measures the wall time of CLI invocations that never touch the network
+(`pulpadm -h', `pulpadm repo generate'), compared with a bare interpreter
+start, and checks that heavy modules are not imported by them. Exits with a
+non-zero status on regression, so it can guard CI runs:
+
+    python benchmarks/startup.py [--runs N] [--max-overhead SECONDS]
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import json
+import argparse
+import ast
+import subprocess
+
+
+# Modules that must only be imported by actions that need them
+HEAVY_MODULES = ["requests", "yaml", "pkg_resources"]
+
+COMMANDS = {
+    "help": ["-h"],
+    "generate": ["repo", "generate", "bench-repo", "--feed", "http://mirror/repo/"]
+}
+
+MODULES_SCRIPT = """
+import sys
+sys.argv = ["pulpadm"] + {argv!r}
+import pulpadm.cli
+try:
+    pulpadm.cli.main()
+except SystemExit:
+    pass
+sys.stderr.write(repr(sorted(m for m in {modules!r} if m in sys.modules)))
+"""
+
+
+def timeit(argv, runs):
+    """
+    Returns the best wall time (seconds) of `runs` executions of argv
+    """
+    best = None
+    with open(os.devnull, "w") as devnull:
+        for _ in range(runs):
+            start = time.time()
+            subprocess.call(argv, stdout=devnull, stderr=devnull)
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def loaded_modules(argv):
+    """
+    Returns the heavy modules imported while running the CLI with argv
+    """
+    script = MODULES_SCRIPT.format(argv=argv, modules=HEAVY_MODULES)
+    proc = subprocess.Popen([sys.executable, "-c", script],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _, err = proc.communicate()
+    return ast.literal_eval(err.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10,
+                        help="executions per command; the best one is kept")
+    parser.add_argument("--max-overhead", type=float, default=0.15,
+                        help="maximum seconds over a bare interpreter start")
+    parser.add_argument("--output", type=str, default=None,
+                        help="writes results as JSON to this file")
+    args = parser.parse_args()
+
+    bare = timeit([sys.executable, "-c", "pass"], args.runs)
+    results = {"python": sys.version.split()[0], "bare": bare, "commands": {}}
+    failed = False
+
+    print("{0:<10} {1:>9} {2:>10}  {3}".format("command", "wall (s)", "overhead", "heavy modules"))
+    print("{0:<10} {1:>9.3f} {2:>10}  {3}".format("python", bare, "-", "-"))
+    for name, argv in sorted(COMMANDS.items()):
+        wall = timeit([sys.executable, "-m", "pulpadm.cli"] + argv, args.runs)
+        modules = loaded_modules(argv)
+        overhead = wall - bare
+        results["commands"][name] = {"wall": wall, "overhead": overhead,
+                                     "modules": modules}
+        print("{0:<10} {1:>9.3f} {2:>10.3f}  {3}".format(
+            name, wall, overhead, ", ".join(modules) or "-"))
+        if modules or overhead > args.max_overhead:
+            failed = True
+
+    if args.output:
+        with open(args.output, "w") as stream:
+            json.dump(results, stream, indent=4, sort_keys=True)
+
+    if failed:
+        print("FAIL: startup regression (heavy module imported or overhead "
+              "over {0}s)".format(args.max_overhead))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
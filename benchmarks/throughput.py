@@ -0,0 +1,191 @@
+"""
+Throughput benchmark of the pulpadm CLI against a mock Pulp server
+
+Starts benchmarks/mock_pulp.py seeded with 10, 1k and 10k repositories (or
+--repos) and measures end-to-end `repo list --details', `repo list
+--ndjson', `repo import --update --plan' and `repo import' (creating 10% new
+repositories), plus generating create API objects and loading the input file
+in-process. Reports wall time, API requests per second and peak RSS of every
+run; results can be written as JSON and compared with a previous run:
+
+    python benchmarks/throughput.py [--repos 10,1000,10000] [--latency MS]
+                                    [--output FILE] [--baseline FILE]
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Share of the input file repositories missing from the server
+NEW_RATIO = 0.1
+
+COMMANDS = [
+    ("list --details", ["repo", "list", "--details"]),
+    ("list --ndjson", ["repo", "list", "--ndjson"]),
+    ("import --plan", ["repo", "import", "{manifest}", "--update", "--plan", "{plan}",
+                       "-j", "{jobs}"]),
+    # Creates repositories on the server; keep it last
+    ("import", ["repo", "import", "{manifest}", "-j", "{jobs}"])
+]
+
+INPROCESS_SCRIPT = """
+import sys, time, json
+from pulpadm.repo import RPMRepo
+from pulpadm.utils import read_yaml
+start = time.time()
+data = read_yaml({manifest!r})
+load = time.time() - start
+read_yaml({manifest!r}, cache={yaml_cache!r})
+start = time.time()
+read_yaml({manifest!r}, cache={yaml_cache!r})
+cached = time.time() - start
+repo = RPMRepo()
+start = time.time()
+for repo_id, config in data.items():
+    repo.generate_repo_create(repo_id, **(config or {{}}))
+generate = time.time() - start
+sys.stderr.write(json.dumps({{"yaml load": load, "yaml load (cached)": cached,
+                             "generate": generate}}))
+"""
+
+
+def write_files(path, port, repos):
+    """
+    Writes the config & input files for a server seeded with `repos' repos
+    """
+    config = os.path.join(path, "config.yaml")
+    manifest = os.path.join(path, "repos.yaml")
+    with open(config, "w") as stream:
+        stream.write("pulp_server:\n  hostname: 127.0.0.1\n  port: {0}\n"
+                     "  username: admin\n  password: admin\n".format(port))
+    with open(manifest, "w") as stream:
+        for i in range(repos + max(int(repos * NEW_RATIO), 1)):
+            prefix = "repo" if i < repos else "new"
+            stream.write('{0}-{1:05d}:\n  display_name: "{0}-{1:05d}"\n'
+                         '  feed: "http://mirror/{0}-{1:05d}/"\n'.format(prefix, i))
+    return config, manifest
+
+
+def run(argv, env):
+    """
+    Runs argv and returns its wall time (seconds), exit status & peak RSS (KB)
+    """
+    with open(os.devnull, "w") as devnull:
+        start = time.time()
+        proc = subprocess.Popen(argv, stdout=devnull, stderr=subprocess.PIPE, env=env)
+        err = proc.stderr.read()
+        _, status, usage = os.wait4(proc.pid, 0)
+        if os.WIFSIGNALED(status):
+            proc.returncode = -os.WTERMSIG(status)
+        else:
+            proc.returncode = os.WEXITSTATUS(status)
+        return time.time() - start, proc.returncode, usage.ru_maxrss, err
+
+
+def requests_sent(path):
+    """
+    Returns the number of API requests recorded in a --stats-file
+    """
+    try:
+        with open(path) as stream:
+            return sum(item["count"] for item in json.load(stream))
+    except (IOError, ValueError):
+        return 0
+
+
+def bench(repos, args):
+    """
+    Runs every benchmark against a mock server seeded with `repos' repos
+    """
+    tmp = tempfile.mkdtemp(prefix="pulpadm-bench-")
+    env = dict(os.environ, HOME=tmp)
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "mock_pulp.py"), "--repos", str(repos),
+         "--latency", str(args.latency)], stdout=subprocess.PIPE)
+    results = {}
+    try:
+        port = int(server.stdout.readline())
+        config, manifest = write_files(tmp, port, repos)
+        stats = os.path.join(tmp, "stats.json")
+        for name, command in COMMANDS:
+            argv = [arg.format(manifest=manifest, plan=os.path.join(tmp, "plan.json"),
+                               jobs=args.jobs) for arg in command]
+            argv = [sys.executable, "-m", "pulpadm.cli", "--config", config,
+                    "--stats-file", stats] + ([] if args.cache else ["--no-cache"]) + argv
+            if os.path.exists(stats):
+                os.remove(stats)
+            wall, status, rss, err = run(argv, env)
+            if status:
+                sys.stderr.write(err.decode("utf-8", "replace"))
+            count = requests_sent(stats)
+            results[name] = {"wall": wall, "requests": count,
+                             "rps": count / wall if wall else None,
+                             "peak_rss_kb": rss, "failed": bool(status)}
+
+        script = INPROCESS_SCRIPT.format(manifest=manifest,
+                                          yaml_cache=os.path.join(tmp, "yaml-cache"))
+        wall, status, rss, err = run([sys.executable, "-c", script], env)
+        timings = json.loads(err.decode().strip().splitlines()[-1]) if not status else {}
+        for name, elapsed in timings.items():
+            results[name] = {"wall": elapsed, "requests": 0, "rps": None,
+                             "peak_rss_kb": rss, "failed": False}
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(tmp)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repos", type=str, default="10,1000,10000",
+                        help="comma-separated numbers of repositories")
+    parser.add_argument("--latency", type=float, default=5.0,
+                        help="milliseconds added by the mock server to every request")
+    parser.add_argument("-j", "--jobs", type=int, default=8,
+                        help="concurrent API requests of `repo import'")
+    parser.add_argument("--cache", action="store_true",
+                        help="lets the CLI use its inventory cache (default: disabled, "
+                        "so that every run hits the server)")
+    parser.add_argument("--output", type=str, default=None,
+                        help="writes results as JSON to this file")
+    parser.add_argument("--baseline", type=str, default=None,
+                        help="JSON file of a previous run to compare wall times with")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as stream:
+            baseline = json.load(stream)["results"]
+
+    results = {"python": sys.version.split()[0], "latency": args.latency,
+               "jobs": args.jobs, "cache": args.cache, "results": {}}
+    print("{0:>6} {1:<20} {2:>9} {3:>9} {4:>9} {5:>10} {6:>8}".format(
+        "repos", "benchmark", "wall (s)", "requests", "req/s", "peak RSS", "vs base"))
+    for repos in [int(value) for value in args.repos.split(",")]:
+        bench_results = bench(repos, args)
+        results["results"][str(repos)] = bench_results
+        for name, item in sorted(bench_results.items()):
+            base = baseline.get(str(repos), {}).get(name)
+            change = "{0:+.1%}".format(item["wall"] / base["wall"] - 1) \
+                if base and base["wall"] else "-"
+            print("{0:>6} {1:<20} {2:>9.3f} {3:>9} {4:>9} {5:>8}MB {6:>8}{7}".format(
+                repos, name, item["wall"], item["requests"] or "-",
+                "{0:.0f}".format(item["rps"]) if item["rps"] else "-",
+                item["peak_rss_kb"] // 1024, change, "  FAILED" if item["failed"] else ""))
+
+    if args.output:
+        with open(args.output, "w") as stream:
+            json.dump(results, stream, indent=4, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+from __future__ import print_function, unicode_literals
+import os
+import sys
+import json
+import shlex
+import signal
+import logging
+import threading
+try:
+    import SocketServer as socketserver
+except ImportError:
+    import socketserver
+import pulpadm.executor as executor
+import pulpadm.tasks
+
+
+# Supported batch operations
+OPERATIONS = ("create", "update", "delete", "get", "list")
+
+
+def _value(text):
+    """
+    Converts a key=value command argument into a bool, int or str
+    """
+    if text.lower() in ("true", "false"):
+        return text.lower() == "true"
+    try:
+        return int(text)
+    except ValueError:
+        return text
+
+
+def parse_operation(line):
+    """
+    Parses a batch line into an operation. A line is either a JSON object,
+    ie: {"op": "create", "id": "epel", "feed": "http://..."}, or a command,
+    ie: create epel feed=http://... display_name="EPEL 7"
+
+    Operation keys besides op, id, fields & wait are repository config
+    keywords (see RPMRepo.generate_repo_create()).
+
+    :param line str: the batch line
+    :return: the operation, None for empty lines and comments
+    :rtype: dict
+
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+
+    if line.startswith("{"):
+        operation = json.loads(line)
+        if not isinstance(operation, dict):
+            raise ValueError("operation must be a JSON object")
+    else:
+        words = shlex.split(line.encode("utf-8") if sys.version_info[0] < 3 else line)
+        words = [word.decode("utf-8") if isinstance(word, bytes) else word
+                 for word in words]
+        operation = {"op": words[0]}
+        for word in words[1:]:
+            if "=" in word:
+                key, value = word.split("=", 1)
+                operation[key] = _value(value)
+            elif "id" not in operation:
+                operation["id"] = word
+            else:
+                raise ValueError("unexpected argument: {0}".format(word))
+
+    if operation.get("op") not in OPERATIONS:
+        raise ValueError("unknown operation: {0}".format(operation.get("op")))
+    if operation["op"] != "list" and not operation.get("id"):
+        raise ValueError("missing repository id")
+    return operation
+
+
+class BatchRunner(object):
+    """
+    Runs batch operations through a single RPMRepo object, so every operation
+    shares the same connection pool, and returns one structured result per
+    operation.
+
+    :param repo RPMRepo: the API client
+    :param jobs int: maximum number of concurrent operations; with more than
+                     one, operations start & finish in no particular order,
+                     so lines must not depend on each other
+    :param timeout float: maximum seconds to wait for the tasks of an
+                          operation (default: no limit)
+
+    """
+    def __init__(self, repo=None, jobs=1, timeout=None):
+        self.logger = logging.getLogger(__name__ + '.BatchRunner')
+        self.repo = repo
+        self.jobs = jobs
+        self.timeout = timeout
+
+    def _wait(self, repo_id, tasks):
+        """
+        Waits for the spawned tasks of an operation
+
+        :return: final state of every task (last known state of the tasks
+                 still pending after timeout)
+        :rtype: dict
+
+        """
+        tracker = pulpadm.tasks.TaskTracker(repo=self.repo)
+        tracker.track(task_ids=tasks, label=repo_id)
+        tracker.wait(timeout=self.timeout)
+        return dict((task["task_id"], task["state"]) for task in tracker.tasks)
+
+    def execute(self, operation):
+        """
+        Executes a single operation
+
+        :param operation dict: the operation (see parse_operation())
+        :return: the operation result (ie: repository information, task ids)
+
+        """
+        op = operation["op"]
+        repo_id = operation.get("id")
+        attrs = dict((key, value) for key, value in operation.items()
+                     if key not in ("op", "id", "fields", "wait"))
+
+        if op == "create":
+            self.repo.create(
+                repo_config=self.repo.generate_repo_create(repo_id=repo_id, **attrs))
+            return None
+        elif op == "update":
+            repo_update = self.repo.generate_repo_update(
+                repo_config=self.repo.generate_repo_create(repo_id=repo_id, **attrs),
+                repo=self.repo.get(repo_id=repo_id, details=True)[0]
+            )
+            tasks = self.repo.update(repo_id=repo_id, repo_update=repo_update)
+        elif op == "delete":
+            tasks = self.repo.delete(repo_id=repo_id)
+        elif op == "get":
+            return self.repo.get(repo_id=repo_id, fields=operation.get("fields"))[0]
+        else:
+            return [item if operation.get("fields") else item["id"]
+                    for item in self.repo.iter_repos(
+                        fields=operation.get("fields") or ["id"])]
+
+        if operation.get("wait") and tasks:
+            return self._wait(repo_id, tasks)
+        return tasks
+
+    def _job(self, numbered_line):
+        """
+        Parses & executes a numbered batch line, returning its result
+        """
+        number, line = numbered_line
+        result = {"line": number, "op": None, "id": None, "ok": False,
+                  "status": None, "result": None, "error": None}
+        try:
+            operation = parse_operation(line)
+        except ValueError as e:
+            result["error"] = "invalid operation: {0}".format(e)
+            return result
+        if operation is None:
+            return None
+        result["op"] = operation["op"]
+        result["id"] = operation.get("id")
+
+        job = executor.run(self.execute, [operation])[0]
+        result["ok"] = job.ok
+        result["result"] = job.value
+        if not job.ok:
+            result["status"] = getattr(job.error, "status", None)
+            result["error"] = "{0}".format(job.error)
+        return result
+
+    def run(self, lines):
+        """
+        Runs every line of a batch, one after the other (up to `jobs` at a
+        time, in no particular order, if jobs > 1)
+
+        :param lines iterable: batch lines (ie: a file object)
+        :return: a result per operation, in input order, as each completes
+        :rtype: generator
+
+        """
+        for job in executor.imap(self._job, enumerate(lines, 1), jobs=self.jobs):
+            if job.value is not None:
+                yield job.value
+
+
+def write_results(results, stream):
+    """
+    Writes results as newline-delimited JSON, flushing after each one
+
+    :return: whether every operation succeeded
+    :rtype: bool
+
+    """
+    ok = True
+    for result in results:
+        ok = ok and result["ok"]
+        stream.write(json.dumps(result, separators=(",", ":")) + "\n")
+        stream.flush()
+    return ok
+
+
+class _BatchHandler(socketserver.StreamRequestHandler):
+    """
+    Runs the batch sent over a socket connection and writes back the results
+    """
+    def handle(self):
+        lines = (line.decode("utf-8") for line in iter(self.rfile.readline, b""))
+        try:
+            write_results(self.server.runner.run(lines), _SocketWriter(self.wfile))
+        except (IOError, OSError):
+            pass
+
+
+class _SocketWriter(object):
+    """
+    Text wrapper of a socket file object
+    """
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, data):
+        self.wfile.write(data.encode("utf-8"))
+
+    def flush(self):
+        self.wfile.flush()
+
+
+class _BatchServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(runner=None, path=None):
+    """
+    Serves batches on a Unix socket until interrupted. Each connection sends
+    batch lines and receives one JSON result per operation. The socket is
+    only accessible by its owner, since operations run with the configured
+    Pulp credentials.
+
+    :param runner BatchRunner: runs the operations
+    :param path str: the Unix socket path
+    :return: None
+
+    """
+    logger = logging.getLogger(__name__ + '.serve')
+
+    path = os.path.expanduser(path)
+    if os.path.exists(path):
+        os.remove(path)
+    umask = os.umask(0o077)
+    try:
+        server = _BatchServer(path, _BatchHandler)
+    finally:
+        os.umask(umask)
+    server.runner = runner
+
+    # Stop (and remove the socket) on SIGTERM as well
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    logger.info("Listening on {0}".format(path))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        while thread.is_alive():
+            thread.join(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        os.remove(path)
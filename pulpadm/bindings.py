@@ -0,0 +1,109 @@
+from __future__ import print_function, unicode_literals
+
+
+# Distributor consumers are bound to, unless the bindings file says otherwise
+DISTRIBUTOR_ID = "yum_distributor"
+
+# Bindings file keys of a consumer given as a mapping (see read_bindings())
+REPOS = "repos"
+DISTRIBUTOR = "distributor_id"
+
+
+def read_bindings(data=None, distributor_id=DISTRIBUTOR_ID):
+    """
+    Reads the desired bindings from the bindings file: the repositories every
+    consumer (ie: child node) is bound to, as a list of repository ids or as
+    a mapping with a specific distributor:
+
+        node1.example.com: [epel-rhel7-x86_64, pulp-28-rhel7-x86_64]
+        node2.example.com:
+          distributor_id: export_distributor
+          repos: [epel-rhel7-x86_64]
+
+    :param data dict: the bindings file
+    :param distributor_id str: distributor of the consumers given as a list
+    :raises ValueError: if a consumer is neither a list nor a mapping
+    :return: (repo id, distributor id) bindings by consumer id
+    :rtype: dict
+
+    """
+    bindings = {}
+    for consumer_id, config in (data or {}).items():
+        distributor = distributor_id
+        if isinstance(config, dict):
+            distributor = config.get(DISTRIBUTOR) or distributor_id
+            config = config.get(REPOS)
+        if config is None:
+            config = []
+        if not isinstance(config, list):
+            raise ValueError("Consumer [{0}] must be a list of repository ids, or "
+                             "a mapping with `{1}'".format(consumer_id, REPOS))
+        bindings[consumer_id] = set(("{0}".format(repo_id), distributor)
+                                    for repo_id in config)
+    return bindings
+
+
+def current(repo=None, consumer_ids=None):
+    """
+    Fetches the current bindings of consumers from the Pulp server; bindings
+    being removed (pending unbind) are left out
+
+    :param repo RPMRepo: the API client
+    :param consumer_ids list: only these consumers (default: all)
+    :return: (repo id, distributor id) bindings by consumer id; consumers
+             unknown to the server are missing
+    :rtype: dict
+
+    """
+    filters = {"id": {"$in": sorted(consumer_ids)}} if consumer_ids is not None else None
+    bindings = {}
+    for consumer in repo.iter_consumers(fields=["id"], filters=filters, bindings=True):
+        bindings[consumer["id"]] = set(
+            (item["repo_id"], item["distributor_id"])
+            for item in consumer.get("bindings") or [] if not item.get("deleted"))
+    return bindings
+
+
+def delta(desired=None, actual=None, delete=False):
+    """
+    Computes the bind & unbind operations turning the actual bindings into
+    the desired ones. Only consumers of the bindings file are considered;
+    extra bindings are only unbound with `delete'.
+
+    :param desired dict: bindings by consumer id (see read_bindings())
+    :param actual dict: bindings by consumer id (see current())
+    :param delete bool: whether to unbind the bindings not in desired
+    :return: operations; dicts with op (bind or unbind), consumer_id,
+             repo_id & distributor_id, unbind first
+    :rtype: list
+
+    """
+    operations = []
+    for consumer_id in sorted(desired or {}):
+        have = (actual or {}).get(consumer_id, set())
+        want = desired[consumer_id]
+        ops = [("bind", item) for item in want - have]
+        if delete:
+            ops += [("unbind", item) for item in have - want]
+        for op, (repo_id, distributor_id) in ops:
+            operations.append({
+                "op": op,
+                "consumer_id": consumer_id,
+                "repo_id": repo_id,
+                "distributor_id": distributor_id
+            })
+    operations.sort(key=lambda item: (item["op"] != "unbind", item["consumer_id"],
+                                      item["repo_id"], item["distributor_id"]))
+    return operations
+
+
+def label(operation=None):
+    """
+    :return: label of an operation, ie: node1.example.com/epel-rhel7-x86_64
+             (followed by the distributor id, unless it is DISTRIBUTOR_ID)
+    :rtype: str
+    """
+    text = "{0}/{1}".format(operation["consumer_id"], operation["repo_id"])
+    if operation["distributor_id"] != DISTRIBUTOR_ID:
+        text += " ({0})".format(operation["distributor_id"])
+    return text
@@ -0,0 +1,170 @@
+from __future__ import print_function, unicode_literals
+import os
+import json
+import time
+import errno
+import hashlib
+import logging
+import threading
+
+
+class InventoryCache(object):
+    """
+    On-disk cache of read-only API responses (repository listings) for a
+    single Pulp server. Entries are used as-is for `ttl` seconds; afterwards
+    they are revalidated with conditional requests (ETag/Last-Modified) when
+    the server supports it. The oldest entries are evicted once the cache
+    grows over `max_size` bytes.
+
+    :param path str: cache directory of the Pulp server
+    :param ttl int: seconds an entry is used without revalidation
+    :param max_size int: maximum size of the cache directory (bytes)
+    :param refresh bool: if True, every entry is revalidated on first use
+
+    """
+    def __init__(self, path=None, ttl=60, max_size=52428800, refresh=False):
+        self.logger = logging.getLogger(__name__ + '.InventoryCache')
+        self.path = os.path.expanduser(path)
+        self.ttl = ttl
+        self.max_size = max_size
+        self.refresh = refresh
+        self._lock = threading.Lock()
+
+        # Cached responses may hold credentials (ie: feed certs & keys)
+        try:
+            os.makedirs(self.path, 0o700)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".json")
+
+    def key(self, method, url, params=None, data=None):
+        """
+        Generates the cache key of an API request
+
+        :return: cache key
+        :rtype: str
+
+        """
+        request = json.dumps([method, url, params, data], sort_keys=True)
+        return hashlib.sha1(request.encode("utf-8")).hexdigest()
+
+    def load(self, key):
+        """
+        Reads a cache entry
+
+        :param key str: cache key
+        :return: cache entry (stored, etag, last_modified & data), None if
+                 the entry does not exist or cannot be read
+        :rtype: dict
+
+        """
+        try:
+            with open(self._file(key), "r") as stream:
+                return json.load(stream)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def is_fresh(self, entry):
+        """
+        :return: whether an entry can be used without revalidation
+        :rtype: bool
+        """
+        if self.refresh:
+            return False
+        return time.time() - entry.get("stored", 0) < self.ttl
+
+    def store(self, key, data, etag=None, last_modified=None):
+        """
+        Writes (atomically) a cache entry and evicts the oldest entries if the
+        cache grew over max_size
+
+        :param key str: cache key
+        :param data: the decoded API response
+        :param etag str: ETag header of the response
+        :param last_modified str: Last-Modified header of the response
+        :return: None
+
+        """
+        entry = {
+            "stored": time.time(),
+            "etag": etag,
+            "last_modified": last_modified,
+            "data": data
+        }
+        tmp = "{0}.{1}.tmp".format(self._file(key), threading.current_thread().ident)
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as stream:
+                stream.write(json.dumps(entry, separators=(",", ":")))
+            os.rename(tmp, self._file(key))
+        except (IOError, OSError) as e:
+            self.logger.warning("Unable to write cache entry: {0}".format(e))
+            return
+        self.evict()
+
+    def touch(self, key):
+        """
+        Marks an entry as revalidated (fresh for another ttl seconds)
+
+        :param key str: cache key
+        :return: None
+
+        """
+        entry = self.load(key)
+        if entry is not None:
+            self.store(key, entry["data"], entry.get("etag"),
+                       entry.get("last_modified"))
+
+    def _entries(self):
+        """
+        :return: (mtime, size, path) of every cache entry
+        :rtype: list
+        """
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.path, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def evict(self):
+        """
+        Removes the least recently stored entries until the cache fits in
+        max_size
+
+        :return: None
+
+        """
+        with self._lock:
+            entries = sorted(self._entries())
+            size = sum(item[1] for item in entries)
+            while entries and size > self.max_size:
+                mtime, entry_size, path = entries.pop(0)
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                size -= entry_size
+                self.logger.debug("Evicted cache entry {0}".format(path))
+
+    def clear(self):
+        """
+        Removes every entry (ie: after the server state changed)
+
+        :return: None
+
+        """
+        with self._lock:
+            for mtime, size, path in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
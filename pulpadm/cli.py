@@ -1,22 +1,242 @@
 from __future__ import absolute_import, print_function
+import re
 import sys
+import copy
 import json
 import argparse
 import logging
 import logging.config
-import pkg_resources
+import os
+import time
+import pulpadm.batch
+import pulpadm.bindings
+import pulpadm.cache
+import pulpadm.executor as executor
+import pulpadm.fleet
+import pulpadm.metrics
+import pulpadm.orphans
+import pulpadm.plan
+import pulpadm.profiling
+import pulpadm.promote
 import pulpadm.repo
+import pulpadm.retry
+import pulpadm.selector
+import pulpadm.tasks
+import pulpadm.units
 import pulpadm.utils as utils
-from pulpadm.constants import PKG_NAME, PKG_DESC, CONFIG_FILE
+from pulpadm.repo import FINGERPRINT_NOTE
+from pulpadm.errors import PulpError, InputError, exit_status
+from pulpadm.constants import PKG_NAME, PKG_DESC, VERSION, CONFIG_FILE, CACHE_DIR, \
+    CACHE_TTL, CACHE_MAX_SIZE, POOL_CONNECTIONS, POOL_MAXSIZE, UNITS_DIR, ORPHANS_BATCH_SIZE, \
+    SYNC_CONCURRENCY, SYNC_MAX_WAITING, PROMOTE_CONCURRENCY, PUBLISH_CONCURRENCY, RETRIES, \
+    RETRY_BACKOFF, RETRY_BACKOFF_MAX, BREAKER_THRESHOLD, BREAKER_TIMEOUT, WAIT_TIMEOUT
+
+
+def batch(args):
+    """
+    Wrapper function for section: Batch
+    """
+    # Initiate RPMRepo object, shared by every operation
+    repo = init_repo(args)
+    runner = pulpadm.batch.BatchRunner(repo=repo, jobs=args.jobs,
+                                       timeout=args.wait_timeout)
+
+    # Serve batches on a Unix socket, or run a single batch (file or stdin)
+    ok = True
+    if args.socket:
+        pulpadm.batch.serve(runner=runner, path=args.socket)
+    else:
+        stream = sys.stdin if args.path == "-" else open(os.path.expanduser(args.path))
+        lines = (line.decode("utf-8") if isinstance(line, bytes) else line
+                 for line in stream)
+        ok = pulpadm.batch.write_results(runner.run(lines), sys.stdout)
+    repo.close()
+    if not ok:
+        sys.exit(1)
+
+
+def init_repo(args, refresh=False):
+    """
+    Initiate RPMRepo object from the Pulp server info
+
+    Actions reconciling the server with an input file (ie: import, drift)
+    pass refresh=True: Pulp v2 sends no ETag nor Last-Modified, so cached
+    listings cannot be revalidated and would hide repositories created or
+    deleted by other clients. Their listings are fetched from the server
+    (and stored, for later read-only actions).
+    """
+    # Inventory cache, one directory per Pulp server & account
+    cache = None
+    if not args.no_cache:
+        cache = pulpadm.cache.InventoryCache(
+            path=os.path.join(args.cache_dir, "{0}_{1}_{2}".format(
+                args.hostname, args.port, args.username)),
+            ttl=args.cache_ttl, max_size=args.cache_max_size,
+            refresh=args.refresh or refresh
+        )
+
+    return pulpadm.repo.RPMRepo(
+        hostname=args.hostname, port=args.port,
+        username=args.username, password=args.password,
+        pool_connections=args.pool_connections,
+        pool_maxsize=max(args.pool_maxsize, getattr(args, "jobs", 1)),
+        pool_block=args.pool_block,
+        keep_alive=args.keep_alive,
+        cache=cache,
+        metrics=args.metrics,
+        retry=pulpadm.retry.RetryPolicy(
+            retries=args.retries, backoff=args.retry_backoff,
+            backoff_max=args.retry_backoff_max),
+        breaker=pulpadm.retry.CircuitBreaker(
+            threshold=args.breaker_threshold, timeout=args.breaker_timeout)
+    )
+
+
+def server_args(args, c):
+    """
+    Sets the Pulp server info of an action from its config file settings;
+    CLI Args supersedes the values from the CONFIG_FILE
+    """
+    args.hostname = args.hostname if args.hostname else c.get("hostname", None)
+    args.port = args.port if args.port else c.get("port", None)
+    args.username = args.username if args.username else c.get("username", None)
+    args.password = args.password if args.password else c.get("password", None)
+    args.pool_connections = c.get("pool_connections", POOL_CONNECTIONS)
+    args.pool_maxsize = c.get("pool_maxsize", POOL_MAXSIZE)
+    args.pool_block = c.get("pool_block", False)
+    args.keep_alive = c.get("keep_alive", True)
+    return args
+
+
+def run_fleet(args, servers):
+    """
+    Runs an action on several Pulp servers concurrently, each one with its
+    own connection pool. Output lines are labelled with the server name.
+
+    :return: exit status; 0 if the action succeeded on every server
+    """
+    logger = logging.getLogger(__name__ + ".run_fleet")
+
+    # Label every output line with the server it comes from; the original
+    # streams are restored once every server is done
+    stdout = pulpadm.fleet.LabelledStream(sys.stdout)
+    stderr = pulpadm.fleet.LabelledStream(sys.stderr)
+    handlers = [handler for handler in logging.getLogger().handlers
+                if getattr(handler, "stream", None) is sys.stderr]
+
+    def job(server):
+        name, c = server
+        executor.set_label(name)
+        start = time.time()
+        server_args_ = server_args(copy.copy(args), c)
+
+        # Plan files are per server
+        if args.func is repo_apply:
+            server_args_.path = "{0}.{1}".format(args.path, name)
+        if getattr(args, "plan", None):
+            server_args_.plan = "{0}.{1}".format(args.plan, name)
+
+        try:
+            args.func(server_args_)
+            status = 0
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else int(e.code is not None)
+        except (PulpError, InputError) as e:
+            logger.error("\033[0;31m" + "{0}".format(e) + "\033[0m")
+            status = exit_status(e)
+        logger.info("Done in {0:.1f}s{1}".format(
+            time.time() - start, " (exit status {0})".format(status) if status else ""))
+
+        # Last lines without a trailing newline
+        stdout.end()
+        stderr.end()
+        return status
+
+    for handler in handlers:
+        handler.stream = stderr
+    sys_stdout, sys_stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = stdout, stderr
+    try:
+        results = executor.run(job, servers, jobs=len(servers))
+    finally:
+        sys.stdout, sys.stderr = sys_stdout, sys_stderr
+        for handler in handlers:
+            handler.stream = sys_stderr
+        executor.set_label(None)
+    failed = [result for result in results if result.value or not result.ok]
+    if failed:
+        msg = "Failed on servers: {0}".format(
+            ", ".join(result.item[0] for result in failed))
+        logger.error("\033[0;31m" + msg + "\033[0m")
+        return failed[0].value or 1
+    return 0
+
+
+def report_results(action, results):
+    """
+    Logs the outcome of a bulk action in input order
+
+    :return: exit status; 0 if every job succeeded
+    """
+    logger = logging.getLogger(__name__ + ".report_results")
+
+    if not results:
+        return 0
+    failed = [result for result in results if not result.ok]
+    for result in results:
+        logger.debug("{0} [{1}]: {2}".format(
+            action.title(), result.item, "ok" if result.ok else "failed"))
+    logger.info("{0}: {1} succeeded, {2} failed".format(
+        action.title(), len(results) - len(failed), len(failed)))
+    if failed:
+        msg = "Failed to {0} repositories: {1}".format(
+            action, ", ".join(result.item for result in failed))
+        logger.error("\033[0;31m" + msg + "\033[0m")
+        return executor.error_status(failed[0])
+    return 0
+
+
+def wait_tasks(repo, results, timeout=None):
+    """
+    Waits (up to timeout seconds) for the tasks spawned by a bulk action and
+    prints how long each one spent queued and running; tasks still pending
+    after timeout are reported in their last known state, as failed
+
+    :return: exit status; 0 if every task finished successfully
+    """
+    logger = logging.getLogger(__name__ + ".wait_tasks")
+
+    tracker = pulpadm.tasks.TaskTracker(repo=repo)
+    for result in results:
+        if result.ok:
+            tracker.track(task_ids=result.value, label=result.item)
+    if not tracker.tasks:
+        return 0
+    if not tracker.wait(timeout=timeout):
+        msg = "Timed out after {0}s waiting for {1} task(s)".format(
+            timeout, len(tracker.pending()))
+        logger.error("\033[0;31m" + msg + "\033[0m")
+
+    print()
+    print("Tasks:")
+    for task in tracker.tasks:
+        print("  {0:<40} {1:<10} queued: {2:>7.1f}s  running: {3:>7.1f}s".format(
+            task["label"], task["state"], task["queued_time"] or 0.0,
+            task["running_time"] or 0.0))
+    print()
+    failed = [task for task in tracker.tasks if task["state"] != "finished"]
+    return 1 if failed else 0
 
 
 def repo_create_generate(args):
     """
     Wrapper function for action: Create & Generate
     """
-    # Initiate RPMRepo object
-    repo = pulpadm.repo.RPMRepo(hostname=args.hostname, port=args.port,
-                                username=args.username, password=args.password)
+    # Initiate RPMRepo object (generate does not talk to the Pulp server)
+    if getattr(args, "offline", False):
+        repo = pulpadm.repo.RPMRepo()
+    else:
+        repo = init_repo(args)
 
     # Map CLI args and generate repo create object for end-point API
     repo_attrs = {
@@ -32,13 +252,22 @@ def repo_create_generate(args):
         "proxy_host": args.proxy_host,
         "proxy_port": args.proxy_port
     }
-    data = repo.generate_repo_create(repo_id=args.repo_id, **repo_attrs)
 
     # Print object as JSON or send request to API (create)
+    status = 0
     if args.action == "generate":
+        data = repo.generate_repo_create(repo_id=args.repo_id, **repo_attrs)
         print(json.dumps(data, indent=4, separators=(",", ": ")))
     elif args.action == "create":
-        repo.create(repo_config=data)
+        results = executor.run(
+            lambda repo_id: repo.create(
+                repo_config=repo.generate_repo_create(repo_id=repo_id, **repo_attrs)),
+            args.repo_id, jobs=args.jobs
+        )
+        status = report_results("create", results)
+    repo.close()
+    if status:
+        sys.exit(status)
 
 
 def repo_delete(args):
@@ -46,53 +275,261 @@ def repo_delete(args):
     Wrapper function for action: Delete
     """
     # Initiate RPMRepo object
-    repo = pulpadm.repo.RPMRepo(hostname=args.hostname, port=args.port,
-                                username=args.username, password=args.password)
+    repo = init_repo(args)
 
     # Delete repo(s)
-    for item in args.repo_id:
-        repo.delete(repo_id=item)
+    results = executor.run(
+        lambda repo_id: repo.delete(repo_id=repo_id), args.repo_id, jobs=args.jobs)
+    status = report_results("delete", results)
+    if args.wait:
+        status = wait_tasks(repo, results, timeout=args.wait_timeout) or status
+    repo.close()
+    if status:
+        sys.exit(status)
+
+
+def run_operations(args, repo, operations, progress=None):
+    """
+    Applies create/update/delete operations: deletions first, then updates
+    and creations, each batch with up to --jobs concurrent requests
+
+    :return: exit status; 0 if every operation succeeded
+    """
+    status = 0
+    for op in pulpadm.plan.OPERATIONS:
+        payloads = dict((item["id"], item.get("payload")) for item in operations
+                        if item["op"] == op)
+        if not payloads:
+            continue
+
+        def job(repo_id, op=op):
+            if op == "delete":
+                value = repo.delete(repo_id=repo_id)
+            elif op == "update":
+                value = repo.update(repo_id=repo_id, repo_update=payloads[repo_id])
+            else:
+                value = repo.create(repo_config=payloads[repo_id])
+            if progress is not None:
+                progress.mark(op, repo_id)
+            return value
+
+        results = executor.run(job, sorted(payloads), jobs=args.jobs)
+        status = report_results(op, results) or status
+
+        # Deletion (and config updates) must be done before creating
+        # repositories
+        if args.wait and op != "create":
+            status = wait_tasks(repo, results, timeout=args.wait_timeout) or status
+    return status
+
+
+def repo_apply(args):
+    """
+    Wrapper function for action: Apply
+    """
+    logger = logging.getLogger(__name__ + ".repo_apply")
+
+    # Initiate RPMRepo object
+    repo = init_repo(args)
+
+    # Read plan and skip operations applied by a previous (partial) run
+    with pulpadm.profiling.phase("parse"):
+        plan = pulpadm.plan.read_plan(path=args.path)
+    if plan is None:
+        sys.exit(1)
+    server = "{0}:{1}".format(args.hostname, args.port)
+    if plan["server"] != server:
+        msg = "Plan was computed against [{0}], not [{1}]".format(plan["server"], server)
+        logger.error("\033[0;31m" + msg + "\033[0m")
+        sys.exit(1)
+    progress = pulpadm.plan.PlanProgress(path=args.path)
+    operations = [item for item in plan["operations"]
+                  if not progress.is_done(item["op"], item["id"])]
+
+    print()
+    print("Total of Operations:")
+    for op in pulpadm.plan.OPERATIONS:
+        print("{0:>8}: {1}".format(op.title(), len(
+            [item for item in operations if item["op"] == op])))
+    print("{0:>8}: {1}".format("Done", len(plan["operations"]) - len(operations)))
+    print()
+
+    with pulpadm.profiling.phase("apply"):
+        status = run_operations(args, repo, operations, progress=progress)
+    repo.close()
+    if status:
+        sys.exit(status)
 
 
 def repo_import(args):
     """
     Wrapper function for action: Import
     """
-    # Initiate RPMRepo object
-    repo = pulpadm.repo.RPMRepo(hostname=args.hostname, port=args.port,
-                                username=args.username, password=args.password)
+    logger = logging.getLogger(__name__ + ".repo_import")
 
-    # Get list of existing repo(s)
-    repo_pulp = [item["id"] for item in repo.get()]
+    if args.orphans and not args.delete:
+        msg = "--orphans requires --delete"
+        logger.error("\033[0;31m" + msg + "\033[0m")
+        sys.exit(1)
 
-    # Read data from file
-    data_yaml = utils.read_yaml(path=args.path)
-    repo_yaml = data_yaml.keys()
+    # Initiate RPMRepo & RepoSelector objects; creations & deletions are
+    # decided on a fresh listing
+    repo = init_repo(args, refresh=True)
+    selector = init_selector(args)
+
+    # Get list of existing repo(s) in scope, and their config fingerprint if
+    # they are to be updated. Id selectors narrow the search server side
+    repo_fingerprint = dict(
+        (item["id"], (item.get("notes") or {}).get(FINGERPRINT_NOTE))
+        for item in pulpadm.profiling.timed("fetch", repo.iter_repos(
+            fields=["id", "notes"] if args.update else ["id"],
+            filters=selector.server_filters()))
+        if selector.match_id(item["id"]))
+    repo_pulp = list(repo_fingerprint)
+
+    # Read data from file; whole file (compiled cache with --yaml-cache), or
+    # one entry at a time. Only the API objects needed later on are kept
+    if args.stream:
+        entries = utils.iter_yaml(path=args.path, strict=True,
+                                  select=selector.match_id if selector.active else None)
+    else:
+        with pulpadm.profiling.phase("parse"):
+            data_yaml = utils.read_yaml(path=args.path, cache=args.yaml_cache, strict=True)
+        entries = (data_yaml or {}).iteritems()
+    repo_pulp = set(repo_pulp)
+    repo_yaml = set()
+    repo_config = {}
+    for repo_id, repo_attrs in pulpadm.profiling.timed("parse", entries):
+        if selector.active and not selector.match(repo_id, repo_attrs):
+            continue
+        repo_yaml.add(repo_id)
+        if repo_id not in repo_pulp or args.update:
+            with pulpadm.profiling.phase("diff"):
+                repo_config[repo_id] = repo.generate_repo_create(
+                    repo_id=repo_id, **(repo_attrs or {}))
+
+    # Repos on the server have no tags: with --tag, only the tagged repos of
+    # the yaml file are in scope
+    if selector.tags:
+        repo_pulp &= repo_yaml
 
     # Generate set of repo(s):
     #   Create => set of repos on yaml file - set of existing repos
     #   Delete => set of existing repos - set of repos on yaml file
-    #   Update => union of existing repos and repos on yaml file
+    #   Update => existing repos on yaml file whose config differs
     repo_list = {
-        "create": list(set(repo_yaml) - set(repo_pulp)),
-        "delete": list(set(repo_pulp) - set(repo_yaml)),
-        "update": list(set.union(set(repo_pulp), set(repo_yaml)))
+        "create": list(repo_yaml - repo_pulp),
+        "delete": list(repo_pulp - repo_yaml)
     }
+    repo_update = {}
+    if args.update:
+        # Only repos whose fingerprint differs are fetched & compared, unless
+        # --deep (changes made outside pulpadm keep the fingerprint)
+        existing = list(repo_pulp & repo_yaml)
+        if not args.deep:
+            existing = [repo_id for repo_id in existing
+                        if repo_fingerprint[repo_id] !=
+                        repo_config[repo_id]["notes"][FINGERPRINT_NOTE]]
+        if existing:
+            for item in pulpadm.profiling.timed("fetch", repo.iter_repos(
+                    details=True, filters={"id": {"$in": existing}})):
+                with pulpadm.profiling.phase("diff"):
+                    data = repo.generate_repo_update(
+                        repo_config=repo_config[item["id"]], repo=item)
+                if data:
+                    repo_update[item["id"]] = data
+        repo_list["update"] = sorted(repo_update)
     print()
     print("Total of Repositories:")
     for k, v in repo_list.iteritems():
         print("{0:>8}: {1}".format(k.title(), len(v)))
     print()
 
-    # Delete repo(s)
+    # Generate plan operations (API payloads included)
+    operations = []
     if args.delete:
-        for repo_id in repo_list["delete"]:
-            repo.delete(repo_id=repo_id)
+        operations.extend({"op": "delete", "id": repo_id}
+                          for repo_id in sorted(repo_list["delete"]))
+    operations.extend({"op": "update", "id": repo_id, "payload": repo_update[repo_id]}
+                      for repo_id in sorted(repo_update))
+    operations.extend({"op": "create", "id": repo_id, "payload": repo_config[repo_id]}
+                      for repo_id in sorted(repo_list["create"]))
+
+    # Write plan for a later `repo apply', or apply right away; orphans are
+    # only removed once the deletion tasks are done
+    args.wait = args.wait or args.orphans
+    status = 0
+    with pulpadm.profiling.phase("apply"):
+        if args.plan:
+            pulpadm.plan.write_plan(
+                path=args.plan, server="{0}:{1}".format(args.hostname, args.port),
+                operations=operations
+            )
+            print("Plan with {0} operation(s) written to {1}".format(
+                len(operations), args.plan))
+        else:
+            status = run_operations(args, repo, operations)
+            if args.orphans and not status:
+                status = remove_orphans(args, repo)
+    repo.close()
+    if status:
+        sys.exit(status)
 
-    # Create repo(s)
-    for repo_id in repo_list["create"]:
-        data = repo.generate_repo_create(repo_id=repo_id, **data_yaml[repo_id])
-        repo.create(repo_config=data)
+
+def repo_drift(args):
+    """
+    Wrapper function for action: Drift
+    """
+    # Initiate RPMRepo object; drift is computed on a fresh listing
+    repo = init_repo(args, refresh=True)
+
+    # Get the config fingerprint of existing repo(s); only ids & notes
+    actual = dict(
+        (item["id"], (item.get("notes") or {}).get(FINGERPRINT_NOTE))
+        for item in pulpadm.profiling.timed("fetch", repo.iter_repos(fields=["id", "notes"])))
+    repo.close()
+
+    # Fingerprint of every repo on the yaml file
+    if args.stream:
+        entries = utils.iter_yaml(path=args.path, strict=True)
+    else:
+        with pulpadm.profiling.phase("parse"):
+            entries = (utils.read_yaml(path=args.path, cache=args.yaml_cache,
+                                       strict=True) or {}).iteritems()
+    desired = {}
+    for repo_id, repo_attrs in pulpadm.profiling.timed("parse", entries):
+        with pulpadm.profiling.phase("diff"):
+            desired[repo_id] = repo.generate_repo_create(
+                repo_id=repo_id, **(repo_attrs or {}))["notes"][FINGERPRINT_NOTE]
+
+    # Generate set of repo(s):
+    #   Missing   => on yaml file, but not on the server
+    #   Extra     => on the server, but not on yaml file
+    #   Changed   => fingerprint differs from the yaml file config
+    #   Untracked => no fingerprint (not created/updated by pulpadm yet)
+    both = set(desired) & set(actual)
+    drift = [
+        ("missing", sorted(set(desired) - set(actual))),
+        ("extra", sorted(set(actual) - set(desired))),
+        ("changed", sorted(repo_id for repo_id in both
+                           if actual[repo_id] and actual[repo_id] != desired[repo_id])),
+        ("untracked", sorted(repo_id for repo_id in both if not actual[repo_id]))
+    ]
+
+    # Print data
+    print()
+    print("Drift:")
+    for state, repo_ids in drift:
+        for repo_id in repo_ids:
+            print("{0:>11}: {1}".format(state.title(), repo_id))
+    print()
+    print("Total of Repositories:")
+    for state, repo_ids in drift:
+        print("{0:>11}: {1}".format(state.title(), len(repo_ids)))
+    print("{0:>11}: {1}".format("In Sync", len(both) - len(drift[2][1]) - len(drift[3][1])))
+    print()
+    if any(repo_ids for state, repo_ids in drift):
+        sys.exit(1)
 
 
 def repo_list(args):
@@ -100,17 +537,32 @@ def repo_list(args):
     Wrapper function for action: List
     """
     # Initiate RPMRepo object
-    repo = pulpadm.repo.RPMRepo(hostname=args.hostname, port=args.port,
-                                username=args.username, password=args.password)
+    repo = init_repo(args)
 
-    # Get repo(s) and information
-    data = repo.get(repo_id=args.repo_id, details=args.details)
+    # Get repo(s) and information; only the displayed fields are requested.
+    # All repositories are fetched page by page, so output starts right away
+    def get(**kwargs):
+        if args.repo_id:
+            return pulpadm.profiling.timed("fetch", repo.get(repo_id=args.repo_id, **kwargs))
+        return pulpadm.profiling.timed("fetch", repo.iter_repos(**kwargs))
 
-    # Print data => details | summary | simple
+    # Print data => details | ndjson | summary | simple
     if args.details:
-        print(json.dumps(data, indent=4, separators=(",", ": ")))
+        print("[")
+        for i, item in enumerate(get(details=True)):
+            if i:
+                print(",")
+            data = json.dumps(item, indent=4, separators=(",", ": "))
+            sys.stdout.write("\n".join("    " + line for line in data.splitlines()))
+            sys.stdout.flush()
+        print()
+        print("]")
+    elif args.ndjson:
+        for item in get(details=True):
+            print(json.dumps(item, separators=(",", ":")))
+            sys.stdout.flush()
     elif args.summary:
-        for item in data:
+        for item in get(fields=["id", "display_name", "content_unit_counts"]):
             print()
             print("{0:<22}{1}".format("Id:", item["id"]))
             print("{0:<22}{1}".format("Display Name:", item["display_name"]))
@@ -118,13 +570,550 @@ def repo_list(args):
             if item["content_unit_counts"]:
                 for key, value in item["content_unit_counts"].iteritems():
                     print("  {0}{1}".format(key.replace("_", " ").title() + ": ", value))
+            sys.stdout.flush()
     else:
-        for item in data:
+        for item in get(fields=["id"]):
             print(item["id"])
+            sys.stdout.flush()
+    repo.close()
+
+
+def repo_promote(args):
+    """
+    Wrapper function for action: Promote
+    """
+    logger = logging.getLogger(__name__ + ".repo_promote")
+
+    # Release tier chains from the repos file, downstream tiers first
+    data = utils.read_yaml(path=args.path, cache=args.yaml_cache, strict=True)
+    chains = pulpadm.promote.read_chains(data if type(data) is dict else {})
+    try:
+        tiers = pulpadm.promote.tiers(chains, args.repo_id)
+    except ValueError as e:
+        logger.error("\033[0;31m" + "{0}".format(e) + "\033[0m")
+        sys.exit(1)
+    if not tiers:
+        msg = "No repositories to promote; see `promote_from' in the repos file"
+        logger.error("\033[0;31m" + msg + "\033[0m")
+        sys.exit(1)
+
+    # Print the promotion order only
+    if args.dry_run:
+        for i, tier in enumerate(tiers):
+            print("Tier {0}:".format(i + 1))
+            for repo_id in tier:
+                print("  {0} <- {1}".format(repo_id, chains[repo_id][0]))
+        return
+
+    # Initiate RPMRepo object
+    repo = init_repo(args)
+
+    # Promote (then publish) every repository of a tier concurrently; a tier
+    # starts once every task of the previous (downstream) one is done
+    type_ids = [item.strip() for item in args.type_ids.split(",")] if args.type_ids else None
+    override_config = {"recursive": True} if args.recursive else None
+    stages = [lambda repo_id: repo.associate(
+        repo_id=repo_id, source_repo_id=chains[repo_id][0], type_ids=type_ids,
+        filters=chains[repo_id][1], override_config=override_config)]
+    if args.publish:
+        stages.append(lambda repo_id: repo.publish(repo_id=repo_id,
+                                                   distributor_id=args.publish))
+    start = time.time()
+    jobs = []
+    for i, tier in enumerate(tiers):
+        logger.info("Promoting tier {0}/{1}: {2} repositories".format(
+            i + 1, len(tiers), len(tier)))
+        scheduler = pulpadm.tasks.TaskScheduler(
+            repo=repo, concurrency=args.concurrency,
+            max_running=args.max_running, max_waiting=args.max_waiting,
+            timeout=args.wait_timeout
+        )
+        for job in scheduler.run([(repo_id, stages) for repo_id in tier]):
+            job["tier"] = i + 1
+            jobs.append(job)
+    elapsed = time.time() - start
+    repo.close()
+
+    # Print data => per repo durations & aggregate throughput
+    failed = [job for job in jobs if job["state"] != "finished"]
+    print()
+    print("Promotions:")
+    for job in jobs:
+        print("  [tier {0}] {1:<50} {2:<9} running: {3:>7.1f}s  total: {4:>7.1f}s{5}".format(
+            job["tier"], "{0} <- {1}".format(job["label"], chains[job["label"]][0]),
+            job["state"], sum(task["running_time"] or 0.0 for task in job["tasks"]),
+            job["finished"] - job["submitted"] if job["submitted"] else 0.0,
+            "  ({0})".format(job["error"]) if job["error"] else ""))
+    print()
+    print("{0:<22}{1} ({2} failed)".format("Repositories:", len(jobs), len(failed)))
+    print("{0:<22}{1}".format("Tiers:", len(tiers)))
+    print("{0:<22}{1:.1f}s".format("Elapsed:", elapsed))
+    print("{0:<22}{1:.1f} repositories/min".format(
+        "Throughput:", (len(jobs) - len(failed)) * 60.0 / max(elapsed, 0.001)))
+    print()
+    if failed:
+        msg = "Failed to promote repositories: {0}".format(
+            ", ".join(job["label"] for job in failed))
+        logger.error("\033[0;31m" + msg + "\033[0m")
+        sys.exit(1)
+
+
+def repo_publish(args):
+    """
+    Wrapper function for action: Publish
+    """
+    logger = logging.getLogger(__name__ + ".repo_publish")
+
+    # Initiate RPMRepo object; listings are fetched from the server, since
+    # unchanged repositories are skipped
+    repo = init_repo(args, refresh=True)
+
+    # Repositories to publish: given ids and/or the ones in a repos file
+    # (all of them only if neither is given), with their unit counts &
+    # distributors
+    repo_ids = list(args.repo_id)
+    if args.path:
+        repo_ids.extend(sorted(utils.read_yaml(path=args.path, cache=args.yaml_cache,
+                                               strict=True) or {}))
+        if not repo_ids:
+            msg = "No repositories to publish"
+            logger.error("\033[0;31m" + msg + "\033[0m")
+            sys.exit(1)
+    filters = {"id": {"$in": repo_ids}} if repo_ids else None
+    repos = list(repo.iter_repos(
+        details=True, filters=filters,
+        fields=["id", "content_unit_counts", "last_unit_added", "last_unit_removed"]
+    ))
+
+    # Skip repositories without the distributor, or unchanged since their
+    # last publish through it (unless --force)
+    queue = []
+    skipped = {"Unchanged:": [], "No distributor:": []}
+    for item in repos:
+        distributor = [d for d in item.get("distributors") or []
+                       if d.get("id") == args.distributor_id]
+        if not distributor:
+            skipped["No distributor:"].append(item["id"])
+        elif not args.force and not pulpadm.repo.changed_since_publish(item, distributor[0]):
+            skipped["Unchanged:"].append(item["id"])
+        else:
+            queue.append((item["id"], sum((item.get("content_unit_counts") or {}).values())))
+    missing = set(repo_ids) - set(item["id"] for item in repos)
+    if missing:
+        msg = "Repositories not found: {0}".format(", ".join(sorted(missing)))
+        logger.error("\033[0;31m" + msg + "\033[0m")
+
+    # Publish queue priority: smallest (or largest) repositories first
+    if args.order == "smallest":
+        queue.sort(key=lambda item: (item[1], item[0]))
+    elif args.order == "largest":
+        queue.sort(key=lambda item: (-item[1], item[0]))
+    else:
+        queue.sort()
+    units = dict(queue)
+
+    # Publish every repository, throttled by the server load
+    stages = [lambda repo_id: repo.publish(repo_id=repo_id,
+                                           distributor_id=args.distributor_id)]
+    scheduler = pulpadm.tasks.TaskScheduler(
+        repo=repo, concurrency=args.concurrency,
+        max_running=args.max_running, max_waiting=args.max_waiting,
+        timeout=args.wait_timeout
+    )
+    start = time.time()
+    jobs = scheduler.run([(repo_id, stages) for repo_id, _ in queue])
+    elapsed = time.time() - start
+    repo.close()
+
+    # Print data => per repo durations & totals
+    failed = [job for job in jobs if job["state"] != "finished"]
+    running = [sum(task["running_time"] or 0.0 for task in job["tasks"]) for job in jobs]
+    print()
+    print("Publishes ({0}):".format(args.distributor_id))
+    for job, job_running in zip(jobs, running):
+        print("  {0:<40} {1:>8} units  {2:<9} running: {3:>7.1f}s  total: {4:>7.1f}s{5}".format(
+            job["label"], units[job["label"]], job["state"], job_running,
+            job["finished"] - job["submitted"] if job["submitted"] else 0.0,
+            "  ({0})".format(job["error"]) if job["error"] else ""))
+    print()
+    print("{0:<22}{1} ({2} failed)".format("Repositories:", len(jobs), len(failed)))
+    for reason, items in sorted(skipped.items(), reverse=True):
+        print("{0:<22}{1} (skipped)".format(reason, len(items)))
+    print("{0:<22}{1:.1f}s".format("Publish time:", sum(running)))
+    print("{0:<22}{1:.1f}s".format("Elapsed:", elapsed))
+    print()
+    if failed or missing:
+        if failed:
+            msg = "Failed to publish repositories: {0}".format(
+                ", ".join(job["label"] for job in failed))
+            logger.error("\033[0;31m" + msg + "\033[0m")
+        sys.exit(1)
+
+
+def repo_sync(args):
+    """
+    Wrapper function for action: Sync
+    """
+    logger = logging.getLogger(__name__ + ".repo_sync")
+
+    # Initiate RPMRepo object; listings are fetched from the server
+    repo = init_repo(args, refresh=True)
+
+    # Repositories to sync: given ids and/or the ones in a repos file
+    repo_ids = list(args.repo_id)
+    if args.path:
+        repo_ids.extend(sorted(utils.read_yaml(path=args.path, cache=args.yaml_cache,
+                                               strict=True) or {}))
+    repo_ids = [repo_id for i, repo_id in enumerate(repo_ids) if repo_id not in repo_ids[:i]]
+    if not repo_ids:
+        msg = "No repositories to sync"
+        logger.error("\033[0;31m" + msg + "\033[0m")
+        sys.exit(1)
+
+    # Sync (then publish) every repository, throttled by the server load
+    override_config = {"max_speed": args.max_speed} if args.max_speed else None
+    stages = [lambda repo_id: repo.sync(repo_id=repo_id, override_config=override_config)]
+    if args.publish:
+        stages.append(lambda repo_id: repo.publish(repo_id=repo_id,
+                                                   distributor_id=args.publish))
+    scheduler = pulpadm.tasks.TaskScheduler(
+        repo=repo, concurrency=args.concurrency,
+        max_running=args.max_running, max_waiting=args.max_waiting,
+        timeout=args.wait_timeout
+    )
+    start = time.time()
+    jobs = scheduler.run([(repo_id, stages) for repo_id in repo_ids])
+    elapsed = time.time() - start
+    repo.close()
+
+    # Print data => per repo durations & aggregate throughput
+    failed = [job for job in jobs if job["state"] != "finished"]
+    busy = sum(job["finished"] - job["submitted"] for job in jobs if job["submitted"])
+    print()
+    print("Syncs:")
+    for job in jobs:
+        print("  {0:<40} {1:<9} running: {2:>7.1f}s  total: {3:>7.1f}s{4}".format(
+            job["label"], job["state"],
+            sum(task["running_time"] or 0.0 for task in job["tasks"]),
+            job["finished"] - job["submitted"] if job["submitted"] else 0.0,
+            "  ({0})".format(job["error"]) if job["error"] else ""))
+    print()
+    print("{0:<22}{1} ({2} failed)".format("Repositories:", len(jobs), len(failed)))
+    print("{0:<22}{1:.1f}s".format("Elapsed:", elapsed))
+    print("{0:<22}{1:.1f} repositories/min".format(
+        "Throughput:", (len(jobs) - len(failed)) * 60.0 / max(elapsed, 0.001)))
+    print("{0:<22}{1:.1f}".format("Avg. Concurrency:", busy / max(elapsed, 0.001)))
+    print()
+    if failed:
+        msg = "Failed to sync repositories: {0}".format(
+            ", ".join(job["label"] for job in failed))
+        logger.error("\033[0;31m" + msg + "\033[0m")
+        sys.exit(1)
+
+
+def init_selector(args):
+    """
+    Initiate RepoSelector object from --match, --regex, --tag & --shard
+    """
+    logger = logging.getLogger(__name__ + ".init_selector")
+
+    try:
+        return pulpadm.selector.RepoSelector(
+            patterns=[item.strip() for item in args.match.split(",")] if args.match else None,
+            regex=args.regex, tags=args.tags, shard=args.shard
+        )
+    except re.error as e:
+        msg = "Invalid regular expression [{0}]: {1}".format(args.regex, e)
+        logger.error("\033[0;31m" + msg + "\033[0m")
+        sys.exit(1)
+
+
+def init_index(args):
+    """
+    Open the local units index of the Pulp server
+    """
+    path = args.index or os.path.join(
+        UNITS_DIR, "{0}_{1}.db".format(args.hostname, args.port))
+    return pulpadm.units.UnitIndex(path=path)
+
+
+def units_refresh(args):
+    """
+    Wrapper function for action: Refresh
+    """
+    logger = logging.getLogger(__name__ + ".units_refresh")
+
+    # Initiate RPMRepo & UnitIndex objects; repositories changed since the
+    # last refresh are found on a fresh listing
+    repo = init_repo(args, refresh=True)
+    index = init_index(args)
+
+    # Repositories to refresh; deleted repositories are dropped from the index
+    fields = pulpadm.units.REPO_FIELDS
+    if args.repo_id:
+        repos = [repo.get(repo_id=repo_id, fields=fields)[0] for repo_id in args.repo_id]
+    else:
+        repos = list(repo.iter_repos(fields=fields))
+        index.remove(set(index.repos()) - set(item["id"] for item in repos))
+    stale = [item for item in repos if args.full or not index.is_current(item)]
+    logger.info("Repositories: {0} indexed, {1} to refresh".format(
+        len(repos) - len(stale), len(stale)))
+
+    # Fetch units concurrently; only the units added since the last refresh
+    # if none were removed. The index is written by this thread alone.
+    since = dict((item["id"], None if args.full else index.since(item))
+                 for item in stale)
+
+    def fetch(item, full=False):
+        filters = None
+        if since[item["id"]] and not full:
+            filters = {"created": {"$gte": since[item["id"]]}}
+        return list(repo.iter_units(repo_id=item["id"], type_ids=["rpm"],
+                                    fields=pulpadm.units.UNIT_FIELDS, filters=filters))
+
+    results = []
+    for result in executor.imap(fetch, stale, jobs=args.jobs):
+        results.append(result._replace(item=result.item["id"]))
+        if not result.ok:
+            continue
+        item = result.item
+        units = result.value
+        count = index.store(repo=item, units=units, full=since[item["id"]] is None)
+        if since[item["id"]] is not None and \
+                count != (item.get("content_unit_counts") or {}).get("rpm", 0):
+            logger.debug("Units of [{0}] out of sync, fetching all".format(item["id"]))
+            count = index.store(repo=item, units=fetch(item, full=True))
+        logger.info("Indexed repository [{0}]: {1} unit(s) ({2} fetched)".format(
+            item["id"], count, len(units)))
+
+    pruned = index.prune()
+    stats = index.stats()
+    logger.info("Index: {0} repositories, {1} units, {2} removed".format(
+        stats["repos"], stats["units"], pruned))
+    index.close()
+    repo.close()
+
+    status = report_results("refresh", results)
+    if status:
+        sys.exit(status)
+
+
+def units_query(args):
+    """
+    Wrapper function for action: Query
+    """
+    logger = logging.getLogger(__name__ + ".units_query")
+
+    # Initiate UnitIndex object
+    index = init_index(args)
+    units = index.query(name=args.name, version=args.version, release=args.release,
+                        arch=args.arch, checksum=args.checksum, repo_id=args.repo_id)
+    index.close()
+
+    # Print data => ndjson | simple
+    for unit in units:
+        if args.ndjson:
+            print(json.dumps(unit, separators=(",", ":")))
+        else:
+            print("{0:<60} {1}".format(pulpadm.units.nevra(unit), " ".join(unit["repo_ids"])))
+    if not units:
+        msg = "No units found (the index is updated by `units refresh')"
+        logger.warning("\033[0;31m" + msg + "\033[0m")
+        sys.exit(1)
+
+
+def remove_orphans(args, repo):
+    """
+    Deletes the orphaned content units in batches and prints the units and
+    bytes reclaimed by each one
+
+    :return: exit status; 0 if every batch succeeded
+    """
+    logger = logging.getLogger(__name__ + ".remove_orphans")
+
+    type_ids = getattr(args, "type_ids", None)
+    orphans = pulpadm.orphans.find(
+        repo=repo, type_ids=type_ids.split(",") if type_ids else None)
+    if not orphans:
+        print("No orphaned units")
+        return 0
+
+    # Print data => one line per batch as soon as it is done, then totals
+    start = time.time()
+    results = []
+    print()
+    print("Orphan batches:")
+    for result in pulpadm.orphans.remove(
+            repo=repo, orphans=orphans,
+            batch_size=getattr(args, "batch_size", ORPHANS_BATCH_SIZE),
+            timeout=args.wait_timeout):
+        results.append(result)
+        print("  batch {0:<5} {1:>7} units {2:>10.1f} MB  {3:<9} {4:>7.1f}s{5}".format(
+            result["batch"], result["count"], result["bytes"] / 1048576.0,
+            result["state"], result["elapsed"],
+            "  ({0})".format(result["error"]) if result["error"] else ""))
+        sys.stdout.flush()
+    removed = [result for result in results if result["state"] == "finished"]
+    print()
+    print("{0:<22}{1} of {2}".format("Units removed:", sum(
+        result["count"] for result in removed), len(orphans)))
+    print("{0:<22}{1:.1f} MB".format("Reclaimed:", sum(
+        result["bytes"] for result in removed) / 1048576.0))
+    print("{0:<22}{1} ({2} failed)".format("Batches:", len(results),
+                                           len(results) - len(removed)))
+    print("{0:<22}{1:.1f}s".format("Elapsed:", time.time() - start))
+    print()
+    if len(removed) < len(results):
+        msg = "Failed to remove some orphaned units"
+        logger.error("\033[0;31m" + msg + "\033[0m")
+        return 1
+    return 0
+
+
+def orphans_list(args):
+    """
+    Wrapper function for action: List (orphans)
+    """
+    # Initiate RPMRepo object
+    repo = init_repo(args)
+    orphans = pulpadm.orphans.find(
+        repo=repo, type_ids=args.type_ids.split(",") if args.type_ids else None)
+    repo.close()
+
+    # Print data => ndjson | summary per content type
+    if args.ndjson:
+        for item in orphans:
+            print(json.dumps(item, separators=(",", ":")))
+        return
+    types = {}
+    for item in orphans:
+        count, size = types.get(item["type_id"], (0, 0))
+        types[item["type_id"]] = (count + 1, size + item["size"])
+    print()
+    print("Orphaned units:")
+    for type_id, (count, size) in sorted(types.items()):
+        print("  {0:<24} {1:>8} units {2:>10.1f} MB".format(type_id, count, size / 1048576.0))
+    print("  {0:<24} {1:>8} units {2:>10.1f} MB".format(
+        "total", len(orphans), sum(item["size"] for item in orphans) / 1048576.0))
+    print()
+
+
+def orphans_remove(args):
+    """
+    Wrapper function for action: Remove (orphans)
+    """
+    # Initiate RPMRepo object
+    repo = init_repo(args)
+    status = remove_orphans(args, repo)
+    repo.close()
+    if status:
+        sys.exit(status)
+
+
+def bind_apply(args):
+    """
+    Wrapper function for action: Apply (bind)
+    """
+    logger = logging.getLogger(__name__ + ".bind_apply")
+
+    # Desired bindings from the bindings file
+    data = utils.read_yaml(path=args.path, cache=args.yaml_cache, strict=True)
+    try:
+        desired = pulpadm.bindings.read_bindings(
+            data if type(data) is dict else {}, distributor_id=args.distributor_id)
+    except ValueError as e:
+        logger.error("\033[0;31m" + "{0}".format(e) + "\033[0m")
+        sys.exit(1)
+
+    # Initiate RPMRepo object
+    repo = init_repo(args)
+
+    # Only the missing (and, with --delete, extra) bindings are applied
+    with pulpadm.profiling.phase("fetch"):
+        actual = pulpadm.bindings.current(repo=repo, consumer_ids=list(desired))
+    missing = set(desired) - set(actual)
+    if missing:
+        msg = "Consumers not found: {0}".format(", ".join(sorted(missing)))
+        logger.error("\033[0;31m" + msg + "\033[0m")
+    with pulpadm.profiling.phase("diff"):
+        operations = pulpadm.bindings.delta(
+            desired=dict((key, value) for key, value in desired.items() if key in actual),
+            actual=actual, delete=args.delete
+        )
+
+    # Print data => operations only
+    status = 1 if missing else 0
+    if args.dry_run:
+        repo.close()
+        print()
+        print("Bindings:")
+        for item in operations:
+            print("  {0:<7} {1}".format(item["op"], pulpadm.bindings.label(item)))
+        print("  {0} to bind, {1} to unbind".format(
+            len([item for item in operations if item["op"] == "bind"]),
+            len([item for item in operations if item["op"] == "unbind"])))
+        print()
+        if status:
+            sys.exit(status)
+        return
+
+    # Unbind then bind, each with up to --jobs concurrent requests; agent
+    # tasks of offline consumers stay waiting until --wait-timeout
+    if not operations:
+        print("Bindings are up to date")
+    for op in ("unbind", "bind"):
+        items = dict((pulpadm.bindings.label(item), item) for item in operations
+                     if item["op"] == op)
+        if not items:
+            continue
+
+        def job(key, op=op):
+            item = items[key]
+            if op == "unbind":
+                return repo.unbind(consumer_id=item["consumer_id"], repo_id=item["repo_id"],
+                                   distributor_id=item["distributor_id"])
+            return repo.bind(consumer_id=item["consumer_id"], repo_id=item["repo_id"],
+                             distributor_id=item["distributor_id"], notify_agent=args.notify)
+
+        with pulpadm.profiling.phase("apply"):
+            results = executor.run(job, sorted(items), jobs=args.jobs)
+        status = report_results(op, results) or status
+        if args.wait:
+            status = wait_tasks(repo, results, timeout=args.wait_timeout) or status
+    repo.close()
+    if status:
+        sys.exit(status)
+
+
+def bind_list(args):
+    """
+    Wrapper function for action: List (bind)
+    """
+    # Initiate RPMRepo object
+    repo = init_repo(args)
+    bindings = pulpadm.bindings.current(repo=repo, consumer_ids=args.consumer_id or None)
+    repo.close()
+
+    # Print data => ndjson | bindings per consumer
+    if args.ndjson:
+        for consumer_id in sorted(bindings):
+            for repo_id, distributor_id in sorted(bindings[consumer_id]):
+                print(json.dumps({"consumer_id": consumer_id, "repo_id": repo_id,
+                                  "distributor_id": distributor_id}, separators=(",", ":")))
+        return
+    print()
+    for consumer_id in sorted(bindings):
+        print("{0}:".format(consumer_id))
+        for repo_id, distributor_id in sorted(bindings[consumer_id]):
+            print("  {0:<40} {1}".format(repo_id, distributor_id))
+    print()
 
 
 def main():
-    version = pkg_resources.get_distribution(PKG_NAME).version
+    # Heavy modules (requests, yaml) are only imported by the actions that
+    # need them; keep `pulpadm -h' & offline actions fast (see
+    # benchmarks/startup.py)
+    version = VERSION
 
     # Top-level parser
     parser = argparse.ArgumentParser(
@@ -152,6 +1141,61 @@ def main():
         "--password", type=str, dest="password", default=None, metavar="",
         help="""Pulp server account password (supersedes config file value)"""
     )
+    parser.add_argument(
+        "--no-cache", dest="no_cache", action="store_true",
+        help="""neither read nor write the local inventory cache (repository
+        listings)"""
+    )
+    parser.add_argument(
+        "--yaml-cache", dest="yaml_cache", action="store_true",
+        help="""keep the parsed input files under `~/.pulpadm/cache/yaml'
+        and re-use them while the files are unchanged (faster loads of very
+        large input files)"""
+    )
+    parser.add_argument(
+        "--refresh", dest="refresh", action="store_true",
+        help="""revalidate the local inventory cache against the Pulp server,
+        even if the cached entries did not expire yet"""
+    )
+    parser.add_argument(
+        "--retries", type=int, dest="retries", default=None, metavar="",
+        help="""maximum number of retries of a failed API request (supersedes
+        config file value)"""
+    )
+    parser.add_argument(
+        "--wait-timeout", type=float, dest="wait_timeout", default=None, metavar="",
+        help="""maximum seconds to wait for spawned tasks (--wait, sync,
+        publish, promote & orphans remove), 0 for no limit (supersedes config
+        file value; default: {0})""".format(WAIT_TIMEOUT)
+    )
+    parser.add_argument(
+        "--stats", dest="stats", action="store_true",
+        help="""prints the latency (p50/p95/max), size, errors and retries of
+        the API requests per endpoint when done"""
+    )
+    parser.add_argument(
+        "--stats-file", type=str, dest="stats_file", default=None, metavar="",
+        help="""writes the API request statistics to the given file"""
+    )
+    parser.add_argument(
+        "--stats-format", type=str, dest="stats_format", default="json",
+        choices=["json", "prometheus"], metavar="",
+        help="""format of --stats-file: json or prometheus (textfile
+        collector)"""
+    )
+    parser.add_argument(
+        "--profile", type=str, dest="profile", default=None,
+        choices=["cpu", "mem", "wall"], metavar="",
+        help="""profiles the command: cpu (cProfile statistics), mem (top
+        allocation sites) or wall (time only); the time spent in every
+        phase (config, parse, fetch, diff, apply) is printed as well"""
+    )
+    parser.add_argument(
+        "--profile-output", type=str, dest="profile_output", default=None,
+        metavar="",
+        help="""profile output file (default: pulpadm-cpu.prof,
+        pulpadm-mem.txt or pulpadm-wall.json)"""
+    )
     parser.add_argument(
         "-v", dest="verbose", action="count", default=0,
         help="""increases output verbosity (-v for INFO & -vv for DEBUG)"""
@@ -181,10 +1225,6 @@ def main():
         dest="action"
     )
     repo_create_generate_update_parser = argparse.ArgumentParser(add_help=False)
-    repo_create_generate_update_parser.add_argument(
-        "repo_id", type=str, metavar="",
-        help="""unique identifier; only alphanumeric, ., -, and _ allowed"""
-    )
     repo_create_generate_update_parser.add_argument(
         "--display-name", dest="display_name", type=str, metavar="",
         help="""user-readable display name (i18n characters)"""
@@ -238,13 +1278,57 @@ def main():
         "--proxy-port", dest="proxy_port", type=str, metavar="",
         help="""port on the proxy server to make requests"""
     )
+    jobs_parser = argparse.ArgumentParser(add_help=False)
+    jobs_parser.add_argument(
+        "-j", "--jobs", dest="jobs", type=int, default=1, metavar="",
+        help="""maximum number of concurrent API requests (default: 1)"""
+    )
+    servers_parser = argparse.ArgumentParser(add_help=False)
+    servers_parser.add_argument(
+        "--servers", type=str, dest="servers", metavar="NAMES",
+        help="""runs on the given comma-separated servers of `pulp_servers'
+        (or `all') concurrently, labelling the output with the server name
+        (default: the `pulp_server' server, all servers if not set)"""
+    )
+    server_parser = argparse.ArgumentParser(add_help=False)
+    server_parser.add_argument(
+        "--server", type=str, dest="server", metavar="NAME",
+        help="""runs on the given server of `pulp_servers' (default: the
+        `pulp_server' server, or the only configured one)"""
+    )
+    wait_parser = argparse.ArgumentParser(add_help=False)
+    wait_parser.add_argument(
+        "--wait", action="store_true",
+        help="""waits for the tasks spawned on the Pulp server to finish and
+        reports the time each one spent queued and running"""
+    )
+
+    # Repo action parser: apply
+    repo_apply_parser = repo_subparsers.add_parser(
+        "apply",
+        help="""applies a plan written by `import --plan'""",
+        description="""Applies a plan written by `import --plan'. Applied
+        operations are recorded in `<PLAN>.progress', so re-running the same
+        plan after a partial failure resumes where it stopped.""",
+        parents=[servers_parser, jobs_parser, wait_parser]
+    )
+    repo_apply_parser.add_argument(
+        "path", type=str,
+        help="""specifies the full path of the plan file"""
+    )
+    repo_apply_parser.set_defaults(func=repo_apply)
 
     # Repo action parser: create
     repo_create_parser = repo_subparsers.add_parser(
         "create",
         help="creates RPM repository on the Pulp server",
         description="Creates RPM repository on the Pulp server",
-        parents=[repo_create_generate_update_parser]
+        parents=[repo_create_generate_update_parser, servers_parser, jobs_parser]
+    )
+    repo_create_parser.add_argument(
+        "repo_id", nargs="+", type=str,
+        help="""unique identifier; only alphanumeric, ., -, and _ allowed
+        (multiple entries must be separated by space)"""
     )
     repo_create_parser.set_defaults(func=repo_create_generate)
 
@@ -252,7 +1336,8 @@ def main():
     repo_delete_parser = repo_subparsers.add_parser(
         "delete",
         help="deletes RPM repository on the Pulp server",
-        description="Deletes RPM repository on the Pulp server"
+        description="Deletes RPM repository on the Pulp server",
+        parents=[servers_parser, jobs_parser, wait_parser]
     )
     repo_delete_parser.add_argument(
         "repo_id", nargs="+", type=str,
@@ -261,6 +1346,29 @@ def main():
     )
     repo_delete_parser.set_defaults(func=repo_delete)
 
+    # Repo action parser: drift
+    repo_drift_parser = repo_subparsers.add_parser(
+        "drift",
+        help="reports repositories that differ from an input file",
+        description="""Reports repositories that differ from an input file
+        (same format as for `import'), comparing the fingerprint of each
+        repository config with the one stored in the repository notes when
+        pulpadm created or updated it; only repository ids & notes are
+        fetched. Changes made outside pulpadm are not detected (see `import
+        --update --deep'). Exits with status 1 if anything differs.""",
+        parents=[servers_parser]
+    )
+    repo_drift_parser.add_argument(
+        "path", type=str,
+        help="""specifies the full path of the input file"""
+    )
+    repo_drift_parser.add_argument(
+        "--stream", action="store_true",
+        help="""reads the input file one repository at a time instead of
+        loading it as a whole (lower memory usage on very large files)"""
+    )
+    repo_drift_parser.set_defaults(func=repo_drift)
+
     #  Repo action parser: generate
     repo_generate_parser = repo_subparsers.add_parser(
         "generate",
@@ -268,16 +1376,21 @@ def main():
         description="""Generates create repository API object (JSON)""",
         parents=[repo_create_generate_update_parser]
     )
-    repo_generate_parser.set_defaults(func=repo_create_generate)
+    repo_generate_parser.add_argument(
+        "repo_id", type=str, metavar="",
+        help="""unique identifier; only alphanumeric, ., -, and _ allowed"""
+    )
+    repo_generate_parser.set_defaults(func=repo_create_generate, offline=True)
 
     #  Repo action parser: import
     repo_import_parser = repo_subparsers.add_parser(
         "import",
-        help="""same as create/delete, but from input file""",
-        description="""Same as create/delete, but from input file instead.
+        help="""same as create/delete/update, but from input file""",
+        description="""Same as create/delete/update, but from input file instead.
         Very useful when creating a set of repositories, or maintain Pulp server
         content consistent. See `~/.pulpadm/repos.yaml' for an example of the
-        input file."""
+        input file.""",
+        parents=[servers_parser, jobs_parser, wait_parser]
     )
     repo_import_parser.add_argument(
         "path", type=str,
@@ -288,13 +1401,62 @@ def main():
         help="""deletes RPM repositories from Pulp server that are not in the
         input file"""
     )
+    repo_import_parser.add_argument(
+        "--update", action="store_true",
+        help="""updates RPM repositories whose configuration differs from the
+        input file; only the changed settings are sent to the Pulp server"""
+    )
+    repo_import_parser.add_argument(
+        "--deep", action="store_true",
+        help="""with --update, compares the whole configuration of every
+        repository, not only of the ones whose fingerprint (stored in the
+        repository notes) differs; catches changes made outside pulpadm"""
+    )
+    repo_import_parser.add_argument(
+        "--orphans", action="store_true",
+        help="""with --delete, removes the orphaned content units once every
+        deletion task is done; every orphan on the server is removed, not
+        only the units of the deleted repositories (see `orphans remove')"""
+    )
+    repo_import_parser.add_argument(
+        "--match", type=str, dest="match", metavar="PATTERNS",
+        help="""only imports repositories whose id matches any of the
+        comma-separated shell-style wildcard PATTERNS, ie: 'epel-*'; other
+        repositories (on the file and on the server) are left alone"""
+    )
+    repo_import_parser.add_argument(
+        "--regex", type=str, dest="regex", metavar="REGEX",
+        help="""only imports repositories whose id matches REGEX"""
+    )
+    repo_import_parser.add_argument(
+        "--tag", type=str, dest="tags", action="append", metavar="TAG",
+        help="""only imports repositories of the input file tagged with TAG
+        (`tags' list); may be repeated to select any of several tags"""
+    )
+    repo_import_parser.add_argument(
+        "--shard", type=pulpadm.selector.shard, dest="shard", metavar="I/N",
+        help="""only imports the I-th of N disjoint shards of the
+        repositories (stable hash of the ids), ie: to split an import across
+        N concurrent workers"""
+    )
+    repo_import_parser.add_argument(
+        "--stream", action="store_true",
+        help="""reads the input file one repository at a time instead of
+        loading it as a whole (lower memory usage on very large files)"""
+    )
+    repo_import_parser.add_argument(
+        "--plan", type=str, dest="plan", metavar="PLAN",
+        help="""writes the create/update/delete operations (and their API
+        objects) to the PLAN file instead of applying them; see `repo apply'"""
+    )
     repo_import_parser.set_defaults(func=repo_import)
 
     # Repo action parser: list
     repo_list_parser = repo_subparsers.add_parser(
         "list",
         help="lists RPM repositories on the Pulp server",
-        description="Lists RPM repositories on the Pulp server"
+        description="Lists RPM repositories on the Pulp server",
+        parents=[servers_parser]
     )
     repo_list_parser.add_argument(
         "--repo-id", type=str, dest="repo_id", metavar="",
@@ -307,6 +1469,11 @@ def main():
         help="""if specified, detailed configuration information is displayed in
         JSON format for each repository"""
     )
+    repo_list_parser_group.add_argument(
+        "--ndjson", action="store_true",
+        help="""same as --details, but each repository is printed as soon as it
+        is received, as a single line of JSON (newline-delimited JSON)"""
+    )
     repo_list_parser_group.add_argument(
         "--summary", action="store_true",
         help="""if specified, a condensed view for each repository will be
@@ -314,6 +1481,389 @@ def main():
     )
     repo_list_parser.set_defaults(func=repo_list)
 
+    # Repo action parser: promote
+    repo_promote_parser = repo_subparsers.add_parser(
+        "promote",
+        help="promotes content units along release tiers",
+        description="""Promotes content units along the release tiers defined
+        by `promote_from' in the repos file (ie: upstream -> unstable ->
+        stable). Units are copied server side (unit associations only, no
+        download), downstream tiers first so content moves one tier per run;
+        the repositories of a tier are promoted concurrently.""",
+        parents=[servers_parser]
+    )
+    repo_promote_parser.add_argument(
+        "path", type=str,
+        help="""specifies the full path of the repos file"""
+    )
+    repo_promote_parser.add_argument(
+        "repo_id", type=str, nargs="*",
+        help="""only promote into the given repositories (default: every
+        repository with `promote_from')"""
+    )
+    repo_promote_parser.add_argument(
+        "--type-ids", type=str, dest="type_ids", metavar="TYPES",
+        help="""comma-separated unit types to promote, ie: rpm,erratum
+        (default: all)"""
+    )
+    repo_promote_parser.add_argument(
+        "--recursive", action="store_true",
+        help="""promotes the dependencies of the selected units as well"""
+    )
+    repo_promote_parser.add_argument(
+        "-c", "--concurrency", dest="concurrency", type=int,
+        default=PROMOTE_CONCURRENCY, metavar="",
+        help="""maximum number of promotions in flight (default: {0})""".format(
+            PROMOTE_CONCURRENCY)
+    )
+    repo_promote_parser.add_argument(
+        "--max-running", dest="max_running", type=int, metavar="",
+        help="""starts new promotions only while fewer tasks are running on
+        the server (default: no limit)"""
+    )
+    repo_promote_parser.add_argument(
+        "--max-waiting", dest="max_waiting", type=int, default=SYNC_MAX_WAITING,
+        metavar="",
+        help="""starts new promotions only while fewer tasks are waiting on
+        the server (default: {0})""".format(SYNC_MAX_WAITING)
+    )
+    repo_promote_parser.add_argument(
+        "--publish", type=str, dest="publish", metavar="DISTRIBUTOR_ID",
+        help="""publishes each repository through DISTRIBUTOR_ID once
+        promoted"""
+    )
+    repo_promote_parser.add_argument(
+        "--dry-run", action="store_true", dest="dry_run",
+        help="""prints the promotions in the order they would run"""
+    )
+    repo_promote_parser.set_defaults(func=repo_promote)
+
+    # Repo action parser: publish
+    repo_publish_parser = repo_subparsers.add_parser(
+        "publish",
+        help="publishes RPM repositories through a distributor",
+        description="""Publishes RPM repositories through a distributor, up to
+        --concurrency at a time and smallest repositories (content unit
+        count) first. Repositories whose units did not change since their
+        last publish through the distributor are skipped.""",
+        parents=[servers_parser]
+    )
+    repo_publish_parser.add_argument(
+        "repo_id", type=str, nargs="*",
+        help="""repository id(s) to publish (default: all)"""
+    )
+    repo_publish_parser.add_argument(
+        "--file", type=str, dest="path", metavar="PATH",
+        help="""publishes every repository in the PATH YAML file as well (same
+        format as for `import')"""
+    )
+    repo_publish_parser.add_argument(
+        "--distributor-id", type=str, dest="distributor_id",
+        default="yum_distributor", metavar="",
+        help="""distributor to publish through, ie: export_distributor
+        (default: yum_distributor)"""
+    )
+    repo_publish_parser.add_argument(
+        "-c", "--concurrency", dest="concurrency", type=int,
+        default=PUBLISH_CONCURRENCY, metavar="",
+        help="""maximum number of publishes in flight (default: {0})""".format(
+            PUBLISH_CONCURRENCY)
+    )
+    repo_publish_parser.add_argument(
+        "--max-running", dest="max_running", type=int, metavar="",
+        help="""starts new publishes only while fewer tasks are running on the
+        server (default: no limit)"""
+    )
+    repo_publish_parser.add_argument(
+        "--max-waiting", dest="max_waiting", type=int, default=SYNC_MAX_WAITING,
+        metavar="",
+        help="""starts new publishes only while fewer tasks are waiting on the
+        server (default: {0})""".format(SYNC_MAX_WAITING)
+    )
+    repo_publish_parser.add_argument(
+        "--order", type=str, dest="order", choices=["smallest", "largest", "id"],
+        default="smallest", metavar="",
+        help="""publish order: smallest or largest repositories (content unit
+        count) first, or by id (default: smallest)"""
+    )
+    repo_publish_parser.add_argument(
+        "--force", action="store_true",
+        help="""publishes unchanged repositories as well"""
+    )
+    repo_publish_parser.set_defaults(func=repo_publish)
+
+    # Repo action parser: sync
+    repo_sync_parser = repo_subparsers.add_parser(
+        "sync",
+        help="synchronizes RPM repositories from their feeds",
+        description="""Synchronizes RPM repositories from their feeds, up to
+        --concurrency at a time. New syncs are only started while the Pulp
+        server is below --max-running running and --max-waiting waiting
+        tasks, and the time spent by each one is reported.""",
+        parents=[servers_parser]
+    )
+    repo_sync_parser.add_argument(
+        "repo_id", type=str, nargs="*",
+        help="""repository id(s) to sync"""
+    )
+    repo_sync_parser.add_argument(
+        "--file", type=str, dest="path", metavar="PATH",
+        help="""syncs every repository in the PATH YAML file as well (same
+        format as for `import')"""
+    )
+    repo_sync_parser.add_argument(
+        "-c", "--concurrency", dest="concurrency", type=int,
+        default=SYNC_CONCURRENCY, metavar="",
+        help="""maximum number of syncs in flight (default: {0})""".format(
+            SYNC_CONCURRENCY)
+    )
+    repo_sync_parser.add_argument(
+        "--max-running", dest="max_running", type=int, metavar="",
+        help="""starts new syncs only while fewer tasks are running on the
+        server (default: no limit)"""
+    )
+    repo_sync_parser.add_argument(
+        "--max-waiting", dest="max_waiting", type=int, default=SYNC_MAX_WAITING,
+        metavar="",
+        help="""starts new syncs only while fewer tasks are waiting on the
+        server (default: {0})""".format(SYNC_MAX_WAITING)
+    )
+    repo_sync_parser.add_argument(
+        "--max-speed", dest="max_speed", type=int, metavar="",
+        help="""maximum bandwidth used per download thread (bytes/sec) for
+        these syncs only"""
+    )
+    repo_sync_parser.add_argument(
+        "--publish", type=str, dest="publish", metavar="DISTRIBUTOR_ID",
+        help="""publishes each repository through DISTRIBUTOR_ID once synced
+        (distributors with auto_publish are published anyway)"""
+    )
+    repo_sync_parser.set_defaults(func=repo_sync)
+
+    # Units Section & Action parsers
+    #
+    section_units_parser = section_subparsers.add_parser(
+        "units",
+        help="index & query the RPM units of every repository",
+        description="""Keeps a local index (SQLite) of the RPM units of every
+        repository on the Pulp server, so packages can be looked up across
+        repositories without querying the server"""
+    )
+    section_units_parser.add_argument(
+        "--index", type=str, dest="index", metavar="PATH",
+        help="""full path of the index database (default:
+        ~/.pulpadm/units/<hostname>_<port>.db)"""
+    )
+    units_subparsers = section_units_parser.add_subparsers(
+        title="available actions",
+        dest="action"
+    )
+
+    # Units action parser: query
+    units_query_parser = units_subparsers.add_parser(
+        "query",
+        help="finds packages in the index",
+        description="""Finds packages in the index and the repositories
+        holding them""",
+        parents=[server_parser]
+    )
+    units_query_parser.add_argument(
+        "name", type=str, nargs="?", default=None,
+        help="""package name; shell-style wildcards are allowed, ie: 'kernel*'"""
+    )
+    units_query_parser.add_argument(
+        "--version", type=str, dest="version", metavar="",
+        help="""package version"""
+    )
+    units_query_parser.add_argument(
+        "--release", type=str, dest="release", metavar="",
+        help="""package release"""
+    )
+    units_query_parser.add_argument(
+        "--arch", type=str, dest="arch", metavar="",
+        help="""package architecture"""
+    )
+    units_query_parser.add_argument(
+        "--checksum", type=str, dest="checksum", metavar="",
+        help="""package checksum"""
+    )
+    units_query_parser.add_argument(
+        "--repo-id", type=str, dest="repo_id", metavar="",
+        help="""only packages in the given repository"""
+    )
+    units_query_parser.add_argument(
+        "--ndjson", action="store_true",
+        help="""prints each package as a single line of JSON"""
+    )
+    units_query_parser.set_defaults(func=units_query)
+
+    # Units action parser: refresh
+    units_refresh_parser = units_subparsers.add_parser(
+        "refresh",
+        help="updates the index from the Pulp server",
+        description="""Updates the index from the Pulp server. Only
+        repositories whose units changed since the last refresh are fetched
+        (only the new units, if none were removed).""",
+        parents=[server_parser, jobs_parser]
+    )
+    units_refresh_parser.add_argument(
+        "repo_id", type=str, nargs="*",
+        help="""only refresh the given repositories (default: all)"""
+    )
+    units_refresh_parser.add_argument(
+        "--full", action="store_true",
+        help="""fetches every unit again, even of unchanged repositories"""
+    )
+    units_refresh_parser.set_defaults(func=units_refresh)
+
+    # Orphans Section & Action parsers
+    #
+    section_orphans_parser = section_subparsers.add_parser(
+        "orphans",
+        help="list & remove orphaned content units",
+        description="""Lists & removes orphaned content units: units no longer
+        associated to any repository (ie: left behind by deleted
+        repositories), still taking space on the Pulp server"""
+    )
+    section_orphans_parser.add_argument(
+        "--type-ids", type=str, dest="type_ids", metavar="TYPES",
+        help="""comma-separated content types, ie: rpm,srpm (default: all)"""
+    )
+    orphans_subparsers = section_orphans_parser.add_subparsers(
+        title="available actions",
+        dest="action"
+    )
+
+    # Orphans action parser: list
+    orphans_list_parser = orphans_subparsers.add_parser(
+        "list",
+        help="lists orphaned content units",
+        description="""Lists the number & size of orphaned content units per
+        content type""",
+        parents=[server_parser]
+    )
+    orphans_list_parser.add_argument(
+        "--ndjson", action="store_true",
+        help="""prints each orphaned unit as a single line of JSON"""
+    )
+    orphans_list_parser.set_defaults(func=orphans_list)
+
+    # Orphans action parser: remove
+    orphans_remove_parser = orphans_subparsers.add_parser(
+        "remove",
+        help="removes orphaned content units",
+        description="""Removes orphaned content units in batches (one server
+        task per batch, one batch at a time) and reports the units & bytes
+        reclaimed by each batch""",
+        parents=[server_parser]
+    )
+    orphans_remove_parser.add_argument(
+        "--batch-size", dest="batch_size", type=int, default=ORPHANS_BATCH_SIZE,
+        metavar="",
+        help="""maximum number of units per batch (default: {0})""".format(
+            ORPHANS_BATCH_SIZE)
+    )
+    orphans_remove_parser.set_defaults(func=orphans_remove)
+
+    # Bind Section & Action parsers
+    #
+    section_bind_parser = section_subparsers.add_parser(
+        "bind",
+        help="manage consumer (ie: child node) repository bindings",
+        description="""Manages the repositories consumers (ie: child nodes)
+        are bound to, from an input file. See `~/.pulpadm/bindings.yaml' for
+        an example of the input file."""
+    )
+    bind_subparsers = section_bind_parser.add_subparsers(
+        title="available actions",
+        dest="action"
+    )
+
+    # Bind action parser: apply
+    bind_apply_parser = bind_subparsers.add_parser(
+        "apply",
+        help="binds consumers to the repositories of the input file",
+        description="""Binds every consumer of the input file to its
+        repositories. Only missing bindings are created (and, with --delete,
+        extra ones removed), so re-running the same file is a no-op.
+        Consumers not in the input file are left alone.""",
+        parents=[server_parser, jobs_parser, wait_parser]
+    )
+    bind_apply_parser.add_argument(
+        "path", type=str,
+        help="""specifies the full path of the input file"""
+    )
+    bind_apply_parser.add_argument(
+        "--delete", action="store_true",
+        help="""unbinds the consumers of the input file from the repositories
+        that are not listed for them"""
+    )
+    bind_apply_parser.add_argument(
+        "--distributor-id", dest="distributor_id", type=str,
+        default=pulpadm.bindings.DISTRIBUTOR_ID, metavar="",
+        help="""distributor consumers are bound to, unless set in the input
+        file, ie: nodes_http_distributor for child nodes (default: {0})""".format(
+            pulpadm.bindings.DISTRIBUTOR_ID)
+    )
+    bind_apply_parser.add_argument(
+        "--no-notify", dest="notify", action="store_false",
+        help="""does not notify the agent of the consumers about new
+        bindings"""
+    )
+    bind_apply_parser.add_argument(
+        "--dry-run", action="store_true",
+        help="""prints the bindings to create & remove, without changing
+        anything"""
+    )
+    bind_apply_parser.set_defaults(func=bind_apply)
+
+    # Bind action parser: list
+    bind_list_parser = bind_subparsers.add_parser(
+        "list",
+        help="lists the bindings of consumers",
+        description="""Lists the repositories (and distributors) consumers are
+        bound to""",
+        parents=[server_parser]
+    )
+    bind_list_parser.add_argument(
+        "consumer_id", type=str, nargs="*",
+        help="""only lists these consumers (default: all)"""
+    )
+    bind_list_parser.add_argument(
+        "--ndjson", action="store_true",
+        help="""prints each binding as a single line of JSON"""
+    )
+    bind_list_parser.set_defaults(func=bind_list)
+
+    # Batch Section parser
+    #
+    section_batch_parser = section_subparsers.add_parser(
+        "batch",
+        help="run many operations over a single process and connection pool",
+        description="""Runs newline-delimited operations through a single
+        process and connection pool, and writes one JSON result per operation
+        (in input order). Each line is either a JSON object, ie:
+        {"op": "create", "id": "epel", "feed": "http://..."}, or a command,
+        ie: create epel feed=http://... display_name="EPEL 7". Supported
+        operations: create, update (the given keywords are the whole
+        repository config, as in the import file), delete, get and list; add
+        wait=true to wait for the spawned tasks. Operations run one at a
+        time, in input order; with -j N up to N run concurrently, in no
+        particular order, so only use it when no line depends on another
+        (ie: not `create epel' followed by `update epel').""",
+        parents=[server_parser, jobs_parser]
+    )
+    section_batch_parser.add_argument(
+        "path", type=str, nargs="?", default="-",
+        help="""specifies the full path of the batch file (default: stdin)"""
+    )
+    section_batch_parser.add_argument(
+        "--socket", type=str, dest="socket", metavar="PATH",
+        help="""runs as a daemon serving batches on the PATH Unix socket
+        instead; each connection sends operations and receives results"""
+    )
+    section_batch_parser.set_defaults(func=batch)
+
     # Parse arguments
     args = parser.parse_args()
 
@@ -349,21 +1899,86 @@ def main():
         }
     })
 
+    # Profile the command (--profile); stopped once it is done, see below
+    profiler = None
+    if args.profile:
+        profiler = pulpadm.profiling.Profiler(mode=args.profile, path=args.profile_output)
+        profiler.start()
+
     # Re-generate Pulp Server Info
     #   CLI Args supersedes the values from the CONFIG_FILE
+    #   (not needed by offline actions)
+    #   Actions without --servers run on a single server (--server)
     #
-    c_all = utils.read_yaml(args.config_file)
-    c = c_all.get("pulp_server", {}) if type(c_all) is dict else {}
-    args.hostname = args.hostname if args.hostname else c.get("hostname", None)
-    args.port = args.port if args.port else c.get("port", None)
-    args.username = args.username if args.username else c.get("username", None)
-    args.password = args.password if args.password else c.get("password", None)
+    c_all = None
+    if not getattr(args, "offline", False):
+        with pulpadm.profiling.phase("config"):
+            c_all = utils.read_yaml(args.config_file)
+    servers = pulpadm.fleet.read_servers(c_all)
+    try:
+        names = pulpadm.fleet.select(
+            servers, getattr(args, "servers", None) or getattr(args, "server", None))
+    except ValueError as e:
+        logging.getLogger(__name__ + ".main").error("\033[0;31m" + "{0}".format(e) + "\033[0m")
+        sys.exit(1)
+    if not hasattr(args, "servers") and len(names) > 1:
+        msg = "Several servers configured ({0}); select a server with --server".format(
+            ", ".join(names))
+        logging.getLogger(__name__ + ".main").error("\033[0;31m" + msg + "\033[0m")
+        sys.exit(1)
+    if len(names) > 1 and (args.hostname or args.port):
+        msg = "--hostname & --port select a single server; use --servers instead"
+        logging.getLogger(__name__ + ".main").error("\033[0;31m" + msg + "\033[0m")
+        sys.exit(1)
+
+    # Inventory cache settings
+    c_cache = c_all.get("cache", {}) if type(c_all) is dict else {}
+    args.no_cache = args.no_cache or not c_cache.get("enabled", True)
+    args.cache_dir = c_cache.get("path", CACHE_DIR)
+    args.cache_ttl = c_cache.get("ttl", CACHE_TTL)
+    args.cache_max_size = c_cache.get("max_size", CACHE_MAX_SIZE)
+    args.yaml_cache = os.path.join(args.cache_dir, "yaml") \
+        if args.yaml_cache or c_cache.get("yaml", False) else None
+
+    # Retry & circuit breaker settings
+    c_retry = c_all.get("retry", {}) if type(c_all) is dict else {}
+    args.retries = args.retries if args.retries is not None else c_retry.get("retries", RETRIES)
+    args.retry_backoff = c_retry.get("backoff", RETRY_BACKOFF)
+    args.retry_backoff_max = c_retry.get("backoff_max", RETRY_BACKOFF_MAX)
+    args.breaker_threshold = c_retry.get("breaker_threshold", BREAKER_THRESHOLD)
+    args.breaker_timeout = c_retry.get("breaker_timeout", BREAKER_TIMEOUT)
+
+    # Task settings
+    c_tasks = c_all.get("tasks", {}) if type(c_all) is dict else {}
+    if args.wait_timeout is None:
+        args.wait_timeout = c_tasks.get("wait_timeout", WAIT_TIMEOUT)
+
+    # API request metrics
+    args.metrics = None
+    if args.stats or args.stats_file:
+        args.metrics = pulpadm.metrics.Metrics()
 
-    # Call sub-command functions
-    args.func(args)
+    # Call sub-command functions; statistics are reported on failure as well
+    status = 0
+    try:
+        if len(names) > 1:
+            status = run_fleet(args, [(name, servers[name]) for name in names])
+        else:
+            server_args(args, servers[names[0]] if names else {})
+            args.func(args)
+    except (PulpError, InputError) as e:
+        logging.getLogger(__name__ + ".main").error("\033[0;31m" + "{0}".format(e) + "\033[0m")
+        sys.exit(exit_status(e))
+    finally:
+        if args.stats:
+            sys.stderr.write("\n" + args.metrics.format_table() + "\n\n")
+        if args.stats_file:
+            args.metrics.write(path=args.stats_file, fmt=args.stats_format)
+        if profiler is not None:
+            profiler.stop()
 
     # Exit
-    sys.exit(0)
+    sys.exit(status)
 
 
 if __name__ == "__main__":
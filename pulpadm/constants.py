@@ -1,16 +1,61 @@
 import os
-import pkg_resources
 
 PKG_NAME = "pulpadm"
 PKG_DESC = "Pulp Admin Tool to Manage RPM Repositories"
+VERSION = "0.1.1"
 
 BASE_DIR = os.path.expanduser(os.path.join("~", "." + PKG_NAME))
-TMPL_DIR = pkg_resources.resource_filename(__name__, "templates")
+TMPL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
 
 CONFIG_FILE = os.path.join(BASE_DIR, "config.yaml")
+CACHE_DIR = os.path.join(BASE_DIR, "cache")
+UNITS_DIR = os.path.join(BASE_DIR, "units")
 
 MAX_SPEED = 10485760
 
+# Number of repositories per page when listing
+PAGE_SIZE = 100
+
+# Number of content units per page when searching repository units
+UNITS_PAGE_SIZE = 1000
+
+# Number of orphaned content units deleted per server task
+ORPHANS_BATCH_SIZE = 500
+
+# Inventory cache defaults: entry TTL (seconds) & cache size (bytes)
+CACHE_TTL = 60
+CACHE_MAX_SIZE = 52428800
+
+# Repository sync defaults: syncs in flight & server tasks waiting
+SYNC_CONCURRENCY = 4
+SYNC_MAX_WAITING = 10
+
+# Repository publishes in flight (export publishes are CPU & disk heavy)
+PUBLISH_CONCURRENCY = 2
+
+# Repository promotions in flight (server-side unit copies)
+PROMOTE_CONCURRENCY = 8
+
+# Seconds spent waiting for spawned tasks (ie: --wait) before giving up;
+# tasks may stay waiting forever (ie: stuck workers, offline consumers)
+WAIT_TIMEOUT = 21600
+
+# Retry & circuit breaker defaults: retries per request, backoff base &
+# maximum delay (seconds), consecutive failures opening the circuit &
+# seconds it stays open
+RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_BACKOFF_MAX = 30
+BREAKER_THRESHOLD = 5
+BREAKER_TIMEOUT = 30
+
+# HTTP connection pool defaults
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 10
+
 API_PATH = {
-    "repo": "pulp/api/v2/repositories/"
+    "repo": "pulp/api/v2/repositories/",
+    "tasks": "pulp/api/v2/tasks/",
+    "content": "pulp/api/v2/content/",
+    "consumers": "pulp/api/v2/consumers/"
 }
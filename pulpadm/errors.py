@@ -0,0 +1,82 @@
+from __future__ import print_function, unicode_literals
+
+
+# Exit status of the CLI per kind of error
+EXIT_STATUS = {
+    "error": 1,
+    "not_found": 3,
+    "conflict": 4,
+    "unavailable": 5,
+    "unauthorized": 6
+}
+
+
+class PulpError(Exception):
+    """
+    Raised when an API request fails: error response, connection error or
+    open circuit breaker
+
+    :param message str: what went wrong
+    :param status int: HTTP status code, None if no response was received
+    :param repo_id str: the repository the request was about, if any
+
+    """
+    def __init__(self, message=None, status=None, repo_id=None):
+        super(PulpError, self).__init__(message)
+        self.message = message
+        self.status = status
+        self.repo_id = repo_id
+
+    def __str__(self):
+        return "{0}".format(self.message)
+
+    @property
+    def kind(self):
+        """
+        :return: kind of error (see EXIT_STATUS)
+        :rtype: str
+        """
+        if self.status == 404:
+            return "not_found"
+        if self.status == 409:
+            return "conflict"
+        if self.status in (401, 403):
+            return "unauthorized"
+        if self.status is None or self.status == 429 or self.status >= 500:
+            return "unavailable"
+        return "error"
+
+    @property
+    def transient(self):
+        """
+        :return: whether the request may succeed if sent again later
+        :rtype: bool
+        """
+        return self.kind == "unavailable"
+
+
+class CircuitOpenError(PulpError):
+    """
+    Raised instead of sending a request while the circuit breaker is open
+    (the server failed repeatedly and is left alone for a while)
+    """
+
+
+class InputError(Exception):
+    """
+    Raised when an input file (ie: repos.yaml) cannot be read or parsed, so
+    that it is never mistaken for an empty one
+    """
+
+
+def exit_status(error=None):
+    """
+    Returns the CLI exit status for an error
+
+    :param error Exception: the error
+    :rtype: int
+
+    """
+    if isinstance(error, PulpError):
+        return EXIT_STATUS[error.kind]
+    return EXIT_STATUS["error"]
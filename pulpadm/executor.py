@@ -0,0 +1,125 @@
+from __future__ import print_function, unicode_literals
+import logging
+import threading
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+from pulpadm.errors import PulpError, exit_status
+
+
+# Upper bound (seconds) when waiting for the pool; a timeout is given so the
+# wait can be interrupted with Ctrl-C on Python 2
+MAX_WAIT = 60 * 60 * 24 * 7
+
+# Outcome of a single job:
+#   item    - the job input (ie: repository id)
+#   ok      - whether the job completed without errors
+#   value   - the job return value
+#   error   - the raised exception (ie: PulpError, with the HTTP status),
+#             None if ok
+Result = namedtuple("Result", ["item", "ok", "value", "error"])
+
+# Label of the jobs run by the current thread (ie: the Pulp server they talk
+# to); inherited by the jobs they start in turn
+_context = threading.local()
+
+
+def get_label():
+    """
+    :return: the label of the current thread, None if unset
+    :rtype: str
+    """
+    return getattr(_context, "label", None)
+
+
+def set_label(label=None):
+    """
+    Sets the label of the current thread
+
+    :param label str: the label, ie: a server name
+    :return: None
+
+    """
+    _context.label = label
+
+
+def _call(func, item, label=None):
+    """
+    Runs a single job, isolating any error into its Result
+    """
+    logger = logging.getLogger(__name__ + "._call")
+
+    if label is not None:
+        set_label(label)
+    try:
+        return Result(item, True, func(item), None)
+    except PulpError as e:
+        logger.error("\033[0;31m" + "{0}".format(e) + "\033[0m")
+        return Result(item, False, None, e)
+    except Exception as e:
+        logger.error("\033[0;31m" + "{0}: {1}".format(item, e) + "\033[0m")
+        return Result(item, False, None, e)
+
+
+def run(func, items, jobs=1):
+    """
+    Runs func(item) for every item with at most `jobs` concurrent calls. An
+    error on one item does not affect the others.
+
+    :param func callable: the job function
+    :param items list: the job inputs
+    :param jobs int: maximum number of concurrent jobs
+    :return: a Result per item, in the same order as items
+    :rtype: list
+
+    """
+    items = list(items)
+    jobs = max(min(jobs or 1, len(items)), 1)
+
+    if jobs == 1:
+        return [_call(func, item) for item in items]
+
+    label = get_label()
+    pool = ThreadPool(jobs)
+    try:
+        return pool.map_async(lambda item: _call(func, item, label), items).get(MAX_WAIT)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def imap(func, items, jobs=1):
+    """
+    Same as run(), but items may be a (lazy) iterator, and each Result is
+    yielded as soon as it and the ones before it are done.
+
+    :param func callable: the job function
+    :param items iterable: the job inputs
+    :param jobs int: maximum number of concurrent jobs
+    :return: a Result per item, in the same order as items
+    :rtype: generator
+
+    """
+    if (jobs or 1) <= 1:
+        for item in items:
+            yield _call(func, item)
+        return
+
+    label = get_label()
+    pool = ThreadPool(jobs)
+    try:
+        results = pool.imap(lambda item: _call(func, item, label), items)
+        while True:
+            try:
+                yield results.next(MAX_WAIT)
+            except StopIteration:
+                break
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def error_status(result):
+    """
+    Returns the exit status of a failed Result (see errors.EXIT_STATUS)
+    """
+    return exit_status(result.error)
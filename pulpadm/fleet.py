@@ -0,0 +1,103 @@
+from __future__ import print_function, unicode_literals
+import threading
+from collections import OrderedDict
+import pulpadm.executor as executor
+
+
+# Name of the server configured by the `pulp_server' block
+DEFAULT_SERVER = "default"
+
+
+def read_servers(config=None):
+    """
+    Reads the Pulp servers from the config file: the `pulp_server' block
+    (named "default") and the `pulp_servers' list, ie:
+
+        pulp_servers:
+          - name: master
+            hostname: pulp.example.com
+            ...
+
+    :param config dict: the whole config file
+    :return: settings of every server by name, in config file order
+    :rtype: OrderedDict
+
+    """
+    servers = OrderedDict()
+    if type(config) is not dict:
+        return servers
+    if config.get("pulp_server"):
+        servers[DEFAULT_SERVER] = config["pulp_server"]
+    for item in config.get("pulp_servers") or []:
+        servers[item["name"]] = item
+    return servers
+
+
+def select(servers=None, selector=None):
+    """
+    Selects the servers an action runs on
+
+    :param servers OrderedDict: servers by name (see read_servers())
+    :param selector str: comma-separated server names, or "all" (default:
+                         the "default" server if any, all servers otherwise)
+    :raises ValueError: if a server is not configured
+    :return: the selected server names
+    :rtype: list
+
+    """
+    if not selector:
+        return [DEFAULT_SERVER] if DEFAULT_SERVER in servers else list(servers)
+    if selector == "all":
+        return list(servers)
+    names = [name.strip() for name in selector.split(",") if name.strip()]
+    unknown = [name for name in names if name not in servers]
+    if unknown:
+        raise ValueError("Unknown server(s): {0}".format(", ".join(unknown)))
+    return names
+
+
+class LabelledStream(object):
+    """
+    Output stream shared by concurrent actions: every line is prefixed with
+    the label of the thread writing it (see executor.get_label()), and lines
+    of different threads are never interleaved.
+
+    :param stream file: the underlying stream, ie: sys.stdout
+
+    """
+    def __init__(self, stream=None):
+        self.stream = stream
+        self._buffers = threading.local()
+        self._lock = threading.Lock()
+
+    def write(self, data):
+        label = executor.get_label()
+        if label is None:
+            with self._lock:
+                self.stream.write(data)
+            return
+        lines = (getattr(self._buffers, "data", "") + data).split("\n")
+        self._buffers.data = lines.pop()
+        if lines:
+            with self._lock:
+                for line in lines:
+                    self.stream.write("[{0}] {1}\n".format(label, line))
+
+    def end(self):
+        """
+        Writes the partial line (no trailing newline yet) of the current
+        thread, if any; called once a labelled job is done, so its last line
+        is neither lost nor written under the label of the next job
+        """
+        data = getattr(self._buffers, "data", "")
+        self._buffers.data = ""
+        if data:
+            with self._lock:
+                self.stream.write("[{0}] {1}\n".format(executor.get_label(), data))
+
+    def flush(self):
+        with self._lock:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
@@ -0,0 +1,234 @@
+from __future__ import print_function, unicode_literals
+import os
+import json
+import threading
+from urlparse import urlparse
+
+
+# API collections whose second path segment is an object id (ie: a
+# repository id), and segments that are not
+ID_COLLECTIONS = ("repositories", "tasks", "consumers")
+STATIC_SEGMENTS = ("search", "actions")
+
+# Latency quantiles reported
+QUANTILES = (0.5, 0.95)
+
+
+def endpoint(url):
+    """
+    Converts an API URL into an endpoint label, replacing object ids, ie:
+    https://pulp/pulp/api/v2/repositories/epel/actions/sync/ =>
+    repositories/{id}/actions/sync/
+
+    :param url str: full URL of the API request
+    :return: the endpoint label
+    :rtype: str
+
+    """
+    path = urlparse(url).path.split("/api/v2/", 1)[-1]
+    segments = path.strip("/").split("/")
+    if len(segments) > 1 and segments[0] in ID_COLLECTIONS and \
+            segments[1] not in STATIC_SEGMENTS:
+        segments[1] = "{id}"
+    return "/".join(segments) + "/"
+
+
+def quantile(values, q):
+    """
+    :return: the q-quantile (nearest rank) of sorted values, None if empty
+    """
+    if not values:
+        return None
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+class Metrics(object):
+    """
+    Collects timing, size, status and retry count of every API request sent
+    by one or more RPMRepo objects, grouped by endpoint.
+
+    Library users may register hooks, called with every request sample (a
+    dict with method, endpoint, status, time, ttfb, bytes & retries), ie: to
+    feed their own monitoring.
+
+    """
+    def __init__(self):
+        self.endpoints = {}
+        self.hooks = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        """
+        Registers a function called with every request sample
+
+        :param hook callable: the function, ie: lambda sample: ...
+        :return: None
+
+        """
+        self.hooks.append(hook)
+
+    def _endpoint(self, method, url):
+        key = (method, endpoint(url))
+        if key not in self.endpoints:
+            self.endpoints[key] = {
+                "method": method,
+                "endpoint": key[1],
+                "count": 0,
+                "errors": 0,
+                "retries": 0,
+                "bytes": 0,
+                "status": {},
+                "times": [],
+                "ttfb": 0.0,
+                "parse": 0.0
+            }
+        return self.endpoints[key]
+
+    def record(self, method, url, status=None, elapsed=0.0, ttfb=None, size=0,
+               retries=0):
+        """
+        Records an API request
+
+        :param method str: HTTP method
+        :param url str: full URL of the API request
+        :param status int: HTTP status code, None if no response was received
+        :param elapsed float: seconds until the whole response was received
+        :param ttfb float: seconds until the response headers were received
+        :param size int: response body size (bytes)
+        :param retries int: number of times the request was retried
+        :return: None
+
+        """
+        with self._lock:
+            item = self._endpoint(method, url)
+            item["count"] += 1
+            item["errors"] += 1 if status is None or status >= 400 else 0
+            item["retries"] += retries
+            item["bytes"] += size
+            item["status"][status] = item["status"].get(status, 0) + 1
+            item["times"].append(elapsed)
+            item["ttfb"] += elapsed if ttfb is None else ttfb
+            sample = {"method": method, "endpoint": item["endpoint"],
+                      "status": status, "time": elapsed, "ttfb": ttfb,
+                      "bytes": size, "retries": retries}
+        for hook in self.hooks:
+            hook(sample)
+
+    def record_parse(self, method, url, elapsed=0.0):
+        """
+        Records the time spent decoding an API response (client side)
+
+        :return: None
+
+        """
+        with self._lock:
+            self._endpoint(method, url)["parse"] += elapsed
+
+    def summary(self):
+        """
+        :return: statistics per endpoint, slowest (total time) first; times
+                 in seconds
+        :rtype: list
+        """
+        with self._lock:
+            items = [dict(item, times=sorted(item["times"]))
+                     for item in self.endpoints.values()]
+        summary = []
+        for item in items:
+            times = item.pop("times")
+            count = item["count"]
+            item.update({
+                "status": dict(("{0}".format(key), value)
+                               for key, value in item["status"].items()),
+                "total": sum(times),
+                "p50": quantile(times, 0.5),
+                "p95": quantile(times, 0.95),
+                "max": times[-1] if times else None,
+                "ttfb": item["ttfb"] / count if count else None,
+                "parse": item["parse"] / count if count else None
+            })
+            summary.append(item)
+        return sorted(summary, key=lambda item: item["total"], reverse=True)
+
+    def format_table(self):
+        """
+        :return: the summary as a text table (times in ms)
+        :rtype: str
+        """
+        def ms(value):
+            return "{0:.1f}".format(value * 1000) if value is not None else "-"
+
+        lines = ["{0:<46} {1:>6} {2:>6} {3:>7} {4:>10} {5:>8} {6:>8} {7:>8} {8:>8} {9:>8}".format(
+            "Endpoint", "Calls", "Errors", "Retries", "Bytes", "p50 ms", "p95 ms",
+            "max ms", "ttfb ms", "parse ms")]
+        for item in self.summary():
+            lines.append(
+                "{0:<46} {1:>6} {2:>6} {3:>7} {4:>10} {5:>8} {6:>8} {7:>8} {8:>8} {9:>8}".format(
+                    item["method"] + " " + item["endpoint"], item["count"],
+                    item["errors"], item["retries"], item["bytes"], ms(item["p50"]),
+                    ms(item["p95"]), ms(item["max"]), ms(item["ttfb"]), ms(item["parse"])))
+        return "\n".join(lines)
+
+    def format_prometheus(self):
+        """
+        :return: the summary in the Prometheus text exposition format
+        :rtype: str
+        """
+        lines = [
+            "# HELP pulpadm_api_request_duration_seconds Pulp API request latency",
+            "# TYPE pulpadm_api_request_duration_seconds summary"
+        ]
+        summary = self.summary()
+        for item in summary:
+            labels = 'method="{0}",endpoint="{1}"'.format(item["method"], item["endpoint"])
+            for q in QUANTILES:
+                lines.append('pulpadm_api_request_duration_seconds{{{0},quantile="{1}"}} {2}'.format(
+                    labels, q, item["p50"] if q == 0.5 else item["p95"]))
+            lines.append("pulpadm_api_request_duration_seconds_sum{{{0}}} {1}".format(
+                labels, item["total"]))
+            lines.append("pulpadm_api_request_duration_seconds_count{{{0}}} {1}".format(
+                labels, item["count"]))
+        for name, key, kind, desc in (
+                ("pulpadm_api_requests_total", "status", "counter",
+                 "Pulp API requests by status code"),
+                ("pulpadm_api_response_bytes_total", "bytes", "counter",
+                 "Pulp API response body bytes"),
+                ("pulpadm_api_retries_total", "retries", "counter",
+                 "Pulp API request retries"),
+                ("pulpadm_api_parse_seconds_total", "parse", "counter",
+                 "Time spent decoding Pulp API responses")):
+            lines.append("# HELP {0} {1}".format(name, desc))
+            lines.append("# TYPE {0} {1}".format(name, kind))
+            for item in summary:
+                labels = 'method="{0}",endpoint="{1}"'.format(item["method"], item["endpoint"])
+                if key == "status":
+                    for status, count in sorted(item["status"].items()):
+                        lines.append('{0}{{{1},status="{2}"}} {3}'.format(
+                            name, labels, status, count))
+                elif key == "parse":
+                    lines.append("{0}{{{1}}} {2}".format(
+                        name, labels, (item["parse"] or 0.0) * item["count"]))
+                else:
+                    lines.append("{0}{{{1}}} {2}".format(name, labels, item[key]))
+        return "\n".join(lines) + "\n"
+
+    def write(self, path=None, fmt="json"):
+        """
+        Writes (atomically) the summary to a file, ie: for the node_exporter
+        textfile collector
+
+        :param path str: the output file
+        :param fmt str: output format; json or prometheus
+        :return: None
+
+        """
+        path = os.path.expanduser(path)
+        if fmt == "prometheus":
+            data = self.format_prometheus()
+        else:
+            data = json.dumps(self.summary(), indent=4, sort_keys=True,
+                              separators=(",", ": ")) + "\n"
+        tmp = "{0}.{1}.tmp".format(path, os.getpid())
+        with open(tmp, "w") as stream:
+            stream.write(data)
+        os.rename(tmp, path)
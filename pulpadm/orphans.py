@@ -0,0 +1,83 @@
+from __future__ import print_function, unicode_literals
+import time
+from pulpadm.errors import PulpError
+from pulpadm.tasks import TaskTracker
+from pulpadm.constants import ORPHANS_BATCH_SIZE
+
+
+# Unit fields kept for every orphan; `size' is only known for units
+# backed by a file (ie: rpm, srpm, drpm, iso)
+ORPHAN_FIELDS = ["_id", "name", "size"]
+
+
+def find(repo=None, type_ids=None):
+    """
+    Finds the orphaned content units on the Pulp server. Only the content
+    types holding orphans (see RPMRepo.orphan_counts()) are scanned.
+
+    :param repo RPMRepo: the API client
+    :param type_ids list: only these content types (default: all)
+    :return: orphans; dicts with type_id, unit_id, name & size (bytes, 0 if
+             unknown), by content type
+    :rtype: list
+
+    """
+    counts = repo.orphan_counts()
+    orphans = []
+    for type_id in sorted(counts):
+        if not counts[type_id] or (type_ids and type_id not in type_ids):
+            continue
+        for unit in repo.iter_orphans(type_id=type_id, fields=ORPHAN_FIELDS):
+            orphans.append({
+                "type_id": type_id,
+                "unit_id": unit["_id"],
+                "name": unit.get("name"),
+                "size": unit.get("size") or 0
+            })
+    return orphans
+
+
+def remove(repo=None, orphans=None, batch_size=ORPHANS_BATCH_SIZE, timeout=None):
+    """
+    Deletes orphaned content units in batches of at most `batch_size' units:
+    every batch is a separate server task, waited for before the next batch
+    is sent, so the server never runs one giant deletion
+
+    :param repo RPMRepo: the API client
+    :param orphans list: the orphans to delete (see find())
+    :param batch_size int: maximum number of units per batch
+    :param timeout float: maximum seconds to wait for a batch (default: no
+                          limit); a batch timing out is failed
+    :return: outcome of every batch, as soon as it is done: batch number,
+             count & bytes of its units, state (finished or failed), elapsed
+             seconds & error
+    :rtype: generator
+
+    """
+    orphans = orphans or []
+    for number, i in enumerate(range(0, len(orphans), batch_size)):
+        batch = orphans[i:i + batch_size]
+        result = {
+            "batch": number + 1,
+            "count": len(batch),
+            "bytes": sum(item["size"] for item in batch),
+            "state": "finished",
+            "error": None
+        }
+        start = time.time()
+        tracker = TaskTracker(repo=repo)
+        try:
+            tracker.track(
+                task_ids=repo.delete_orphans(
+                    units=[(item["type_id"], item["unit_id"]) for item in batch]),
+                label="orphans batch {0}".format(result["batch"])
+            )
+            if not tracker.wait(timeout=timeout):
+                result.update(state="failed", error="Timed out after {0}s".format(timeout))
+        except PulpError as e:
+            result.update(state="failed", error="{0}".format(e))
+        failed = [task for task in tracker.tasks if task["state"] != "finished"]
+        if failed and result["state"] == "finished":
+            result.update(state="failed", error=failed[0]["error"] or failed[0]["state"])
+        result["elapsed"] = time.time() - start
+        yield result
@@ -0,0 +1,121 @@
+from __future__ import print_function, unicode_literals
+import os
+import json
+import hashlib
+import logging
+import threading
+
+
+# Order in which plan operations are applied
+OPERATIONS = ("delete", "update", "create")
+
+
+def write_plan(path=None, server=None, operations=None):
+    """
+    Writes an execution plan as compact JSON. The file is only readable by
+    its owner, since create/update payloads may hold feed certs and keys.
+
+    :param path str: the plan file
+    :param server str: the Pulp server the plan was computed against
+    :param operations list: plan operations; dicts with "op" (create, update
+                            or delete), "id" and "payload" (API object)
+    :return: None
+
+    """
+    data = {
+        "version": 1,
+        "server": server,
+        "operations": operations or []
+    }
+    fd = os.open(os.path.expanduser(path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as stream:
+        stream.write(json.dumps(data, separators=(",", ":")))
+
+    # A new plan starts with no operation applied
+    try:
+        os.remove(os.path.expanduser(path) + ".progress")
+    except OSError:
+        pass
+
+
+def read_plan(path=None):
+    """
+    Reads an execution plan
+
+    :param path str: the plan file
+    :return: the plan (server & operations)
+    :rtype: dict
+
+    """
+    logger = logging.getLogger(__name__ + '.read_plan')
+
+    data = None
+    try:
+        with open(os.path.expanduser(path), 'r') as stream:
+            data = json.load(stream)
+    except (IOError, ValueError) as e:
+        logger.error(e)
+    return data
+
+
+class PlanProgress(object):
+    """
+    Journal of the plan operations applied so far, kept next to the plan file
+    (<plan>.progress). Each successful operation is appended as it completes,
+    so a plan can be re-applied after a partial failure and resume where it
+    stopped.
+
+    The journal starts with the SHA-1 of the plan file it belongs to; the
+    journal of another plan (ie: a new plan written to the same path) is
+    ignored, and replaced on the first applied operation.
+
+    :param path str: the plan file
+
+    """
+    def __init__(self, path=None):
+        self.logger = logging.getLogger(__name__ + '.PlanProgress')
+        plan = os.path.expanduser(path)
+        self.path = plan + ".progress"
+        self.done = set()
+        self._lock = threading.Lock()
+        with open(plan, 'rb') as stream:
+            self.header = "plan " + hashlib.sha1(stream.read()).hexdigest()
+        self._started = False
+
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as stream:
+                lines = [line.strip() for line in stream if line.strip()]
+            if lines and lines[0] == self.header:
+                self.done = set(lines[1:])
+                self._started = True
+            else:
+                self.logger.info("Ignoring the progress of another plan: {0}".format(
+                    self.path))
+
+    @staticmethod
+    def key(op=None, repo_id=None):
+        return "{0}:{1}".format(op, repo_id)
+
+    def is_done(self, op=None, repo_id=None):
+        """
+        :return: whether an operation was already applied
+        :rtype: bool
+        """
+        return self.key(op, repo_id) in self.done
+
+    def mark(self, op=None, repo_id=None):
+        """
+        Records an operation as applied
+
+        :return: None
+
+        """
+        key = self.key(op, repo_id)
+        with self._lock:
+            self.done.add(key)
+            if not self._started:
+                with open(self.path, 'w') as stream:
+                    stream.write(self.header + "\n")
+                self._started = True
+            with open(self.path, 'a') as stream:
+                stream.write(key + "\n")
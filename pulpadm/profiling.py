@@ -0,0 +1,236 @@
+from __future__ import print_function, unicode_literals
+import os
+import sys
+import json
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# Phases of a command, in the order they usually run
+PHASES = ("config", "parse", "fetch", "diff", "apply")
+
+# Number of functions (cpu) or allocation sites (mem) reported
+TOP = 25
+
+# Default output file per mode
+OUTPUT = {
+    "cpu": "pulpadm-cpu.prof",
+    "mem": "pulpadm-mem.txt",
+    "wall": "pulpadm-wall.json"
+}
+
+# Profiler of the running command, if any (see phase())
+_active = None
+
+
+@contextmanager
+def _noop():
+    yield
+
+
+def phase(name=None):
+    """
+    Times a phase of the running command (see PHASES), ie:
+
+        with profiling.phase("fetch"):
+            repos = repo.get()
+
+    Does nothing unless the command runs with --profile.
+
+    :param name str: the phase
+    :return: context manager
+
+    """
+    if _active is None:
+        return _noop()
+    return _active.phase(name)
+
+
+def timed(name=None, iterable=None):
+    """
+    Times the iteration of a lazy iterable (ie: repositories fetched page by
+    page) as a phase, leaving out the time spent by the caller on every item
+
+    :param name str: the phase
+    :param iterable iterable: the iterable
+    :return: the items of iterable
+    :rtype: iterable
+
+    """
+    if _active is None:
+        return iterable
+    return _active.timed(name, iterable)
+
+
+def _memory():
+    """
+    :return: current & peak memory of the process (bytes); traced Python
+             allocations if tracemalloc is tracing, RSS otherwise (current
+             is None if unknown)
+    :rtype: tuple
+    """
+    try:
+        import tracemalloc
+        if tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()
+    except ImportError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak *= 1 if sys.platform == "darwin" else 1024
+    try:
+        with open("/proc/self/statm") as stream:
+            current = int(stream.read().split()[1]) * resource.getpagesize()
+    except (IOError, OSError, ValueError):
+        current = None
+    return current, peak
+
+
+class Profiler(object):
+    """
+    Profiles a whole command and times its phases (see phase()):
+
+    - cpu: cProfile statistics of the main thread (load them with pstats);
+      requests sent by worker threads (-j) show up as time spent waiting
+    - mem: the TOP allocation sites (tracemalloc; on Python 2, the TOP object
+      types by count, through gc) and the memory after every phase
+    - wall: time spent in every phase only, as JSON
+
+    The phase breakdown is printed on stderr in every mode.
+
+    :param mode str: cpu, mem or wall
+    :param path str: output file (default: see OUTPUT)
+    :param top int: number of functions or allocation sites reported
+
+    """
+    def __init__(self, mode="wall", path=None, top=TOP):
+        self.mode = mode
+        self.path = os.path.expanduser(path or OUTPUT[mode])
+        self.top = top
+        self.phases = OrderedDict()
+        self.started = None
+        self.elapsed = None
+        self._profile = None
+        self._tracemalloc = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Starts profiling, and makes phase() report to this profiler
+        """
+        global _active
+        _active = self
+        if self.mode == "cpu":
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        elif self.mode == "mem":
+            try:
+                import tracemalloc
+                tracemalloc.start()
+                self._tracemalloc = tracemalloc
+            except ImportError:
+                pass
+        self.started = time.time()
+
+    @contextmanager
+    def phase(self, name=None):
+        start = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start
+            with self._lock:
+                item = self.phases.setdefault(name, {"time": 0.0, "calls": 0})
+                item["time"] += elapsed
+                item["calls"] += 1
+                if self.mode == "mem":
+                    item["memory"], item["peak"] = _memory()
+
+    def timed(self, name=None, iterable=None):
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def stop(self):
+        """
+        Stops profiling, writes the output file and prints the phase
+        breakdown on stderr
+        """
+        global _active
+        self.elapsed = time.time() - self.started
+        _active = None
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.path)
+        elif self.mode == "mem":
+            with open(self.path, "w") as stream:
+                stream.write(self.format_phases() + "\n\n" + self.format_memory() + "\n")
+            if self._tracemalloc is not None:
+                self._tracemalloc.stop()
+        else:
+            with open(self.path, "w") as stream:
+                json.dump({"elapsed": self.elapsed, "phases": self.phases}, stream,
+                          indent=4, separators=(",", ": "))
+        sys.stderr.write("\n" + self.format_phases() + "\n\n")
+        sys.stderr.write("Profile ({0}) written to {1}\n\n".format(self.mode, self.path))
+
+    def format_phases(self):
+        """
+        :return: time (and memory, in mem mode) of every phase as a text
+                 table; time outside any phase is reported as "other"
+        :rtype: str
+        """
+        def mb(value):
+            return "{0:.1f}".format(value / 1048576.0) if value is not None else "-"
+
+        names = [name for name in PHASES if name in self.phases] + \
+            [name for name in self.phases if name not in PHASES]
+        total = self.elapsed or 0.0
+        mem = self.mode == "mem"
+        lines = ["{0:<10} {1:>6} {2:>9} {3:>6}".format("Phase", "Calls", "Time (s)", "%") +
+                 (" {0:>10} {1:>10}".format("Mem MB", "Peak MB") if mem else "")]
+        for name in names:
+            item = self.phases[name]
+            lines.append("{0:<10} {1:>6} {2:>9.3f} {3:>5.1f}%".format(
+                name, item["calls"], item["time"], item["time"] * 100.0 / max(total, 0.001)) +
+                (" {0:>10} {1:>10}".format(mb(item.get("memory")), mb(item.get("peak")))
+                 if mem else ""))
+        other = max(total - sum(item["time"] for item in self.phases.values()), 0.0)
+        lines.append("{0:<10} {1:>6} {2:>9.3f} {3:>5.1f}%".format(
+            "other", "-", other, other * 100.0 / max(total, 0.001)))
+        lines.append("{0:<10} {1:>6} {2:>9.3f}".format("total", "-", total))
+        return "\n".join(lines)
+
+    def format_memory(self):
+        """
+        :return: the TOP allocation sites (or object types) as text
+        :rtype: str
+        """
+        if self._tracemalloc is not None:
+            snapshot = self._tracemalloc.take_snapshot().filter_traces((
+                self._tracemalloc.Filter(False, self._tracemalloc.__file__),
+            ))
+            lines = ["Top {0} allocation sites:".format(self.top)]
+            for stat in snapshot.statistics("lineno")[:self.top]:
+                frame = stat.traceback[0]
+                lines.append("{0:>10.1f} KB {1:>9} blocks  {2}:{3}".format(
+                    stat.size / 1024.0, stat.count, frame.filename, frame.lineno))
+            return "\n".join(lines)
+
+        import gc
+        counts = {}
+        for obj in gc.get_objects():
+            name = type(obj).__name__
+            counts[name] = counts.get(name, 0) + 1
+        lines = ["Top {0} object types (tracemalloc unavailable):".format(self.top)]
+        for name, count in sorted(counts.items(), key=lambda item: -item[1])[:self.top]:
+            lines.append("{0:>10} {1}".format(count, name))
+        return "\n".join(lines)
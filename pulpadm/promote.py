@@ -0,0 +1,73 @@
+from __future__ import print_function, unicode_literals
+
+
+# Repository config keys defining release tiers (see read_chains())
+PROMOTE_FROM = "promote_from"
+PROMOTE_FILTERS = "promote_filters"
+
+
+def read_chains(data=None):
+    """
+    Reads the release tier chains from the repos file: every repository with
+    a `promote_from' key gets the content units of that (upstream) repository
+    when promoted, ie: upstream -> unstable -> stable:
+
+        epel-unstable:
+          promote_from: epel
+        epel-stable:
+          promote_from: epel-unstable
+          promote_filters: {"name": {"$regex": "^python-"}}
+
+    `promote_filters' optionally restricts the promoted units (mongo-like
+    unit filters, as for Pulp unit association criteria).
+
+    :param data dict: the repos file
+    :return: (source repo id, unit filters) by destination repo id
+    :rtype: dict
+
+    """
+    chains = {}
+    for repo_id, config in (data or {}).items():
+        if isinstance(config, dict) and config.get(PROMOTE_FROM):
+            chains[repo_id] = (config[PROMOTE_FROM], config.get(PROMOTE_FILTERS))
+    return chains
+
+
+def tiers(chains=None, repo_ids=None):
+    """
+    Orders promotions in tiers, downstream first: a repository is promoted
+    before its source repository gets new content from further upstream, so
+    every run moves content one tier down the chain. Promotions of the same
+    tier do not depend on each other.
+
+    :param chains dict: source repo id by destination repo id (see
+                        read_chains())
+    :param repo_ids list: only promote into these repositories (default: all)
+    :raises ValueError: if chains have a cycle or repo_ids are not promoted
+                        from anywhere
+    :return: destination repo ids of every tier, downstream first
+    :rtype: list
+
+    """
+    depths = {}
+
+    def depth(repo_id, path=()):
+        if repo_id in path:
+            raise ValueError("Promotion cycle: {0}".format(
+                " -> ".join(reversed(path[path.index(repo_id):] + (repo_id,)))))
+        if repo_id not in depths:
+            source = chains[repo_id][0] if repo_id in chains else None
+            depths[repo_id] = 0 if source is None else depth(source, path + (repo_id,)) + 1
+        return depths[repo_id]
+
+    for repo_id in chains or {}:
+        depth(repo_id)
+    if repo_ids:
+        unknown = [repo_id for repo_id in repo_ids if repo_id not in chains]
+        if unknown:
+            raise ValueError("Not promoted from any repository: {0}".format(
+                ", ".join(unknown)))
+    selected = set(repo_ids or chains or {})
+    levels = sorted(set(depths[repo_id] for repo_id in selected), reverse=True)
+    return [sorted(repo_id for repo_id in selected if depths[repo_id] == level)
+            for level in levels]
@@ -1,36 +1,346 @@
 from __future__ import print_function, unicode_literals
 import re
-import sys
 import json
+import time
+import hashlib
 import logging
+import threading
 from urlparse import urlparse
-import requests
-from requests.auth import HTTPBasicAuth
 import pulpadm.utils as utils
-from pulpadm.constants import API_PATH, MAX_SPEED
+from pulpadm.errors import PulpError, CircuitOpenError
+from pulpadm.tasks import parse_time
+from pulpadm.retry import RetryPolicy, CircuitBreaker, is_failure, retry_after
+from pulpadm.constants import API_PATH, MAX_SPEED, PAGE_SIZE, POOL_CONNECTIONS, \
+    POOL_MAXSIZE, UNITS_PAGE_SIZE
 
 
-# Disable urllib3 warnings at the top-level
-requests.packages.urllib3.disable_warnings()
+# Note holding the fingerprint of the config a repository was created or
+# updated with (see fingerprint())
+FINGERPRINT_NOTE = "_pulpadm-fingerprint"
 
+# Importer config keys holding file contents (certs & keys)
+FILE_KEYS = ("ssl_ca_cert", "ssl_client_cert", "ssl_client_key")
 
-class RPMRepo:
+
+def fingerprint(repo_config=None):
+    """
+    Computes the fingerprint of a create repository API object: the SHA-256
+    of its canonical JSON form (sorted keys, no whitespace), where certs and
+    keys are replaced by the SHA-256 of their contents and the fingerprint
+    note itself is left out. Equal configs always get the same fingerprint.
+
+    :param repo_config dict: create repository API object
+    :return: the fingerprint (hex digest)
+    :rtype: str
+
+    """
+    config = dict(repo_config)
+    config["notes"] = dict((key, value) for key, value in
+                           (repo_config.get("notes") or {}).items()
+                           if key != FINGERPRINT_NOTE)
+    importer_config = dict(repo_config.get("importer_config") or {})
+    for key in FILE_KEYS:
+        if importer_config.get(key) is not None:
+            importer_config[key] = hashlib.sha256(
+                importer_config[key].encode("utf-8")).hexdigest()
+    config["importer_config"] = importer_config
+    canonical = json.dumps(config, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def changed_since_publish(repo=None, distributor=None):
+    """
+    Tells whether units were added to or removed from a repository since its
+    last publish through a distributor (never published counts as changed)
+
+    :param repo dict: the repository information (see RPMRepo.get())
+    :param distributor dict: one of the repository distributors
+    :rtype: bool
+
+    """
+    published = parse_time(distributor.get("last_publish"))
+    if published is None:
+        return True
+    for key in ("last_unit_added", "last_unit_removed"):
+        changed = parse_time(repo.get(key))
+        if changed is not None and changed > published:
+            return True
+    return False
+
+
+class RPMRepo(object):
     """
     Create RPM repo object
 
+    All API requests go through a single keep-alive session, so connections to
+    the Pulp server are pooled and re-used across calls. The session (and the
+    requests module) is only loaded by the first API request.
+
+    Failed requests are retried according to the retry policy, and the circuit
+    breaker stops sending requests to a server that keeps failing. Errors are
+    raised as PulpError.
+
     :param hostname str: pulp server hostname
     :param port int: pulp server RESTful HTTP port
     :param username str: pulp server account username
     :param password str: pulp server account password
+    :param pool_connections int: number of connection pools to cache
+    :param pool_maxsize int: maximum number of connections to keep per host
+    :param pool_block bool: whether to wait for a free connection instead of
+                            opening extra ones when the pool is exhausted
+    :param keep_alive bool: whether to keep connections open between requests
+    :param cache InventoryCache: cache for repository listings (default: None)
+    :param metrics Metrics: collects timing, size & status of every API
+                            request (default: None)
+    :param retry RetryPolicy: retries of failed requests (default: 3 retries)
+    :param breaker CircuitBreaker: circuit breaker (default: opens after 5
+                                   consecutive failures)
 
     """
-    def __init__(self, hostname=None, port=None, username=None, password=None):
+    def __init__(self, hostname=None, port=None, username=None, password=None,
+                 pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                 pool_block=False, keep_alive=True, cache=None, metrics=None,
+                 retry=None, breaker=None):
         self.logger = logging.getLogger(__name__ + '.RPMRepo')
         self.logger.debug("Initiate RPMRepo object")
 
         # Pulp Server url & auth
-        self.url = "https://{0}:{1}/{2}".format(hostname, port, API_PATH["repo"])
-        self.auth = HTTPBasicAuth(username, password)
+        self.base_url = "https://{0}:{1}/".format(hostname, port)
+        self.url = self.base_url + API_PATH["repo"]
+        self.content_url = self.base_url + API_PATH["content"]
+        self.consumers_url = self.base_url + API_PATH["consumers"]
+        self.auth = (username, password)
+        self.cache = cache
+        self.metrics = metrics
+
+        # Resilience: retries & circuit breaker
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+
+        # HTTP session & connection pool settings
+        self.pool = {
+            "pool_connections": pool_connections,
+            "pool_maxsize": pool_maxsize,
+            "pool_block": pool_block
+        }
+        self.keep_alive = keep_alive
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """
+        HTTP session & connection pool, created on first use
+        """
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    # Disable urllib3 warnings (unverified HTTPS requests)
+                    requests.packages.urllib3.disable_warnings()
+
+                    session = requests.Session()
+                    session.auth = self.auth
+                    session.headers.update({"Content-Type": "application/json"})
+                    if not self.keep_alive:
+                        session.headers["Connection"] = "close"
+                    session.mount("https://", HTTPAdapter(**self.pool))
+                    self._session = session
+        return self._session
+
+    def _request(self, method, url, idempotent=None, **kwargs):
+        """
+        Sends an API request through the pooled session. Connection errors,
+        429, 500, 502, 503 & 504 responses are retried (see RetryPolicy),
+        honoring the Retry-After header; these & any other 5xx count as
+        failures for the circuit breaker.
+
+        :param method str: HTTP method
+        :param url str: full URL of the API end-point
+        :param idempotent bool: whether the request can be sent twice, ie: a
+                                search (default: depends on method)
+        :param kwargs: extra arguments for requests.Session.request()
+        :raises PulpError: if the server cannot be reached
+        :return: API response
+        :rtype: requests.Response
+
+        """
+        from requests.exceptions import RequestException
+
+        # verify is given per request; a session-level value would be
+        # overridden by the REQUESTS_CA_BUNDLE environment variable
+        kwargs.setdefault("verify", False)
+
+        start = time.time()
+        attempt = 0
+        while True:
+            r = error = None
+            try:
+                self.breaker.before()
+                r = self.session.request(method, url, **kwargs)
+            except CircuitOpenError as e:
+                error = e
+                break
+            except RequestException as e:
+                error = e
+            status = r.status_code if r is not None else None
+            if is_failure(status):
+                self.breaker.failure()
+            else:
+                self.breaker.success()
+
+            if not self.retry.should_retry(attempt, method, status, idempotent):
+                break
+            delay = self.retry.delay(
+                attempt, retry_after(r.headers.get("Retry-After")) if r is not None else None)
+            self.logger.warning("{0} {1}: {2}; retrying in {3:.1f}s ({4}/{5})".format(
+                method, url, status or error, delay, attempt + 1, self.retry.retries))
+            time.sleep(delay)
+            attempt += 1
+
+        if self.metrics is not None:
+            self.metrics.record(
+                method, url, status=r.status_code if r is not None else None,
+                elapsed=time.time() - start,
+                ttfb=r.elapsed.total_seconds() if r is not None else None,
+                size=len(r.content) if r is not None else 0, retries=attempt)
+        if isinstance(error, CircuitOpenError):
+            raise error
+        if r is None:
+            raise PulpError("Unable to reach the Pulp server: {0}".format(error))
+        return r
+
+    def _error(self, r, repo_id=None, msg=None):
+        """
+        Builds the error of a failed API request
+
+        :param r requests.Response: API response
+        :param repo_id str: the repository the request was about
+        :param msg str: error message (default: the server's description)
+        :return: the error
+        :rtype: PulpError
+
+        """
+        if msg is None:
+            try:
+                data = self._json(r)
+                msg = (data.get("error") or {}).get("description") or \
+                    data.get("error_message")
+            except (ValueError, AttributeError):
+                pass
+        if msg is None:
+            msg = "HTTP {0} {1}".format(r.status_code, r.reason)
+        return PulpError(msg, status=r.status_code, repo_id=repo_id)
+
+    def _json(self, r):
+        """
+        Decodes an API response, recording the time spent doing so
+
+        :param r requests.Response: API response
+        :return: decoded API response
+
+        """
+        if self.metrics is None:
+            return r.json()
+        start = time.time()
+        try:
+            return r.json()
+        finally:
+            self.metrics.record_parse(r.request.method, r.url, time.time() - start)
+
+    def _cached_request(self, method, url, params=None, data=None):
+        """
+        Sends a read-only API request. Responses are answered from (and stored
+        into) the inventory cache, if any; stale entries are revalidated with
+        a conditional request.
+
+        :param method str: HTTP method
+        :param url str: full URL of the API end-point
+        :param params dict: query parameters
+        :param data str: request body
+        :return: HTTP status code and decoded API response
+        :rtype: tuple
+
+        """
+        key = entry = None
+        headers = {}
+        if self.cache is not None:
+            key = self.cache.key(method, url, params, data)
+            entry = self.cache.load(key)
+            if entry is not None:
+                if self.cache.is_fresh(entry):
+                    return 200, entry["data"]
+                if entry.get("etag"):
+                    headers["If-None-Match"] = entry["etag"]
+                if entry.get("last_modified"):
+                    headers["If-Modified-Since"] = entry["last_modified"]
+
+        r = self._request(method, url, idempotent=True, params=params, data=data,
+                          headers=headers)
+        if r.status_code == 304 and entry is not None:
+            self.cache.touch(key)
+            return 200, entry["data"]
+        try:
+            response = self._json(r)
+        except ValueError:
+            response = None
+        if r.status_code == 200 and self.cache is not None:
+            self.cache.store(key, response, etag=r.headers.get("ETag"),
+                             last_modified=r.headers.get("Last-Modified"))
+        return r.status_code, response
+
+    def _invalidate(self):
+        """
+        Drops cached repository listings after the server state changed
+        """
+        if self.cache is not None:
+            self.cache.clear()
+
+    def connection_stats(self):
+        """
+        Reports how many HTTP connections were opened to serve the requests
+        sent so far. Every request above the number of connections re-used an
+        already established (TLS) connection.
+
+        :return: number of requests, connections and re-used connections
+        :rtype: dict
+
+        """
+        requests_sent = 0
+        connections = 0
+        adapters = self._session.adapters.values() if self._session else []
+        for adapter in adapters:
+            manager = getattr(adapter, "poolmanager", None)
+            if manager is None:
+                continue
+            for key in manager.pools.keys():
+                pool = manager.pools.get(key)
+                if pool is not None:
+                    requests_sent += pool.num_requests
+                    connections += pool.num_connections
+        return {
+            "requests": requests_sent,
+            "connections": connections,
+            "reused": max(requests_sent - connections, 0)
+        }
+
+    def close(self):
+        """
+        Reports connection re-use and closes every pooled connection
+
+        :return: None
+
+        """
+        if self._session is None:
+            return
+        stats = self.connection_stats()
+        self.logger.info(
+            "HTTP connections: {0} request(s) over {1} connection(s), "
+            "{2} re-used".format(
+                stats["requests"], stats["connections"], stats["reused"]))
+        self._session.close()
 
     def generate_repo_create(self, repo_id=None, **kwargs):
         """
@@ -51,6 +361,10 @@ class RPMRepo:
         proxy_port (int)    Port on the proxy server to make requests
 
 
+        The fingerprint of the API object is stored in the FINGERPRINT_NOTE
+        note, so it can be compared later on without fetching the whole
+        repository (see fingerprint()).
+
         :param repo_id str: the repository id
         :param kwargs: the repository config information
         :return: create repository API object
@@ -72,7 +386,7 @@ class RPMRepo:
                 max_speed = MAX_SPEED
 
             # Return API object
-            return {
+            repo_config = {
                 "id": repo_id,
                 "display_name": kwargs.get("display_name", None),
                 "notes": {
@@ -84,9 +398,9 @@ class RPMRepo:
                     "max_speed": max_speed,
                     "proxy_host": kwargs.get("proxy_host", None),
                     "proxy_port": kwargs.get("proxy_port", None),
-                    "ssl_ca_cert": utils.read_file(kwargs.get("feed_ca_cert", None)),
-                    "ssl_client_cert": utils.read_file(kwargs.get("feed_cert", None)),
-                    "ssl_client_key": utils.read_file(kwargs.get("feed_key", None))
+                    "ssl_ca_cert": utils.read_file_cached(kwargs.get("feed_ca_cert", None)),
+                    "ssl_client_cert": utils.read_file_cached(kwargs.get("feed_cert", None)),
+                    "ssl_client_key": utils.read_file_cached(kwargs.get("feed_key", None))
                 },
                 "distributors": [
                     {
@@ -111,10 +425,75 @@ class RPMRepo:
                     }
                 ]
             }
+            repo_config["notes"][FINGERPRINT_NOTE] = fingerprint(repo_config)
+            return repo_config
         else:
             return {}
 
-    def get(self, repo_id=None, details=False):
+    def generate_repo_update(self, repo_config=None, repo=None):
+        """
+        Compares a create repository API object (desired state) with a
+        repository as returned by get(details=True) (actual state), and
+        generates an update repository API object holding only what differs.
+        Unset (None) values of the desired state remove the key on the server.
+
+        :param repo_config dict: create repository API object
+                                 //see generate_repo_create() method for more
+                                 details//
+        :param repo dict: the repository information (details included)
+        :return: update repository API object, empty if nothing changed
+        :rtype: dict
+
+        """
+        logger = logging.getLogger(__name__ + ".generate_repo_update")
+
+        def diff(desired, actual):
+            delta = {}
+            for key, value in desired.items():
+                if value is None:
+                    if actual.get(key) is not None:
+                        delta[key] = None
+                elif actual.get(key) != value:
+                    delta[key] = value
+            return delta
+
+        if not repo_config or not repo:
+            return {}
+        update = {}
+
+        # Repository metadata
+        delta = diff({"display_name": repo_config.get("display_name")}, repo)
+        notes = diff(repo_config.get("notes") or {}, repo.get("notes") or {})
+        if notes:
+            delta["notes"] = notes
+        if delta:
+            update["delta"] = delta
+
+        # Importer
+        importers = repo.get("importers") or [{}]
+        delta = diff(repo_config.get("importer_config") or {},
+                     importers[0].get("config") or {})
+        if delta:
+            update["importer_config"] = delta
+
+        # Distributors
+        actual = dict((item["id"], item.get("config") or {})
+                      for item in repo.get("distributors") or [])
+        for item in repo_config.get("distributors") or []:
+            distributor_id = item["distributor_id"]
+            if distributor_id not in actual:
+                msg = "Distributor [{0}] is missing on repository [{1}]".format(
+                    distributor_id, repo["id"])
+                logger.warning(msg)
+                continue
+            delta = diff(item.get("distributor_config") or {}, actual[distributor_id])
+            if delta:
+                update.setdefault("distributor_configs", {})[distributor_id] = delta
+
+        return update
+
+    def get(self, repo_id=None, details=False, fields=None, filters=None,
+            limit=None, skip=None):
         """
         Retrieves information on all repositories (single repository if repo_id
         is given). The returned data includes general repository metadata,
@@ -122,35 +501,93 @@ class RPMRepo:
         and a count of how many content units have been stored locally for the
         repository.
 
+        If any of fields, filters, limit or skip is given, the repositories
+        search API is used instead, so only the matching repositories and the
+        requested fields are transferred.
+
         :param repo_id str: the repository id
         :param details bool: whether to include distributors, importers and
                              content unit
+        :param fields list: repository fields to return, ie: ["id"]
+        :param filters dict: mongo-like filters, ie: {"id": {"$in": [...]}}
+        :param limit int: maximum number of repositories to return
+        :param skip int: number of repositories to skip
         :return: repository information
         :rtype: list
 
         """
-        logger = logging.getLogger(__name__ + ".get")
-
         # API request
-        r = requests.get(
-            self.url + repo_id + "/" if repo_id else self.url,
-            auth=self.auth, verify=False,
-            params={"details": details},
-            headers={"Content-Type": "application/json"}
-        )
+        search = any(item is not None for item in (fields, filters, limit, skip))
+        if search:
+            criteria = {}
+            if repo_id is not None:
+                filters = dict(filters or {}, id=repo_id)
+            if fields:
+                criteria["fields"] = list(fields)
+            if filters:
+                criteria["filters"] = filters
+            if limit is not None or skip is not None:
+                # Stable order, so pages do not overlap
+                criteria["sort"] = [["id", "ascending"]]
+            if limit is not None:
+                criteria["limit"] = limit
+            if skip is not None:
+                criteria["skip"] = skip
+            status, data = self._cached_request(
+                "POST", self.url + "search/",
+                data=json.dumps({
+                    "criteria": criteria,
+                    "importers": details,
+                    "distributors": details
+                }, sort_keys=True)
+            )
+        else:
+            status, data = self._cached_request(
+                "GET", self.url + repo_id + "/" if repo_id else self.url,
+                params={"details": details}
+            )
 
         # Error handlers
-        if r.status_code == 404:
+        if status == 404 or (search and repo_id is not None and not data):
             msg = "Repository [{0}] does not exist".format(repo_id)
-            #  msg = r.json()["error"].get("description", "Unknown")
-            logger.error("\033[0;31m" + msg + "\033[0m")
-            sys.exit(r.status_code)
+            raise PulpError(msg, status=404, repo_id=repo_id)
+        elif status != 200:
+            msg = (data or {}).get("error", {}).get("description") \
+                if isinstance(data, dict) else None
+            raise PulpError(msg or "HTTP {0}".format(status), status=status,
+                            repo_id=repo_id)
 
         # Return object
-        if repo_id is not None:
-            return [r.json()]
+        if repo_id is not None and not search:
+            return [data]
         else:
-            return r.json()
+            return data
+
+    def iter_repos(self, details=False, fields=None, filters=None,
+                   page_size=PAGE_SIZE):
+        """
+        Iterates over all repositories (or the ones matching filters), fetching
+        them one page at a time through the search API. Only a single page is
+        held in memory, and the first repositories are available as soon as
+        the first page arrives.
+
+        :param details bool: whether to include distributors and importers
+        :param fields list: repository fields to return (default: all)
+        :param filters dict: mongo-like filters
+        :param page_size int: number of repositories per request
+        :return: repository information, one repository at a time
+        :rtype: generator
+
+        """
+        skip = 0
+        while True:
+            page = self.get(details=details, fields=fields, filters=filters,
+                            limit=page_size, skip=skip)
+            for item in page:
+                yield item
+            if len(page) < page_size:
+                break
+            skip += page_size
 
     def create(self, repo_config=None):
         """
@@ -166,25 +603,55 @@ class RPMRepo:
 
         # API request
         if repo_config:
-            r = requests.post(
-                self.url, auth=self.auth, verify=False,
-                data=json.dumps(repo_config),
-                headers={"Content-Type": "application/json"}
-            )
+            r = self._request("POST", self.url, data=json.dumps(repo_config))
 
             # Error handlers
             repo_id = repo_config["id"]
             if r.status_code == 201:
+                self._invalidate()
                 msg = "Successfully created repository [{0}]".format(repo_id)
                 logger.info(msg)
             elif r.status_code == 409:
                 msg = "A repository with Id [{0}] already exists".format(repo_id)
-                logger.error("\033[0;31m" + msg + "\033[0m")
-                sys.exit(r.status_code)
+                raise self._error(r, repo_id, msg)
             else:
-                msg = r.json()["error"].get("description", "Unknown")
-                logger.error("\033[0;31m" + msg + "\033[0m")
-                sys.exit(r.status_code)
+                raise self._error(r, repo_id)
+
+    def update(self, repo_id=None, repo_update=None):
+        """
+        Updates an existing repository. Only the given repository metadata,
+        importer config and distributor configs keys are changed.
+
+        :param repo_id str: the repository id
+        :param repo_update dict: update repository API object
+                                 //see generate_repo_update() method for more
+                                 details//
+        :return: spawned task ids
+        :rtype: list
+
+        """
+        logger = logging.getLogger(__name__ + ".update")
+
+        # API request
+        if repo_id is not None and repo_update:
+            r = self._request("PUT", self.url + repo_id + "/",
+                              data=json.dumps(repo_update))
+
+            # Error handlers
+            if r.status_code in (200, 202):
+                self._invalidate()
+                tasks = [item["task_id"]
+                         for item in self._json(r).get("spawned_tasks") or []]
+                msg = "Successfully updated repository [{0}] ({1})".format(
+                    repo_id, ", ".join(sorted(repo_update.keys())))
+                logger.info(msg)
+                return tasks
+            elif r.status_code == 404:
+                msg = "Repository [{0}] does not exist".format(repo_id)
+                raise self._error(r, repo_id, msg)
+            else:
+                raise self._error(r, repo_id)
+        return []
 
     def delete(self, repo_id=None):
         """
@@ -200,26 +667,428 @@ class RPMRepo:
 
 
         :param repo_id str: the repository id
-        :param repo_id list: a list of repositories id
-        :return: None
+        :return: spawned task ids
+        :rtype: list
 
         """
         logger = logging.getLogger(__name__ + ".delete")
 
         # API request
         if repo_id is not None:
-            r = requests.delete(
-                self.url + repo_id + "/", auth=self.auth, verify=False,
-                headers={"Content-Type": "application/json"}
-            )
+            r = self._request("DELETE", self.url + repo_id + "/")
 
             # Error handlers
             if r.status_code == 202:
-                tasks = [item["task_id"] for item in r.json()["spawned_tasks"]]
+                self._invalidate()
+                tasks = [item["task_id"] for item in self._json(r)["spawned_tasks"]]
                 msg = "Created deletion task(s): {0} for repository: {1}".format(
                     tasks, repo_id)
                 logger.info(msg)
+                return tasks
             elif r.status_code == 404:
                 msg = "Repository [{0}] does not exist".format(repo_id)
-                logger.error("\033[0;31m" + msg + "\033[0m")
-                sys.exit(r.status_code)
+                raise self._error(r, repo_id, msg)
+            else:
+                raise self._error(r, repo_id)
+        return []
+
+    def search_units(self, repo_id=None, type_ids=None, fields=None,
+                     filters=None, limit=None, skip=None):
+        """
+        Searches the content units associated to a repository
+
+        :param repo_id str: the repository id
+        :param type_ids list: content unit types, ie: ["rpm"]
+        :param fields list: unit metadata fields to return, ie: ["name"]
+        :param filters dict: mongo-like association filters, ie:
+                             {"created": {"$gte": "2016-04-20T15:40:03Z"}}
+        :param limit int: maximum number of units to return
+        :param skip int: number of units to skip
+        :return: unit associations (unit_id, created & metadata)
+        :rtype: list
+
+        """
+        criteria = {}
+        if type_ids:
+            criteria["type_ids"] = list(type_ids)
+        if fields:
+            criteria["fields"] = {
+                "unit": list(fields),
+                "association": ["unit_id", "created"]
+            }
+        if filters:
+            criteria["filters"] = {"association": filters}
+        if limit is not None or skip is not None:
+            # Stable order, so pages do not overlap
+            criteria["sort"] = {"unit": [["_id", "ascending"]]}
+        if limit is not None:
+            criteria["limit"] = limit
+        if skip is not None:
+            criteria["skip"] = skip
+
+        # API request
+        r = self._request("POST", self.url + repo_id + "/search/units/",
+                          idempotent=True, data=json.dumps({"criteria": criteria}))
+
+        # Error handlers
+        if r.status_code == 404:
+            msg = "Repository [{0}] does not exist".format(repo_id)
+            raise self._error(r, repo_id, msg)
+        elif r.status_code != 200:
+            raise self._error(r, repo_id)
+
+        return self._json(r)
+
+    def iter_units(self, repo_id=None, type_ids=None, fields=None, filters=None,
+                   page_size=UNITS_PAGE_SIZE):
+        """
+        Iterates over the content units of a repository, fetching them one
+        page at a time (see search_units())
+
+        :return: unit associations, one unit at a time
+        :rtype: generator
+
+        """
+        skip = 0
+        while True:
+            page = self.search_units(repo_id=repo_id, type_ids=type_ids,
+                                     fields=fields, filters=filters,
+                                     limit=page_size, skip=skip)
+            for item in page:
+                yield item
+            if len(page) < page_size:
+                break
+            skip += page_size
+
+    def _action(self, repo_id=None, action=None, body=None):
+        """
+        Triggers a repository action (ie: sync, publish)
+
+        :param repo_id str: the repository id
+        :param action str: the action end-point, ie: "sync"
+        :param body dict: the action API object
+        :return: spawned task ids
+        :rtype: list
+
+        """
+        logger = logging.getLogger(__name__ + "._action")
+
+        # API request
+        r = self._request("POST", self.url + repo_id + "/actions/" + action + "/",
+                          data=json.dumps(body or {}))
+
+        # Error handlers
+        if r.status_code == 202:
+            tasks = [item["task_id"]
+                     for item in self._json(r).get("spawned_tasks") or []]
+            msg = "Created {0} task(s): {1} for repository: {2}".format(
+                action, tasks, repo_id)
+            logger.info(msg)
+            return tasks
+        elif r.status_code == 404:
+            msg = "Repository [{0}] does not exist".format(repo_id)
+            raise self._error(r, repo_id, msg)
+        else:
+            raise self._error(r, repo_id)
+
+    def sync(self, repo_id=None, override_config=None):
+        """
+        Synchronizes a repository from its feed. Distributors configured with
+        auto_publish are published by a follow-up (spawned) task.
+
+        :param repo_id str: the repository id
+        :param override_config dict: importer config values for this sync
+                                     only, ie: {"max_speed": 1048576}
+        :return: spawned task ids
+        :rtype: list
+
+        """
+        body = {"override_config": override_config} if override_config else {}
+        return self._action(repo_id=repo_id, action="sync", body=body)
+
+    def publish(self, repo_id=None, distributor_id="yum_distributor",
+                override_config=None):
+        """
+        Publishes a repository through one of its distributors
+
+        :param repo_id str: the repository id
+        :param distributor_id str: the distributor id
+        :param override_config dict: distributor config values for this
+                                     publish only
+        :return: spawned task ids
+        :rtype: list
+
+        """
+        body = {"id": distributor_id}
+        if override_config:
+            body["override_config"] = override_config
+        return self._action(repo_id=repo_id, action="publish", body=body)
+
+    def associate(self, repo_id=None, source_repo_id=None, type_ids=None,
+                  filters=None, override_config=None):
+        """
+        Copies content units from another repository, server side: only the
+        unit associations are created, no content is downloaded again
+
+        :param repo_id str: the destination repository id
+        :param source_repo_id str: the source repository id
+        :param type_ids list: unit types to copy, ie: ["rpm", "erratum"]
+                              (default: all)
+        :param filters dict: mongo-like unit filters, ie:
+                             {"name": {"$regex": "^python-"}}
+        :param override_config dict: importer config values for this copy
+                                     only, ie: {"recursive": True}
+        :return: spawned task ids
+        :rtype: list
+
+        """
+        criteria = {}
+        if type_ids:
+            criteria["type_ids"] = type_ids
+        if filters:
+            criteria["filters"] = {"unit": filters}
+        body = {"source_repo_id": source_repo_id, "criteria": criteria}
+        if override_config:
+            body["override_config"] = override_config
+        return self._action(repo_id=repo_id, action="associate", body=body)
+
+    def search_tasks(self, task_ids=None, fields=None, filters=None):
+        """
+        Retrieves the status of a batch of tasks with a single search request
+
+        :param task_ids list: the task ids
+        :param fields list: task fields to return (default: all)
+        :param filters dict: mongo-like filters, used instead of task_ids,
+                             ie: {"state": {"$in": ["running", "waiting"]}}
+        :return: task status reports
+        :rtype: list
+
+        """
+        if filters is None:
+            filters = {"task_id": {"$in": list(task_ids or [])}}
+        criteria = {"filters": filters}
+        if fields:
+            criteria["fields"] = fields
+
+        # API request
+        r = self._request(
+            "POST", self.base_url + API_PATH["tasks"] + "search/",
+            idempotent=True, data=json.dumps({"criteria": criteria})
+        )
+
+        # Error handlers
+        if r.status_code != 200:
+            raise self._error(r)
+
+        return self._json(r)
+
+    def orphan_counts(self):
+        """
+        Retrieves the number of orphaned content units (units not associated
+        to any repository) per content type
+
+        :return: number of orphaned units by content type id
+        :rtype: dict
+
+        """
+        # API request
+        r = self._request("GET", self.content_url + "orphans/")
+
+        # Error handlers
+        if r.status_code != 200:
+            raise self._error(r)
+
+        return dict((type_id, (item or {}).get("count", 0))
+                    for type_id, item in self._json(r).items())
+
+    def iter_orphans(self, type_id=None, fields=None):
+        """
+        Iterates over the orphaned units of a content type. The server only
+        lists the orphans themselves (no unit search over the whole type, nor
+        repository memberships), in a single response; units are projected
+        to the requested fields on the client side.
+
+        :param type_id str: content type, ie: "rpm"
+        :param fields list: unit fields to return (default: all)
+        :return: orphaned units, one unit at a time
+        :rtype: generator
+
+        """
+        # API request
+        r = self._request("GET", self.content_url + "orphans/" + type_id + "/")
+
+        # Error handlers
+        if r.status_code != 200:
+            raise self._error(r)
+
+        for item in self._json(r):
+            if fields:
+                item = dict((key, item[key]) for key in ["_id"] + list(fields)
+                            if key in item)
+            yield item
+
+    def delete_orphans(self, units=None):
+        """
+        Deletes orphaned content units (units still associated to a
+        repository are left alone by the server)
+
+        :param units list: (content type id, unit id) of every unit
+        :return: spawned task ids
+        :rtype: list
+
+        """
+        logger = logging.getLogger(__name__ + ".delete_orphans")
+
+        # API request; deleting the same orphans twice is harmless
+        r = self._request(
+            "POST", self.content_url + "actions/delete_orphans/", idempotent=True,
+            data=json.dumps([{"content_type_id": type_id, "unit_id": unit_id}
+                             for type_id, unit_id in units or []])
+        )
+
+        # Error handlers
+        if r.status_code == 202:
+            tasks = [item["task_id"]
+                     for item in self._json(r).get("spawned_tasks") or []]
+            msg = "Created orphan deletion task(s): {0} for {1} unit(s)".format(
+                tasks, len(units or []))
+            logger.info(msg)
+            return tasks
+        else:
+            raise self._error(r)
+
+    def search_consumers(self, fields=None, filters=None, limit=None, skip=None,
+                         bindings=False):
+        """
+        Searches the consumers (ie: child nodes) registered to the Pulp server
+
+        :param fields list: consumer fields to return, ie: ["id"]
+        :param filters dict: mongo-like filters, ie: {"id": {"$in": [...]}}
+        :param limit int: maximum number of consumers to return
+        :param skip int: number of consumers to skip
+        :param bindings bool: whether to include the repository bindings of
+                              each consumer
+        :return: consumers
+        :rtype: list
+
+        """
+        criteria = {}
+        if fields:
+            criteria["fields"] = list(fields)
+        if filters:
+            criteria["filters"] = filters
+        if limit is not None or skip is not None:
+            # Stable order, so pages do not overlap
+            criteria["sort"] = [["id", "ascending"]]
+        if limit is not None:
+            criteria["limit"] = limit
+        if skip is not None:
+            criteria["skip"] = skip
+
+        # API request
+        r = self._request(
+            "POST", self.consumers_url + "search/", idempotent=True,
+            data=json.dumps({"criteria": criteria, "bindings": bindings})
+        )
+
+        # Error handlers
+        if r.status_code != 200:
+            raise self._error(r)
+
+        return self._json(r)
+
+    def iter_consumers(self, fields=None, filters=None, bindings=False,
+                       page_size=PAGE_SIZE):
+        """
+        Iterates over the consumers (or the ones matching filters), fetching
+        them one page at a time (see search_consumers())
+
+        :return: consumers, one consumer at a time
+        :rtype: generator
+
+        """
+        skip = 0
+        while True:
+            page = self.search_consumers(fields=fields, filters=filters,
+                                         limit=page_size, skip=skip,
+                                         bindings=bindings)
+            for item in page:
+                yield item
+            if len(page) < page_size:
+                break
+            skip += page_size
+
+    def bind(self, consumer_id=None, repo_id=None, distributor_id="yum_distributor",
+             notify_agent=True, binding_config=None):
+        """
+        Binds a consumer to a repository distributor, so the consumer gets
+        content from it
+
+        :param consumer_id str: the consumer id
+        :param repo_id str: the repository id
+        :param distributor_id str: the distributor id
+        :param notify_agent bool: whether the agent on the consumer is told
+                                  about the binding
+        :param binding_config dict: distributor-specific binding options
+        :return: spawned task ids
+        :rtype: list
+
+        """
+        logger = logging.getLogger(__name__ + ".bind")
+
+        # API request; binding twice is harmless
+        r = self._request(
+            "POST", self.consumers_url + consumer_id + "/bindings/", idempotent=True,
+            data=json.dumps({"repo_id": repo_id, "distributor_id": distributor_id,
+                             "notify_agent": notify_agent,
+                             "binding_config": binding_config or {}})
+        )
+
+        # Error handlers
+        if r.status_code in (200, 201, 202):
+            data = self._json(r) if r.content else {}
+            tasks = [item["task_id"] for item in (data or {}).get("spawned_tasks") or []]
+            msg = "Bound consumer [{0}] to repository [{1}] ({2})".format(
+                consumer_id, repo_id, distributor_id)
+            logger.info(msg)
+            return tasks
+        elif r.status_code == 404:
+            msg = "Consumer [{0}] or distributor [{1}] of repository [{2}] " \
+                "does not exist".format(consumer_id, distributor_id, repo_id)
+            raise self._error(r, repo_id, msg)
+        else:
+            raise self._error(r, repo_id)
+
+    def unbind(self, consumer_id=None, repo_id=None, distributor_id="yum_distributor"):
+        """
+        Removes the binding of a consumer to a repository distributor
+
+        :param consumer_id str: the consumer id
+        :param repo_id str: the repository id
+        :param distributor_id str: the distributor id
+        :return: spawned task ids
+        :rtype: list
+
+        """
+        logger = logging.getLogger(__name__ + ".unbind")
+
+        # API request
+        r = self._request(
+            "DELETE", "{0}{1}/bindings/{2}/{3}/".format(
+                self.consumers_url, consumer_id, repo_id, distributor_id)
+        )
+
+        # Error handlers
+        if r.status_code in (200, 202):
+            data = self._json(r) if r.content else {}
+            tasks = [item["task_id"] for item in (data or {}).get("spawned_tasks") or []]
+            msg = "Unbound consumer [{0}] from repository [{1}] ({2})".format(
+                consumer_id, repo_id, distributor_id)
+            logger.info(msg)
+            return tasks
+        elif r.status_code == 404:
+            msg = "Consumer [{0}] is not bound to repository [{1}] ({2})".format(
+                consumer_id, repo_id, distributor_id)
+            raise self._error(r, repo_id, msg)
+        else:
+            raise self._error(r, repo_id)
@@ -0,0 +1,166 @@
+from __future__ import print_function, unicode_literals
+import time
+import random
+import calendar
+import logging
+import threading
+from email.utils import parsedate
+from pulpadm.errors import CircuitOpenError
+from pulpadm.constants import RETRIES, RETRY_BACKOFF, RETRY_BACKOFF_MAX, \
+    BREAKER_THRESHOLD, BREAKER_TIMEOUT
+
+
+# Status codes worth retrying; 429 & 503 mean the request was not processed,
+# so they are retried for non-idempotent requests as well
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+REJECTED_STATUSES = (429, 503)
+
+# Methods that can be sent twice without changing the outcome
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+def is_failure(status=None):
+    """
+    :param status int: HTTP status code, None on connection errors
+    :return: whether a response counts as a failure of the server (connection
+             error, 429 or any 5xx) for the circuit breaker
+    :rtype: bool
+    """
+    return status is None or status == 429 or status >= 500
+
+
+def retry_after(value=None):
+    """
+    Parses a Retry-After header (seconds or HTTP date)
+
+    :param value str: the header value
+    :return: seconds to wait, None if value is empty or invalid
+    :rtype: float
+
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    date = parsedate(value)
+    if date is None:
+        return None
+    return max(calendar.timegm(date) - time.time(), 0.0)
+
+
+class RetryPolicy(object):
+    """
+    When and how long to wait before sending a failed API request again.
+    Delays grow exponentially with full jitter (a random delay between 0 and
+    backoff * 2^attempt, at most backoff_max seconds), unless the server
+    asks for a specific delay through Retry-After.
+
+    :param retries int: maximum number of retries per request
+    :param backoff float: base delay (seconds)
+    :param backoff_max float: maximum delay (seconds)
+
+    """
+    def __init__(self, retries=RETRIES, backoff=RETRY_BACKOFF,
+                 backoff_max=RETRY_BACKOFF_MAX):
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+
+    def should_retry(self, attempt, method=None, status=None, idempotent=None):
+        """
+        :param attempt int: number of retries done so far
+        :param method str: HTTP method
+        :param status int: HTTP status code, None on connection errors
+        :param idempotent bool: whether the request can be sent twice
+                                (default: depends on method)
+        :return: whether the request should be sent again
+        :rtype: bool
+        """
+        if attempt >= self.retries:
+            return False
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        if status is None or status in RETRY_STATUSES:
+            return idempotent or status in REJECTED_STATUSES
+        return False
+
+    def delay(self, attempt, retry_after=None):
+        """
+        :param attempt int: number of retries done so far
+        :param retry_after float: delay requested by the server (seconds)
+        :return: seconds to wait before the next retry
+        :rtype: float
+        """
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff * 2 ** attempt, self.backoff_max))
+
+
+class CircuitBreaker(object):
+    """
+    Stops sending requests to a server that keeps failing. After `threshold`
+    consecutive failures (connection errors, 429 & 5xx responses) the circuit
+    opens and requests fail right away for `timeout` seconds; then a single
+    trial request is let through, which closes the circuit if it succeeds.
+
+    :param threshold int: consecutive failures that open the circuit
+                          (0 disables the breaker)
+    :param timeout float: seconds the circuit stays open
+
+    """
+    def __init__(self, threshold=BREAKER_THRESHOLD, timeout=BREAKER_TIMEOUT):
+        self.logger = logging.getLogger(__name__ + '.CircuitBreaker')
+        self.threshold = threshold
+        self.timeout = timeout
+        self.failures = 0
+        self.opened = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def before(self):
+        """
+        Checks whether a request can be sent
+
+        :raises CircuitOpenError: if the circuit is open
+        :return: None
+
+        """
+        if not self.threshold:
+            return
+        with self._lock:
+            if self.opened is None:
+                return
+            remaining = self.opened + self.timeout - time.time()
+            if remaining > 0 or self._trial:
+                raise CircuitOpenError(
+                    "Pulp server unavailable; circuit breaker open ({0} "
+                    "consecutive failures)".format(self.failures))
+            self._trial = True
+
+    def success(self):
+        """
+        Records a successful request (closes the circuit)
+        """
+        with self._lock:
+            if self.opened is not None:
+                self.logger.info("Circuit breaker closed")
+            self.failures = 0
+            self.opened = None
+            self._trial = False
+
+    def failure(self):
+        """
+        Records a failed request (opens the circuit after `threshold` of them)
+        """
+        if not self.threshold:
+            return
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold and (self.opened is None or self._trial):
+                self.logger.warning(
+                    "\033[0;31m" + "Circuit breaker open for {0}s after {1} "
+                    "consecutive failures".format(self.timeout, self.failures) + "\033[0m")
+                self.opened = time.time()
+            self._trial = False
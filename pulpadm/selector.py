@@ -0,0 +1,146 @@
+from __future__ import print_function, unicode_literals
+import re
+import hashlib
+
+
+# Repository config key holding the tags of a repository (see RepoSelector)
+TAGS = "tags"
+
+
+def shard(value=None):
+    """
+    Parses a shard specification, ie: "2/4" (second of four shards)
+
+    :param value str: "I/N", with 1 <= I <= N
+    :raises ValueError: if value is not a valid specification
+    :return: shard number (from 1) & number of shards
+    :rtype: tuple
+
+    """
+    index, _, count = "{0}".format(value).partition("/")
+    index, count = int(index), int(count)
+    if not 1 <= index <= count:
+        raise ValueError("Shard must be I/N, with 1 <= I <= N")
+    return index, count
+
+
+def shard_of(repo_id=None, count=1):
+    """
+    Assigns a repository to one of `count' shards. The assignment only
+    depends on the repository id (not on the process, nor on the Python
+    version), so concurrent workers always split repositories the same way.
+
+    :return: shard number, from 1
+    :rtype: int
+
+    """
+    digest = hashlib.sha1(repo_id.encode("utf-8")).hexdigest()
+    return int(digest, 16) % count + 1
+
+
+def glob_to_regex(pattern=None):
+    """
+    Converts a shell-style wildcard pattern into an anchored regular
+    expression that Python and the Pulp server (MongoDB) agree on
+
+    :rtype: str
+
+    """
+    regex = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "*":
+            regex.append(".*")
+        elif char == "?":
+            regex.append(".")
+        elif char == "[" and pattern.find("]", i + 2) != -1:
+            end = pattern.find("]", i + 2)
+            body = pattern[i + 1:end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            regex.append("[" + body.replace("\\", "\\\\") + "]")
+            i = end
+        else:
+            regex.append(re.escape(char))
+        i += 1
+    return "^" + "".join(regex) + "$"
+
+
+class RepoSelector(object):
+    """
+    Selects a subset of the repositories of an input file (and of the Pulp
+    server): by id (wildcard patterns and/or a regular expression), by tag
+    (`tags' list of each repository in the input file) and by shard (stable
+    hash partitioning of the ids). Every given criterion must match; a
+    repository matches --tag if it has any of the tags.
+
+    :param patterns list: shell-style wildcard patterns, ie: ["epel-*"]
+    :param regex str: regular expression searched in the ids
+    :param tags list: tags, ie: ["prod", "el7"]
+    :param shard tuple: shard number & number of shards (see shard())
+    :raises re.error: if regex is not a valid regular expression
+
+    """
+    def __init__(self, patterns=None, regex=None, tags=None, shard=None):
+        self.patterns = [glob_to_regex(pattern) for pattern in patterns or []]
+        self.regex = regex
+        self.tags = set(tags or [])
+        self.shard = shard
+        self._patterns = [re.compile(item) for item in self.patterns]
+        self._regex = re.compile(regex) if regex else None
+
+    @property
+    def active(self):
+        """
+        :return: whether any criterion is given (otherwise everything matches)
+        :rtype: bool
+        """
+        return bool(self.patterns or self.regex or self.tags or self.shard)
+
+    def match_id(self, repo_id=None):
+        """
+        :return: whether a repository id matches the id & shard criteria
+        :rtype: bool
+        """
+        if self._patterns and not any(item.search(repo_id) for item in self._patterns):
+            return False
+        if self._regex and not self._regex.search(repo_id):
+            return False
+        if self.shard and shard_of(repo_id, self.shard[1]) != self.shard[0]:
+            return False
+        return True
+
+    def match(self, repo_id=None, config=None):
+        """
+        :param repo_id str: the repository id
+        :param config dict: the repository config in the input file
+        :return: whether a repository of the input file matches every
+                 criterion
+        :rtype: bool
+        """
+        if not self.match_id(repo_id):
+            return False
+        if self.tags:
+            tags = (config or {}).get(TAGS) if isinstance(config, dict) else None
+            return bool(self.tags & set(tags or []))
+        return True
+
+    def server_filters(self):
+        """
+        Returns the mongo-like filters narrowing a repository search on the
+        Pulp server down to (a superset of) the matching ids. Tags & shards
+        cannot be evaluated by the server; ids still need match_id().
+
+        :return: the filters, None if the server cannot narrow the search
+        :rtype: dict
+
+        """
+        if self.regex and not self.patterns:
+            return {"id": {"$regex": self.regex}}
+        if len(self.patterns) == 1:
+            return {"id": {"$regex": self.patterns[0]}}
+        if self.patterns:
+            return {"id": {"$regex": "|".join("(?:{0})".format(item)
+                                              for item in self.patterns)}}
+        return None
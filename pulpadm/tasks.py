@@ -0,0 +1,380 @@
+from __future__ import print_function, unicode_literals
+import time
+import calendar
+import logging
+from collections import deque
+from datetime import datetime
+import pulpadm.executor as executor
+from pulpadm.errors import PulpError
+
+
+# Task states after which a task will not change anymore
+FINAL_STATES = ("finished", "error", "canceled", "skipped")
+
+# Task states counted as server load
+ACTIVE_STATES = ("running", "waiting")
+
+# Task status fields requested on every poll
+TASK_FIELDS = ["task_id", "state", "start_time", "finish_time", "error",
+               "spawned_tasks"]
+
+
+def parse_time(value=None):
+    """
+    Converts a Pulp task timestamp (ISO 8601, UTC) into epoch seconds
+
+    :param value str: the timestamp, ie: "2016-04-20T15:40:03Z"
+    :return: epoch seconds, None if value is empty or unknown
+    :rtype: float
+
+    """
+    if not value:
+        return None
+    for fmt in ("%Y-%m-%dT%H:%M:%SZ", "%Y-%m-%dT%H:%M:%S.%fZ",
+                "%Y-%m-%dT%H:%M:%S+00:00", "%Y-%m-%dT%H:%M:%S.%f+00:00"):
+        try:
+            dt = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        return calendar.timegm(dt.timetuple()) + dt.microsecond / 1e6
+    return None
+
+
+class TaskTracker(object):
+    """
+    Tracks tasks spawned by the Pulp API until they reach a final state. Task
+    status is polled in batches (one search request per `batch_size` tasks),
+    and the polling interval backs off while nothing changes.
+
+    :param repo RPMRepo: the API client used to poll the tasks
+    :param batch_size int: maximum number of tasks per search request
+    :param min_interval float: initial/minimum seconds between polls
+    :param max_interval float: maximum seconds between polls
+    :param backoff float: interval multiplier applied after an idle poll
+
+    """
+    def __init__(self, repo=None, batch_size=100, min_interval=0.5,
+                 max_interval=10.0, backoff=1.5):
+        self.logger = logging.getLogger(__name__ + '.TaskTracker')
+        self.repo = repo
+        self.batch_size = batch_size
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.tasks = []
+        self._index = {}
+
+    def track(self, task_ids=None, label=None):
+        """
+        Adds tasks to be tracked
+
+        :param task_ids list: the task ids
+        :param label str: what the tasks belong to (ie: repository id)
+        :return: None
+
+        """
+        for task_id in task_ids or []:
+            if task_id in self._index:
+                continue
+            task = {
+                "task_id": task_id,
+                "label": label,
+                "state": "waiting",
+                "submitted": time.time(),
+                "started": None,
+                "finished": None,
+                "queued_time": None,
+                "running_time": None,
+                "error": None
+            }
+            self._index[task_id] = task
+            self.tasks.append(task)
+
+    def pending(self):
+        """
+        :return: tasks that did not reach a final state yet
+        :rtype: list
+        """
+        return [task for task in self.tasks if task["state"] not in FINAL_STATES]
+
+    def _update(self, task, report):
+        """
+        Updates a tracked task from its status report
+
+        :return: whether the task state changed
+        :rtype: bool
+
+        """
+        state = report.get("state") or task["state"]
+        if state == task["state"]:
+            return False
+
+        now = time.time()
+        task["state"] = state
+        if state != "waiting" and task["started"] is None:
+            task["started"] = now
+        if state in FINAL_STATES:
+            task["finished"] = now
+
+            # Running time comes from the server clock when available; queued
+            # time is whatever is left of the locally observed total
+            start = parse_time(report.get("start_time"))
+            finish = parse_time(report.get("finish_time"))
+            if start is not None and finish is not None:
+                running = max(finish - start, 0.0)
+            else:
+                running = now - task["started"]
+            task["running_time"] = running
+            task["queued_time"] = max(now - task["submitted"] - running, 0.0)
+
+            error = report.get("error")
+            if error:
+                task["error"] = error.get("description", "Unknown") \
+                    if isinstance(error, dict) else error
+            msg = "Task {0} ({1}) {2}".format(task["task_id"], task["label"], state)
+            if task["error"]:
+                self.logger.error("\033[0;31m" + msg + ": " + task["error"] + "\033[0m")
+            else:
+                self.logger.info(msg)
+
+        # Follow-up tasks (ie: publish after sync) are tracked as well
+        spawned = [item["task_id"] for item in report.get("spawned_tasks") or []
+                   if isinstance(item, dict) and "task_id" in item]
+        self.track(spawned, label=task["label"])
+        return True
+
+    def poll(self):
+        """
+        Polls every pending task once, `batch_size` tasks per request. A
+        transient error (ie: server unavailable) only skips this poll.
+
+        :return: number of tasks that changed state
+        :rtype: int
+
+        """
+        pending = [task["task_id"] for task in self.pending()]
+        changed = 0
+        for i in range(0, len(pending), self.batch_size):
+            batch = pending[i:i + self.batch_size]
+            try:
+                reports = self.repo.search_tasks(task_ids=batch, fields=TASK_FIELDS)
+            except PulpError as e:
+                if not e.transient:
+                    raise
+                self.logger.warning("Unable to poll tasks: {0}".format(e))
+                break
+            for report in reports:
+                task = self._index.get(report.get("task_id"))
+                if task is not None and self._update(task, report):
+                    changed += 1
+        self.logger.debug("Polled {0} task(s), {1} changed".format(
+            len(pending), changed))
+        return changed
+
+    def wait(self, timeout=None):
+        """
+        Polls until every tracked task reaches a final state. The interval
+        between polls is reset whenever a task changes state, and grows by
+        `backoff` (up to `max_interval`) after every idle poll.
+
+        :param timeout float: maximum seconds to wait (default: no limit)
+        :return: whether every task reached a final state
+        :rtype: bool
+
+        """
+        deadline = time.time() + timeout if timeout else None
+        while self.pending():
+            if self.poll():
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * self.backoff, self.max_interval)
+            if not self.pending():
+                break
+            if deadline is not None and time.time() + self.interval > deadline:
+                return False
+            time.sleep(self.interval)
+        return True
+
+
+class TaskScheduler(object):
+    """
+    Runs jobs that spawn tasks on the Pulp server (ie: repository syncs),
+    keeping at most `concurrency` jobs in flight. New jobs are only admitted
+    while the server has fewer than `max_running` running and `max_waiting`
+    waiting tasks (all tasks on the server, not only the ones of this
+    scheduler), so the Pulp workers are kept busy without flooding the queue.
+
+    A job is a list of stages, ie: [sync, publish]; each stage is a function
+    of the job label returning the ids of the spawned tasks, and is submitted
+    once every task of the previous stage finished successfully.
+
+    :param repo RPMRepo: the API client
+    :param concurrency int: maximum number of jobs in flight
+    :param max_running int: admit jobs only below this many running tasks
+                            (default: no limit)
+    :param max_waiting int: admit jobs only below this many waiting tasks
+                            (default: no limit)
+    :param min_interval float: initial/minimum seconds between polls
+    :param max_interval float: maximum seconds between polls
+    :param backoff float: interval multiplier applied after an idle poll
+    :param timeout float: maximum seconds a job stays in flight; its tasks
+                          are then no longer waited for and the job fails
+                          (default: no limit)
+
+    """
+    def __init__(self, repo=None, concurrency=4, max_running=None,
+                 max_waiting=None, min_interval=0.5, max_interval=10.0,
+                 backoff=1.5, timeout=None):
+        self.logger = logging.getLogger(__name__ + '.TaskScheduler')
+        self.repo = repo
+        self.concurrency = concurrency
+        self.max_running = max_running
+        self.max_waiting = max_waiting
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        self.tracker = TaskTracker(repo=repo)
+        self.jobs = []
+
+    def server_load(self):
+        """
+        :return: number of running & waiting tasks on the server
+        :rtype: dict
+        """
+        load = dict((state, 0) for state in ACTIVE_STATES)
+        reports = self.repo.search_tasks(
+            filters={"state": {"$in": list(ACTIVE_STATES)}},
+            fields=["task_id", "state"]
+        )
+        for report in reports:
+            load[report["state"]] = load.get(report["state"], 0) + 1
+        return load
+
+    def _slots(self, active):
+        """
+        :return: number of jobs that can be admitted right now
+        :rtype: int
+        """
+        slots = self.concurrency - active
+        if slots <= 0 or (self.max_running is None and self.max_waiting is None):
+            return max(slots, 0)
+
+        try:
+            load = self.server_load()
+        except PulpError as e:
+            if not e.transient:
+                raise
+            self.logger.warning("Unable to get the server load: {0}".format(e))
+            return 0
+        self.logger.debug("Server load: {0} running, {1} waiting".format(
+            load["running"], load["waiting"]))
+        if self.max_running is not None and load["running"] >= self.max_running:
+            return 0
+        if self.max_waiting is not None:
+            slots = min(slots, self.max_waiting - load["waiting"])
+        return max(slots, 0)
+
+    def _submit(self, job):
+        """
+        Submits the next stage of a job
+
+        :return: whether the stage was submitted
+        :rtype: bool
+
+        """
+        stage = job["stages"][job["stage"]]
+        result = executor.run(stage, [job["label"]])[0]
+        if not result.ok:
+            job["state"] = "failed"
+            job["error"] = "{0}".format(result.error)
+            job["finished"] = time.time()
+            return False
+        job["stage"] += 1
+        self.tracker.track(task_ids=result.value, label=job["label"])
+        return True
+
+    def _advance(self, job, tasks):
+        """
+        Moves a job in flight forward once its tasks reached a final state
+
+        :param job dict: the job
+        :param tasks list: tracked tasks of the job
+        :return: whether the job is done
+        :rtype: bool
+
+        """
+        if any(task["state"] not in FINAL_STATES for task in tasks):
+            if not self.timeout or time.time() - job["submitted"] <= self.timeout:
+                return False
+            job["state"] = "failed"
+            job["error"] = "Timed out after {0}s".format(self.timeout)
+            job["finished"] = time.time()
+            return True
+        failed = [task for task in tasks if task["state"] != "finished"]
+        if failed:
+            job["state"] = "failed"
+            job["error"] = failed[0]["error"] or failed[0]["state"]
+        elif job["stage"] < len(job["stages"]):
+            return not self._submit(job)
+        else:
+            job["state"] = "finished"
+        job["finished"] = time.time()
+        return True
+
+    def run(self, jobs=None):
+        """
+        Runs every job until all of them are done
+
+        :param jobs list: (label, stages) of every job, in submission order
+        :return: every job: label, state (finished or failed), submitted &
+                 finished times, tracked tasks and error
+        :rtype: list
+
+        """
+        queue = deque()
+        for label, stages in jobs or []:
+            job = {"label": label, "stages": stages, "stage": 0, "state": "queued",
+                   "submitted": None, "finished": None, "error": None}
+            self.jobs.append(job)
+            queue.append(job)
+
+        active = []
+        interval = self.min_interval
+        while queue or active:
+            # Admit jobs while there is room (in flight & on the server)
+            admitted = 0
+            for _ in range(self._slots(len(active)) if queue else 0):
+                job = queue.popleft()
+                job["state"] = "active"
+                job["submitted"] = time.time()
+                if self._submit(job):
+                    active.append(job)
+                    admitted += 1
+                if not queue:
+                    break
+
+            # Poll the tasks in flight & move their jobs forward
+            changed = self.tracker.poll() if self.tracker.pending() else 0
+            by_label = {}
+            for task in self.tracker.tasks:
+                by_label.setdefault(task["label"], []).append(task)
+            done = [job for job in active if self._advance(job, by_label.get(job["label"], []))]
+            for job in done:
+                active.remove(job)
+                self.logger.info("Job [{0}] {1} ({2:.1f}s); {3} in flight, {4} queued".format(
+                    job["label"], job["state"], job["finished"] - job["submitted"],
+                    len(active), len(queue)))
+
+            if changed or admitted or done:
+                interval = self.min_interval
+            else:
+                interval = min(interval * self.backoff, self.max_interval)
+            if queue or active:
+                time.sleep(interval)
+
+        for job in self.jobs:
+            job["tasks"] = [task for task in self.tracker.tasks
+                            if task["label"] == job["label"]]
+        return self.jobs
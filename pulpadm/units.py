@@ -0,0 +1,229 @@
+from __future__ import print_function, unicode_literals
+import os
+import errno
+import logging
+import sqlite3
+
+
+# RPM unit metadata kept in the index
+UNIT_FIELDS = ["name", "epoch", "version", "release", "arch", "checksum",
+               "checksumtype"]
+
+# Repository fields telling whether its units changed since the last refresh
+REPO_FIELDS = ["id", "last_unit_added", "last_unit_removed", "content_unit_counts"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    unit_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    epoch TEXT,
+    version TEXT,
+    release TEXT,
+    arch TEXT,
+    checksum TEXT,
+    checksumtype TEXT
+);
+CREATE TABLE IF NOT EXISTS repo_units (
+    repo_id TEXT NOT NULL,
+    unit_id TEXT NOT NULL,
+    PRIMARY KEY (repo_id, unit_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS repos (
+    repo_id TEXT PRIMARY KEY,
+    last_unit_added TEXT,
+    last_unit_removed TEXT,
+    unit_count INTEGER
+);
+CREATE INDEX IF NOT EXISTS units_name ON units (name);
+CREATE INDEX IF NOT EXISTS units_checksum ON units (checksum);
+CREATE INDEX IF NOT EXISTS repo_units_unit ON repo_units (unit_id);
+"""
+
+
+def _row_dict(cursor, row):
+    """
+    Returns SQLite rows as dicts (sqlite3.Row does not accept unicode keys on
+    Python 2)
+    """
+    return dict((column[0], value) for column, value in zip(cursor.description, row))
+
+
+def nevra(unit):
+    """
+    Formats a unit as name-[epoch:]version-release.arch
+    """
+    epoch = "{0}:".format(unit["epoch"]) if unit.get("epoch") not in (None, "", "0") else ""
+    return "{0}-{1}{2}-{3}.{4}".format(
+        unit["name"], epoch, unit["version"], unit["release"], unit["arch"])
+
+
+class UnitIndex(object):
+    """
+    Local index of the RPM units of a single Pulp server, mapping every
+    package (name, version, checksum...) to the repositories holding it. The
+    index is a SQLite database, so queries do not hit the server at all.
+
+    :param path str: the index database file
+
+    """
+    def __init__(self, path=None):
+        self.logger = logging.getLogger(__name__ + '.UnitIndex')
+        self.path = os.path.expanduser(path)
+
+        # Units metadata is not secret, but the index reveals the server layout
+        try:
+            os.makedirs(os.path.dirname(self.path), 0o700)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = _row_dict
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def repos(self):
+        """
+        :return: state of every indexed repository at its last refresh
+        :rtype: dict
+        """
+        return dict((row["repo_id"], row)
+                    for row in self.db.execute("SELECT * FROM repos"))
+
+    def is_current(self, repo=None):
+        """
+        :param repo dict: repository information (see REPO_FIELDS)
+        :return: whether the indexed units of a repository are up-to-date
+        :rtype: bool
+        """
+        row = self.db.execute("SELECT * FROM repos WHERE repo_id = ?",
+                              (repo["id"],)).fetchone()
+        return row is not None and \
+            row["last_unit_added"] == repo.get("last_unit_added") and \
+            row["last_unit_removed"] == repo.get("last_unit_removed") and \
+            row["unit_count"] == (repo.get("content_unit_counts") or {}).get("rpm", 0)
+
+    def since(self, repo=None):
+        """
+        Returns the time after which the units of a repository must be fetched
+        to bring the index up-to-date: the previous last_unit_added if units
+        were only added since the last refresh, None if a full fetch is needed
+
+        :param repo dict: repository information (see REPO_FIELDS)
+        :rtype: str
+
+        """
+        row = self.db.execute("SELECT * FROM repos WHERE repo_id = ?",
+                              (repo["id"],)).fetchone()
+        if row is None or not row["last_unit_added"] or \
+                row["last_unit_removed"] != repo.get("last_unit_removed"):
+            return None
+        return row["last_unit_added"]
+
+    def store(self, repo=None, units=None, full=True):
+        """
+        Stores the units of a repository in a single transaction
+
+        :param repo dict: repository information (see REPO_FIELDS)
+        :param units list: unit associations (see RPMRepo.search_units())
+        :param full bool: whether units are all the units of the repository
+                          (otherwise they are added to the indexed ones)
+        :return: number of units of the repository in the index
+        :rtype: int
+
+        """
+        repo_id = repo["id"]
+        with self.db:
+            if full:
+                self.db.execute("DELETE FROM repo_units WHERE repo_id = ?", (repo_id,))
+            self.db.executemany(
+                "INSERT OR REPLACE INTO units VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ([item["unit_id"]] + [item["metadata"].get(key) for key in UNIT_FIELDS]
+                 for item in units)
+            )
+            self.db.executemany(
+                "INSERT OR IGNORE INTO repo_units VALUES (?, ?)",
+                ((repo_id, item["unit_id"]) for item in units)
+            )
+            count = self.db.execute("SELECT COUNT(*) AS count FROM repo_units "
+                                    "WHERE repo_id = ?", (repo_id,)).fetchone()["count"]
+            self.db.execute(
+                "INSERT OR REPLACE INTO repos VALUES (?, ?, ?, ?)",
+                (repo_id, repo.get("last_unit_added"), repo.get("last_unit_removed"), count)
+            )
+        return count
+
+    def remove(self, repo_ids=None):
+        """
+        Drops repositories (ie: deleted from the server) from the index
+
+        :param repo_ids list: the repository ids
+        :return: None
+
+        """
+        with self.db:
+            for repo_id in repo_ids or []:
+                self.db.execute("DELETE FROM repo_units WHERE repo_id = ?", (repo_id,))
+                self.db.execute("DELETE FROM repos WHERE repo_id = ?", (repo_id,))
+
+    def prune(self):
+        """
+        Removes units not associated to any indexed repository
+
+        :return: number of removed units
+        :rtype: int
+
+        """
+        with self.db:
+            return self.db.execute(
+                "DELETE FROM units WHERE unit_id NOT IN "
+                "(SELECT DISTINCT unit_id FROM repo_units)"
+            ).rowcount
+
+    def query(self, name=None, version=None, release=None, arch=None,
+              checksum=None, repo_id=None):
+        """
+        Searches the indexed units. Every criterion is optional; name accepts
+        shell-style wildcards, ie: "kernel*"
+
+        :return: matching units, each one with the (sorted) ids of the
+                 repositories holding it
+        :rtype: list
+
+        """
+        where = []
+        params = []
+        for column, value in (("u.name", name), ("u.version", version),
+                              ("u.release", release), ("u.arch", arch),
+                              ("u.checksum", checksum)):
+            if value is not None:
+                where.append("{0} {1} ?".format(
+                    column, "GLOB" if column == "u.name" else "="))
+                params.append(value)
+        if repo_id is not None:
+            where.append("u.unit_id IN (SELECT unit_id FROM repo_units WHERE repo_id = ?)")
+            params.append(repo_id)
+
+        sql = ("SELECT u.*, group_concat(r.repo_id, ' ') AS repo_ids "
+               "FROM units u JOIN repo_units r ON r.unit_id = u.unit_id")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " GROUP BY u.unit_id ORDER BY u.name, u.epoch, u.version, u.release, u.arch"
+
+        units = []
+        for unit in self.db.execute(sql, params):
+            unit["repo_ids"] = sorted(unit["repo_ids"].split(" "))
+            units.append(unit)
+        return units
+
+    def stats(self):
+        """
+        :return: number of indexed repositories, units & associations
+        :rtype: dict
+        """
+        return dict(
+            (table, self.db.execute(
+                "SELECT COUNT(*) AS count FROM {0}".format(table)).fetchone()["count"])
+            for table in ("repos", "units", "repo_units")
+        )
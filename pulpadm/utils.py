@@ -1,31 +1,201 @@
 from __future__ import print_function, unicode_literals
-from builtins import open
+from io import open
 import os
+import errno
+import hashlib
 import logging
-import yaml
+import threading
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+from pulpadm.errors import InputError
 
 
-def read_yaml(path=None):
+# read_file_cached() state: path => (mtime, size, contents), and the interned
+# contents (the same contents read from different paths share one object)
+_FILE_CACHE = {}
+_FILE_CONTENTS = {}
+_FILE_CACHE_LOCK = threading.Lock()
+
+
+# PyYAML is imported on first use only, since most actions never read YAML
+def _yaml_loader():
+    """
+    Returns the fastest safe YAML loader available (libyaml based if PyYAML
+    was built with it)
+    """
+    import yaml
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def _yaml_stream_loader(stream):
+    """
+    Returns a safe YAML loader able to compose one node at a time (see
+    iter_yaml()). Parsing is still done by libyaml when available.
+    """
+    from yaml.composer import Composer
+    base = _yaml_loader()
+
+    class Loader(base, Composer):
+        def __init__(self, stream):
+            base.__init__(self, stream)
+            Composer.__init__(self)
+
+    return Loader(stream)
+
+
+def _yaml_cache_path(path, cache):
+    """
+    Returns the path of the compiled cache of a YAML file: a file named
+    after the SHA-1 of the absolute path of the YAML file, under the cache
+    directory (created private, since it holds pickles)
+
+    :raises OSError: if the cache directory cannot be created, or others
+                     than the user can write to it
+    """
+    cache = os.path.expanduser(cache)
+    try:
+        os.makedirs(cache, 0o700)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    st = os.stat(cache)
+    if st.st_uid != os.getuid() or st.st_mode & 0o022:
+        raise OSError(errno.EPERM, "YAML cache directory is writable by others", cache)
+    key = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+    return os.path.join(cache, key + ".pickle")
+
+
+def read_yaml(path=None, cache=None, strict=False):
     """
     Reads a given file in YAML format and returns data as a Python object
 
+    When a cache directory is given, the parsed data is also pickled there
+    (see _yaml_cache_path()) and re-used as long as the file mtime and size
+    (or, failing that, its SHA-1) did not change. The cache directory must
+    only be writable by the user (ie: ~/.pulpadm/cache/yaml), since
+    unpickling a file can run arbitrary code.
+
     :type path: str
     :param path: The absolute path of the YAML file
+    :type cache: str
+    :param cache: Directory of the compiled cache (default: no cache)
+    :type strict: bool
+    :param strict: Whether the file is an input file holding a mapping (or
+                   nothing); if so, errors are raised instead of returning
+                   None
+    :raises InputError: (strict only) if the file cannot be read or parsed,
+                        or does not hold a mapping
     """
+    import yaml
     logger = logging.getLogger(__name__ + '.read_yaml')
 
     data = None
     try:
         if path:
-            with open(os.path.expanduser(path), 'r') as stream:
-                data = yaml.load(stream)
-            stream.closed
-    except IOError as e:
+            path = os.path.expanduser(path)
+            st = os.stat(path)
+
+            # Compiled cache; unchanged file
+            entry = cache_path = None
+            if cache:
+                try:
+                    cache_path = _yaml_cache_path(path, cache)
+                    with open(cache_path, 'rb') as stream:
+                        entry = pickle.load(stream)
+                except Exception:
+                    entry = None
+            if entry and (entry["mtime"], entry["size"]) == (st.st_mtime, st.st_size):
+                data = entry["data"]
+            else:
+                with open(path, 'rb') as stream:
+                    raw = stream.read()
+                stream.closed
+                digest = hashlib.sha1(raw).hexdigest()
+
+                # Compiled cache; touched, but same contents
+                if entry and entry["sha1"] == digest:
+                    data = entry["data"]
+                else:
+                    data = yaml.load(raw, Loader=_yaml_loader())
+
+                if cache_path:
+                    entry = {"mtime": st.st_mtime, "size": st.st_size,
+                             "sha1": digest, "data": data}
+                    # Written atomically; concurrent actions (ie: one per
+                    # server) may read the same file
+                    tmp = "{0}.{1}.tmp".format(cache_path,
+                                               threading.current_thread().ident)
+                    try:
+                        with open(tmp, 'wb') as stream:
+                            pickle.dump(entry, stream, 2)
+                        os.rename(tmp, cache_path)
+                    except (IOError, OSError) as e:
+                        logger.debug("Unable to write YAML cache: {0}".format(e))
+    except (IOError, OSError, yaml.YAMLError) as e:
+        if strict:
+            raise InputError("Unable to read {0}: {1}".format(path, e))
         logger.error(e)
-    except yaml.YAMLError as e:
+        return None
+    if strict and data is not None and not isinstance(data, dict):
+        raise InputError("{0}: top-level element is not a mapping".format(path))
+    return data
+
+
+def iter_yaml(path=None, select=None, strict=False):
+    """
+    Reads a given file in YAML format, holding a mapping at the top-level
+    (ie: repos.yaml), and yields its entries one at a time as (key, value)
+    tuples, so the whole document never needs to be in memory.
+
+    Entries whose key is rejected by select are skipped without building
+    their value (it is still parsed, so anchors defined there keep working).
+
+    :type path: str
+    :param path: The absolute path of the YAML file
+    :type select: callable
+    :param select: function of the key; only entries it returns True for
+                   are yielded (default: all entries)
+    :type strict: bool
+    :param strict: Whether errors are raised instead of ending the entries
+    :raises InputError: (strict only) if the file cannot be read or parsed,
+                        or does not hold a mapping
+    """
+    import yaml
+    logger = logging.getLogger(__name__ + '.iter_yaml')
+
+    if not path:
+        return
+    try:
+        with open(os.path.expanduser(path), 'rb') as stream:
+            loader = _yaml_stream_loader(stream)
+            try:
+                loader.get_event()  # StreamStart
+                if loader.check_event(yaml.StreamEndEvent):
+                    return
+                loader.get_event()  # DocumentStart
+                if not loader.check_event(yaml.MappingStartEvent):
+                    if strict:
+                        raise InputError("{0}: top-level element is not a mapping".format(path))
+                    logger.error("{0}: top-level element is not a mapping".format(path))
+                    return
+                loader.get_event()
+                while not loader.check_event(yaml.MappingEndEvent):
+                    key = loader.construct_object(loader.compose_node(None, None), deep=True)
+                    node = loader.compose_node(None, None)
+                    if select is not None and not select(key):
+                        loader.constructed_objects = {}
+                        continue
+                    value = loader.construct_object(node, deep=True)
+                    loader.constructed_objects = {}
+                    yield key, value
+            finally:
+                loader.dispose()
+    except (IOError, yaml.YAMLError) as e:
+        if strict:
+            raise InputError("Unable to read {0}: {1}".format(path, e))
         logger.error(e)
-    finally:
-        return data
 
 
 def read_file(path=None):
@@ -47,3 +217,36 @@ def read_file(path=None):
         logger.error(e)
     finally:
         return data
+
+
+def read_file_cached(path=None):
+    """
+    Same as read_file(), but the contents are cached by path and only read
+    again once the file mtime or size changes. Identical contents (ie: the
+    same certificate copied under several paths) are held in memory once.
+
+    :type path: str
+    :param path: The absolute path of the file
+    """
+    logger = logging.getLogger(__name__ + '.read_file_cached')
+
+    if not path:
+        return None
+    full_path = os.path.expanduser(path)
+    try:
+        st = os.stat(full_path)
+    except OSError as e:
+        logger.error(e)
+        return None
+
+    with _FILE_CACHE_LOCK:
+        cached = _FILE_CACHE.get(full_path)
+    if cached is not None and cached[:2] == (st.st_mtime, st.st_size):
+        return cached[2]
+
+    data = read_file(full_path)
+    if data is not None:
+        with _FILE_CACHE_LOCK:
+            data = _FILE_CONTENTS.setdefault(data, data)
+            _FILE_CACHE[full_path] = (st.st_mtime, st.st_size, data)
+    return data
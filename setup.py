@@ -4,12 +4,12 @@ from shutil import copyfile
 from setuptools import setup, find_packages
 from setuptools.command.develop import develop
 from setuptools.command.install import install
-from pulpadm.constants import PKG_NAME, PKG_DESC, BASE_DIR, TMPL_DIR
+from pulpadm.constants import PKG_NAME, PKG_DESC, VERSION, BASE_DIR, TMPL_DIR
 
 
 # Global variables
 #
-version = "0.1.1"
+version = VERSION
 requires = [
     "future",
     "requests",
@@ -44,7 +44,7 @@ def initial_setup():
         print("Creating {0}".format(BASE_DIR))
         os.mkdir(BASE_DIR)
 
-    for fname in ["config.yaml", "repos.yaml"]:
+    for fname in ["config.yaml", "repos.yaml", "bindings.yaml"]:
         src = os.path.join(TMPL_DIR, fname)
         dst = os.path.join(BASE_DIR, fname)
         if os.path.exists(dst):
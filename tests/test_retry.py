@@ -0,0 +1,140 @@
+from __future__ import print_function, unicode_literals
+import time
+import unittest
+from pulpadm.errors import CircuitOpenError
+from pulpadm.retry import RetryPolicy, CircuitBreaker, is_failure, retry_after
+from pulpadm.selector import shard_of, glob_to_regex
+from pulpadm.bindings import delta
+from pulpadm.promote import tiers
+
+
+class RetryPolicyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.policy = RetryPolicy(retries=3, backoff=0.5, backoff_max=10)
+
+    def test_retries_idempotent_requests(self):
+        for status in (None, 429, 500, 502, 503, 504):
+            self.assertTrue(self.policy.should_retry(0, "GET", status), status)
+            self.assertTrue(self.policy.should_retry(0, "DELETE", status), status)
+
+    def test_retries_non_idempotent_requests_only_when_rejected(self):
+        for status in (429, 503):
+            self.assertTrue(self.policy.should_retry(0, "POST", status), status)
+        for status in (None, 500, 502, 504):
+            self.assertFalse(self.policy.should_retry(0, "POST", status), status)
+        self.assertTrue(self.policy.should_retry(0, "POST", 500, idempotent=True))
+
+    def test_does_not_retry_other_statuses(self):
+        for status in (200, 201, 202, 304, 400, 404, 409, 501, 505):
+            self.assertFalse(self.policy.should_retry(0, "GET", status), status)
+
+    def test_stops_after_retries(self):
+        self.assertTrue(self.policy.should_retry(2, "GET", 503))
+        self.assertFalse(self.policy.should_retry(3, "GET", 503))
+
+    def test_delay(self):
+        for attempt in range(10):
+            self.assertTrue(0 <= self.policy.delay(attempt) <= 10)
+        self.assertEqual(self.policy.delay(0, retry_after=2.0), 2.0)
+        self.assertEqual(self.policy.delay(0, retry_after=60.0), 10)
+
+    def test_retry_after(self):
+        self.assertIsNone(retry_after(None))
+        self.assertIsNone(retry_after("soon"))
+        self.assertEqual(retry_after("5"), 5.0)
+        self.assertEqual(retry_after("-1"), 0.0)
+        self.assertEqual(retry_after("Thu, 01 Jan 1970 00:00:00 GMT"), 0.0)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def record(self, breaker, *statuses):
+        for status in statuses:
+            if is_failure(status):
+                breaker.failure()
+            else:
+                breaker.success()
+
+    def test_is_failure(self):
+        for status in (None, 429, 500, 501, 502, 503, 504, 599):
+            self.assertTrue(is_failure(status), status)
+        for status in (200, 202, 304, 400, 404, 409):
+            self.assertFalse(is_failure(status), status)
+
+    def test_opens_on_consecutive_5xx(self):
+        breaker = CircuitBreaker(threshold=3, timeout=60)
+        self.record(breaker, 500, 501, 500)
+        self.assertRaises(CircuitOpenError, breaker.before)
+
+    def test_client_errors_reset_failures(self):
+        breaker = CircuitBreaker(threshold=3, timeout=60)
+        self.record(breaker, 500, 500, 404, 500, 500)
+        breaker.before()
+        self.assertEqual(breaker.failures, 2)
+
+    def test_trial_request(self):
+        breaker = CircuitBreaker(threshold=2, timeout=60)
+        self.record(breaker, 503, 503)
+        breaker.opened = time.time() - 61
+        breaker.before()
+        self.assertRaises(CircuitOpenError, breaker.before)
+        self.record(breaker, 500)
+        self.assertRaises(CircuitOpenError, breaker.before)
+        breaker.opened = time.time() - 61
+        breaker.before()
+        self.record(breaker, 200)
+        breaker.before()
+        self.assertIsNone(breaker.opened)
+
+    def test_disabled(self):
+        breaker = CircuitBreaker(threshold=0)
+        self.record(breaker, *[500] * 10)
+        breaker.before()
+
+
+class SelectorTest(unittest.TestCase):
+
+    def test_shard_of(self):
+        self.assertEqual(shard_of("epel-rhel7-x86_64", 1), 1)
+        shards = [shard_of("repo-{0}".format(i), 4) for i in range(100)]
+        self.assertEqual(set(shards), set([1, 2, 3, 4]))
+        self.assertEqual(shards, [shard_of("repo-{0}".format(i), 4) for i in range(100)])
+
+    def test_glob_to_regex(self):
+        self.assertEqual(glob_to_regex("epel-*"), "^epel\\-.*$")
+        self.assertEqual(glob_to_regex("rhel?"), "^rhel.$")
+        self.assertEqual(glob_to_regex("rhel[67]"), "^rhel[67]$")
+        self.assertEqual(glob_to_regex("rhel[!6]"), "^rhel[^6]$")
+        self.assertEqual(glob_to_regex("a[b"), "^a\\[b$")
+
+
+class BindingsTest(unittest.TestCase):
+
+    def test_delta(self):
+        desired = {"node1": set([("epel", "yum_distributor")])}
+        actual = {"node1": set([("base", "yum_distributor")]),
+                  "node2": set([("base", "yum_distributor")])}
+        self.assertEqual([(op["op"], op["consumer_id"], op["repo_id"])
+                          for op in delta(desired, actual)],
+                         [("bind", "node1", "epel")])
+        self.assertEqual([(op["op"], op["consumer_id"], op["repo_id"])
+                          for op in delta(desired, actual, delete=True)],
+                         [("unbind", "node1", "base"), ("bind", "node1", "epel")])
+
+
+class PromoteTest(unittest.TestCase):
+
+    def test_tiers(self):
+        chains = {"unstable": ("upstream", None), "stable": ("unstable", None),
+                  "other": ("upstream", None)}
+        self.assertEqual(tiers(chains), [["stable"], ["other", "unstable"]])
+        self.assertEqual(tiers(chains, ["unstable"]), [["unstable"]])
+        self.assertRaises(ValueError, tiers, chains, ["upstream"])
+
+    def test_tiers_cycle(self):
+        self.assertRaises(ValueError, tiers, {"a": ("b", None), "b": ("a", None)})
+
+
+if __name__ == "__main__":
+    unittest.main()